@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of generate_changelog.py against a mock LLM server.
+
+Builds a synthetic git repository, starts a local stub of the Groq and Ollama
+APIs, and times each pipeline stage. Runs fully offline.
+
+Usage:
+    python benchmarks/bench_pipeline.py --files 200 --diff-mb 5 --merges 10 --runs 20
+    python benchmarks/bench_pipeline.py --out results.json --compare baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import generate_changelog as gc  # noqa: E402
+from mock_llm_server import MockLLMServer  # noqa: E402
+from synthetic_repo import build_repo, write_changelog_fixture  # noqa: E402
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def time_stage(func, runs: int, setup=None) -> dict:
+    """Run func `runs` times (after one warm-up) and summarize wall-clock times in ms."""
+    samples = []
+    for run in range(runs + 1):
+        if setup:
+            setup()
+        # The pipeline is chatty - keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - start) * 1000
+        if run:
+            samples.append(elapsed)
+    
+    return {
+        'runs': runs,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'min_ms': round(min(samples), 3),
+        'max_ms': round(max(samples), 3),
+    }
+
+
+def tool_version() -> str:
+    """Commit of the generate_changelog.py under test."""
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR.parent,
+                            capture_output=True, text=True, check=False)
+    return result.stdout.strip() or "unknown"
+
+
+def point_at_server(server: MockLLMServer, provider: str):
+    """Route generate_changelog.py to the mock server for one provider."""
+    gc.GROQ_API_URL = f"{server.url}/openai/v1/chat/completions"
+    gc.OLLAMA_API_URL = f"{server.url}/api/generate"
+    gc.OLLAMA_TAGS_URL = f"{server.url}/api/tags"
+    gc.GROQ_API_KEY = "bench" if provider == 'groq' else ""
+    gc.CACHE_ENABLED = False
+    # Don't let the real quota pacing dominate the measurement
+    gc.GROQ_RATE_LIMITER = gc.RateLimiter(1_000_000, 1_000_000)
+
+
+def run_benchmarks(args) -> dict:
+    server = MockLLMServer(0, args.groq_latency, args.ollama_latency, args.token_latency).start()
+    results = {}
+    
+    with tempfile.TemporaryDirectory(prefix="changelog-bench-") as tmp:
+        repo = build_repo(Path(tmp) / "repo", args.files, args.diff_mb, args.merges)
+        os.chdir(repo)
+        
+        diff = gc.get_diff(mode='ci') or ""
+        changes = gc.collect_git_changes(mode='ci')
+        
+        results['get_diff'] = time_stage(lambda: gc.get_diff(mode='ci'), args.runs)
+        results['get_merge_commits'] = time_stage(lambda: gc.get_merge_commits(f"HEAD~{args.merges}..HEAD"), args.runs)
+        results['truncate_diff'] = time_stage(lambda: gc.truncate_diff(diff), args.runs)
+        results['summarize_diff'] = time_stage(lambda: gc.summarize_diff(diff, file_stats=changes.file_stats), args.runs)
+        
+        for provider in ('groq', 'ollama'):
+            point_at_server(server, provider)
+            results[f'generate_changelog_entry[{provider}]'] = time_stage(
+                lambda: gc.generate_changelog_entry(diff, changes.file_stats), args.runs)
+        
+        changelog = repo / gc.CHANGELOG_FILE
+        results['write_changelog'] = time_stage(
+            lambda: gc.write_changelog(None, "feat: benchmark entry", changes),
+            args.runs,
+            setup=lambda: write_changelog_fixture(changelog, args.changelog_kb),
+        )
+        os.chdir(BENCH_DIR)
+    
+    server.shutdown()
+    return {
+        'tool_version': tool_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'files': args.files,
+            'diff_mb': args.diff_mb,
+            'merges': args.merges,
+            'runs': args.runs,
+            'changelog_kb': args.changelog_kb,
+            'groq_latency': args.groq_latency,
+            'ollama_latency': args.ollama_latency,
+            'token_latency': args.token_latency,
+            'diff_bytes': changes.diff_bytes,
+        },
+        'results': results,
+    }
+
+
+def print_report(report: dict, baseline: dict = None):
+    print(f"\nchangelog pipeline benchmark ({report['tool_version']}, Python {report['python']})")
+    print(f"{'stage':<38} {'p50 ms':>10} {'p95 ms':>10}" + (f" {'p50 vs base':>12}" if baseline else ""))
+    print("-" * (60 + (13 if baseline else 0)))
+    for stage, stats in report['results'].items():
+        line = f"{stage:<38} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f}"
+        base = (baseline or {}).get('results', {}).get(stage)
+        if base and base['p50_ms']:
+            line += f" {stats['p50_ms'] / base['p50_ms']:>11.2f}x"
+        elif baseline:
+            line += f" {'-':>12}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the changelog pipeline offline")
+    parser.add_argument('--files', type=int, default=200, help="Files in the synthetic repo")
+    parser.add_argument('--diff-mb', type=float, default=1.0, help="Total diff size across all merges")
+    parser.add_argument('--merges', type=int, default=5, help="Number of merge commits")
+    parser.add_argument('--runs', type=int, default=10, help="Timed runs per stage")
+    parser.add_argument('--changelog-kb', type=int, default=512, help="Size of the existing CHANGELOG.md")
+    parser.add_argument('--groq-latency', type=float, default=0.05)
+    parser.add_argument('--ollama-latency', type=float, default=0.2)
+    parser.add_argument('--token-latency', type=float, default=0.01)
+    parser.add_argument('--out', help="Write the JSON report to this file")
+    parser.add_argument('--compare', help="Baseline JSON report to compare p50 against")
+    args = parser.parse_args()
+    
+    report = run_benchmarks(args)
+    baseline = json.loads(Path(args.compare).read_text(encoding='utf-8')) if args.compare else None
+    print_report(report, baseline)
+    
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
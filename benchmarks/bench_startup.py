@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Startup cost of generate_changelog.py, as paid by the post-merge hook.
+
+Measures, in fresh interpreters:
+    - `import generate_changelog` (and which heavy modules it pulls in)
+    - a full hook run on a merge that needs no entry, against an empty
+      `python -c pass` baseline
+
+and fails (exit code 1) if a budget is exceeded or a module that should be
+imported lazily is loaded on the fast path, so it can gate CI.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 30 --out startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+TOOL_DIR = BENCH_DIR.parent
+
+# Only needed once a provider is called or a file is written
+HOOK_LAZY_MODULES = [
+    'asyncio', 'concurrent.futures', 'http.client', 'ssl', 'socket', 'email',
+    'urllib.request', 'urllib.error', 'tempfile', 'shutil', 'random', '_strptime',
+]
+# Also not needed just to import the module (the hook formats the merge timestamp)
+LAZY_MODULES = HOOK_LAZY_MODULES + ['datetime']
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import generate_changelog
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({'ms': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % LAZY_MODULES
+
+# Runs the hook fast path in-process so the loaded modules can be inspected
+HOOK_PROBE = """
+import json, runpy, sys
+sys.argv = ['generate_changelog', '--auto']
+try:
+    runpy.run_module('generate_changelog', run_name='__main__')
+except SystemExit:
+    pass
+sys.__stdout__.write(json.dumps({'loaded': [m for m in %r if m in sys.modules]}))
+""" % HOOK_LAZY_MODULES
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def time_command(args: list, runs: int, cwd=None, env=None) -> list:
+    """Wall-clock times in ms of `runs` runs (after one warm-up that also fills __pycache__)."""
+    samples = []
+    for run in range(runs + 1):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        if run:
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def build_recorded_merge_repo(root: Path) -> Path:
+    """
+    Repository whose last merge is already in CHANGELOG.md: the hook has
+    nothing to do, which is the case every extra millisecond is wasted on.
+    """
+    def git(*args):
+        subprocess.run(["git", *args], cwd=root, check=True, capture_output=True)
+    
+    root.mkdir(parents=True)
+    git("init", "-q", "-b", "main")
+    git("config", "user.name", "Bench")
+    git("config", "user.email", "bench@example.com")
+    (root / "app.py").write_text("print('v1')\n")
+    git("add", "-A")
+    git("commit", "-q", "-m", "initial")
+    git("checkout", "-q", "-b", "feature")
+    (root / "app.py").write_text("print('v2')\n")
+    git("commit", "-q", "-am", "feature")
+    git("checkout", "-q", "main")
+    git("merge", "-q", "--no-ff", "-m", "merge feature", "feature")
+    
+    # Record the merge the way a previous hook run would have
+    script = ("import generate_changelog as gc; "
+              "changes = gc.collect_git_changes('merge'); "
+              "gc.write_changelog(None, 'feat: bump app version', changes)")
+    subprocess.run([sys.executable, "-c", script], cwd=root, env=hook_env(), check=True, capture_output=True)
+    return root
+
+
+def hook_env() -> dict:
+    env = dict(os.environ, GIT_HOOK='post-merge', PYTHONPATH=str(TOOL_DIR))
+    # The fast path must not depend on (or reach) a provider
+    env.pop('GROQ_API_KEY', None)
+    env.pop('GITHUB_ACTIONS', None)
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure and enforce the startup cost of generate_changelog.py")
+    parser.add_argument('--runs', type=int, default=20, help="Timed runs per measurement")
+    parser.add_argument('--max-import-ms', type=float, default=50.0,
+                        help="Budget for `import generate_changelog` (p50)")
+    parser.add_argument('--max-overhead-ms', type=float, default=90.0,
+                        help="Budget for a no-op hook run minus bare interpreter startup (p50)")
+    parser.add_argument('--out', help="Write the JSON report to this file")
+    args = parser.parse_args()
+    
+    failures = []
+    env = dict(os.environ, PYTHONPATH=str(TOOL_DIR))
+    
+    # 1. Import cost and heavy modules pulled in at import time
+    import_samples = []
+    loaded = set()
+    for run in range(args.runs + 1):
+        result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BENCH_DIR, env=env,
+                                capture_output=True, text=True, check=True)
+        probe = json.loads(result.stdout)
+        loaded.update(probe['loaded'])
+        if run:
+            import_samples.append(probe['ms'])
+    import_p50 = percentile(import_samples, 50)
+    if import_p50 > args.max_import_ms:
+        failures.append(f"import takes {import_p50:.1f} ms (budget {args.max_import_ms:.0f} ms)")
+    if loaded:
+        failures.append(f"imported at module load: {', '.join(sorted(loaded))}")
+    
+    # 2. Full hook run on a merge that needs no entry
+    with tempfile.TemporaryDirectory(prefix="changelog-startup-") as tmp:
+        repo = build_recorded_merge_repo(Path(tmp) / "repo")
+        baseline = time_command([sys.executable, "-c", "pass"], args.runs)
+        # Bytecode goes where the installed hook puts it (PYTHONPYCACHEPREFIX in HOOK_SCRIPT)
+        pycache = repo / ".git" / "changelog-cache" / "pycache"
+        hook = time_command([sys.executable, "-m", "generate_changelog", "--auto"], args.runs, cwd=repo,
+                            env=dict(hook_env(), PYTHONPYCACHEPREFIX=str(pycache)))
+        result = subprocess.run([sys.executable, "-c", HOOK_PROBE], cwd=repo, env=hook_env(),
+                                capture_output=True, text=True, check=False)
+        hook_loaded = json.loads(result.stdout.strip().splitlines()[-1])['loaded']
+    
+    overhead_p50 = percentile(hook, 50) - percentile(baseline, 50)
+    if overhead_p50 > args.max_overhead_ms:
+        failures.append(f"no-op hook run costs {overhead_p50:.1f} ms over bare Python (budget {args.max_overhead_ms:.0f} ms)")
+    if hook_loaded:
+        failures.append(f"imported on the no-op hook path: {', '.join(hook_loaded)}")
+    
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'import_p50_ms': round(import_p50, 3),
+        'import_p95_ms': round(percentile(import_samples, 95), 3),
+        'python_startup_p50_ms': round(percentile(baseline, 50), 3),
+        'hook_noop_p50_ms': round(percentile(hook, 50), 3),
+        'hook_noop_p95_ms': round(percentile(hook, 95), 3),
+        'hook_overhead_p50_ms': round(overhead_p50, 3),
+        'lazy_modules_loaded': sorted(loaded | set(hook_loaded)),
+        'failures': failures,
+    }
+    
+    print(f"\ngenerate_changelog.py startup (Python {report['python']}, {args.runs} runs)")
+    print(f"{'import generate_changelog':<38} {report['import_p50_ms']:>10.2f} ms p50")
+    print(f"{'python -c pass':<38} {report['python_startup_p50_ms']:>10.2f} ms p50")
+    print(f"{'hook run, nothing to do':<38} {report['hook_noop_p50_ms']:>10.2f} ms p50")
+    print(f"{'  overhead over bare Python':<38} {report['hook_overhead_p50_ms']:>10.2f} ms p50")
+    
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"\nReport written to {args.out}")
+    
+    if failures:
+        print("\n[FAIL] Startup budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n[OK] Within startup budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Local stub of the Groq and Ollama HTTP APIs for offline benchmarking.
+
+Serves:
+    POST /openai/v1/chat/completions   (Groq, OpenAI-compatible)
+    POST /api/generate                 (Ollama, streaming and non-streaming)
+    GET  /api/tags                     (Ollama model list)
+
+Usage:
+    python benchmarks/mock_llm_server.py --port 11434 --groq-latency 0.05 --ollama-latency 0.2
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_ENTRY = "feat: add benchmark mock entry"
+# Packed prompts (--pack) introduce each diff with this line and expect JSON back
+PACKED_CHANGE = re.compile(r'^=== CHANGE (\w+) ===$', re.MULTILINE)
+
+
+def packed_reply(prompt: str) -> str:
+    """JSON answer to a packed prompt: one mock entry per change id."""
+    return json.dumps({'entries': {item_id: f"{MOCK_ENTRY} {item_id}" for item_id in PACKED_CHANGE.findall(prompt)}})
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Request handler - latencies are read from the server instance."""
+    
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def send_json(self, data: dict, status: int = 200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_chunk(self, data: dict):
+        line = (json.dumps(data) + "\n").encode('utf-8')
+        self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b"\r\n")
+        self.wfile.flush()
+    
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self.send_json({'models': [{'name': name} for name in self.server.models]})
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        self.server.count_request()
+        
+        if self.path.endswith('/chat/completions'):
+            time.sleep(self.server.groq_latency)
+            prompt_chars = sum(len(m.get('content', '')) for m in request.get('messages', []))
+            content = MOCK_ENTRY
+            if request.get('response_format', {}).get('type') == 'json_object':
+                content = packed_reply(request['messages'][-1]['content'])
+            self.send_json({
+                'choices': [{'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': prompt_chars // 4, 'completion_tokens': 8},
+            })
+        elif self.path == '/api/generate':
+            time.sleep(self.server.ollama_latency)
+            if not request.get('stream', True):
+                response = packed_reply(request.get('prompt', '')) if request.get('format') == 'json' else MOCK_ENTRY
+                self.send_json({'response': response, 'done': True})
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for token in MOCK_ENTRY.split(' '):
+                time.sleep(self.server.token_latency)
+                self.send_chunk({'response': token + ' ', 'done': False})
+            self.send_chunk({'response': "\n", 'done': False})
+            self.send_chunk({'response': '', 'done': True})
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """Threaded stub server with configurable latencies."""
+    
+    daemon_threads = True
+    
+    def __init__(self, port: int = 0, groq_latency: float = 0.05, ollama_latency: float = 0.2,
+                 token_latency: float = 0.01, models=('phi3:mini',)):
+        super().__init__(('127.0.0.1', port), MockLLMHandler)
+        self.groq_latency = groq_latency
+        self.ollama_latency = ollama_latency
+        self.token_latency = token_latency
+        self.models = list(models)
+        self.requests = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+    
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+    
+    def start(self) -> 'MockLLMServer':
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Groq/Ollama server for benchmarks")
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--groq-latency', type=float, default=0.05, help="Seconds per Groq request")
+    parser.add_argument('--ollama-latency', type=float, default=0.2, help="Seconds before Ollama's first token")
+    parser.add_argument('--token-latency', type=float, default=0.01, help="Seconds between Ollama tokens")
+    args = parser.parse_args()
+    
+    server = MockLLMServer(args.port, args.groq_latency, args.ollama_latency, args.token_latency)
+    print(f"Mock LLM server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
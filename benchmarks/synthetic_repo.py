@@ -0,0 +1,71 @@
+"""
+Build synthetic git repositories for benchmarking the changelog pipeline.
+
+The repository gets a base commit with `files` source files, then `merges`
+feature branches merged with --no-ff. Each branch rewrites a slice of the
+files so that all merges together produce roughly `diff_mb` of diff.
+"""
+
+import os
+import subprocess
+from pathlib import Path
+
+GIT_IDENTITY = ["-c", "user.name=Bench", "-c", "user.email=bench@example.com"]
+LINE_TEMPLATE = "value_{file}_{rev}_{line} = compute({line}, '{file}')  # synthetic line\n"
+
+
+def git(repo: Path, *args: str):
+    subprocess.run(["git", *GIT_IDENTITY, *args], cwd=repo, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def write_source(path: Path, file_index: int, revision: int, lines: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in range(lines):
+            f.write(LINE_TEMPLATE.format(file=file_index, rev=revision, line=line))
+
+
+def build_repo(root: Path, files: int = 200, diff_mb: float = 1.0, merges: int = 5,
+               files_per_merge: int = 20) -> Path:
+    """
+    Create the repository at root and return its path.
+    HEAD ends on the last merge commit, so CI mode sees a merge diff.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    git(root, "init", "-q", "-b", "main")
+    
+    line_size = len(LINE_TEMPLATE.format(file=0, rev=0, line=0))
+    # Every rewritten line shows up twice in the diff (removed and added)
+    bytes_per_merge = diff_mb * 1024 * 1024 / max(merges, 1)
+    files_per_merge = max(1, min(files, files_per_merge))
+    lines_per_file = max(1, int(bytes_per_merge / (2 * line_size * files_per_merge)))
+    
+    for index in range(files):
+        write_source(root / "src" / f"module_{index // 50}" / f"file_{index}.py", index, 0, lines_per_file)
+    (root / "README.md").write_text("# Synthetic benchmark repo\n", encoding='utf-8')
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", "Initial commit")
+    
+    for merge in range(1, merges + 1):
+        branch = f"feature-{merge}"
+        git(root, "checkout", "-q", "-b", branch)
+        for offset in range(files_per_merge):
+            index = (merge * files_per_merge + offset) % files
+            write_source(root / "src" / f"module_{index // 50}" / f"file_{index}.py", index, merge, lines_per_file)
+        git(root, "add", "-A")
+        git(root, "commit", "-q", "-m", f"Feature {merge}")
+        git(root, "checkout", "-q", "main")
+        git(root, "merge", "-q", "--no-ff", branch, "-m", f"Merge {branch}")
+    
+    return root
+
+
+def write_changelog_fixture(path: Path, size_kb: int):
+    """Write a CHANGELOG.md of roughly size_kb kilobytes with an Unreleased section."""
+    entry = "- Jan 1, 2025 at 9:00 AM | 3 files | by Bench - fix: synthetic historical entry\n\n"
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# Changelog\n\n## Unreleased\n\n")
+        for _ in range(max(1, size_kb * 1024 // len(entry))):
+            f.write(entry)
+    os.utime(path)
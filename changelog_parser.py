@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Changelog Parser - structured, read-only view of CHANGELOG.md
+
+Loads the changelog once into versions, sections and entries so scripts and
+CI pipelines can query it instead of scraping the file with grep.
+
+Understands the entries written by generate_changelog.py:
+    - Dec 31, 2025 at 2:30 PM | 3 files | by John - feat: add new feature
+as well as plain Conventional Commits bullets:
+    - feat: remove suggestion buttons (#18) by @someone
+
+Usage:
+    python changelog_parser.py latest-version
+    python changelog_parser.py latest-entry
+    python changelog_parser.py entries-since 0.1.0
+    python changelog_parser.py entries-by-prefix fix
+    python changelog_parser.py unreleased --json
+"""
+
+import json
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+# "## [1.2.0] - 2026-02-25", "## [Unreleased]" or "## Unreleased"
+VERSION_HEADING = re.compile(r'^##\s+\[?(?P<name>[^\]]+?)\]?(?:\s+-\s+(?P<date>.+?))?\s*$')
+SEMVER = re.compile(r'^v?(\d+)\.(\d+)\.(\d+)$')
+
+# Metadata written by generate_changelog.py: "{timestamp} | N files | by {author} - {message}"
+ENTRY_METADATA = re.compile(r'^(?P<timestamp>.+?) \| (?P<files>\d+) files? \| by (?P<author>.+?) - (?P<message>.+)$')
+# Conventional Commits message: "type(scope)!: description"
+CONVENTIONAL = re.compile(r'^(?P<type>[A-Za-z]+(?: [A-Za-z]+)?)(?:\((?P<scope>[^)]*)\))?(?P<bang>!)?:\s*(?P<description>.*)$')
+
+QUERIES = ['latest-version', 'latest-entry', 'unreleased', 'entries-since', 'entries-by-prefix', 'versions']
+
+
+# =============================================================================
+# Model
+# =============================================================================
+
+@dataclass
+class Entry:
+    """One top-level bullet of the changelog."""
+    text: str  # Bullet text without the leading "- "
+    line: int  # 1-based line number in the file
+    timestamp: str = ""
+    files_changed: Optional[int] = None
+    author: str = ""
+    prefix: str = ""  # Conventional type, lowercase ("feat", "fix", ...)
+    scope: str = ""
+    breaking: bool = False
+    description: str = ""
+
+
+@dataclass
+class Section:
+    """A ### / #### heading inside a version, or the untitled block right below it."""
+    title: str
+    line: int
+    entries: List[Entry] = field(default_factory=list)
+
+
+@dataclass
+class Version:
+    """A ## heading: a released version or the Unreleased section."""
+    name: str
+    line: int
+    date: str = ""
+    sections: List[Section] = field(default_factory=list)
+
+    @property
+    def entries(self) -> List[Entry]:
+        return [entry for section in self.sections for entry in section.entries]
+
+    @property
+    def is_unreleased(self) -> bool:
+        return self.name.lower() == 'unreleased'
+
+    @property
+    def semver(self) -> Optional[tuple]:
+        match = SEMVER.match(self.name)
+        return tuple(int(part) for part in match.groups()) if match else None
+
+
+@dataclass
+class Changelog:
+    """Parsed changelog. Versions are kept in file order (newest first)."""
+    title: str = ""
+    versions: List[Version] = field(default_factory=list)
+
+    def unreleased(self) -> Optional[Version]:
+        """The Unreleased section, if the file has one."""
+        return next((version for version in self.versions if version.is_unreleased), None)
+
+    def released(self) -> List[Version]:
+        """Versions with a semantic version number, newest first."""
+        return [version for version in self.versions if version.semver]
+
+    def latest_version(self) -> Optional[str]:
+        """Highest released version number, e.g. "0.2.0"."""
+        released = self.released()
+        return max(released, key=lambda version: version.semver).name if released else None
+
+    def find_version(self, name: str) -> Optional[Version]:
+        name = name.lstrip('v')
+        return next((version for version in self.versions if version.name.lstrip('v') == name), None)
+
+    def entries(self) -> List[Entry]:
+        """Every entry in file order."""
+        return [entry for version in self.versions for entry in version.entries]
+
+    def latest_entry(self) -> Optional[Entry]:
+        """Most recently added entry (the first one in the file)."""
+        return next(iter(self.entries()), None)
+
+    def entries_since(self, name: str) -> List[Entry]:
+        """
+        Entries newer than the given version (everything above its heading).
+        Raises KeyError if the version is not in the changelog.
+        """
+        version = self.find_version(name)
+        if version is None:
+            raise KeyError(name)
+        return [entry for entry in self.entries() if entry.line < version.line]
+
+    def entries_by_prefix(self, prefix: str) -> List[Entry]:
+        """Entries with the given Conventional Commits type ("feat", "fix:", ...)."""
+        prefix = prefix.rstrip(':').lower()
+        return [entry for entry in self.entries() if entry.prefix == prefix]
+
+
+# =============================================================================
+# Parsing
+# =============================================================================
+
+def parse_entry(text: str, line: int) -> Entry:
+    """Split a bullet into generator metadata and its Conventional Commits parts."""
+    entry = Entry(text=text, line=line)
+    message = text
+
+    metadata = ENTRY_METADATA.match(text)
+    if metadata:
+        entry.timestamp = metadata.group('timestamp')
+        entry.files_changed = int(metadata.group('files'))
+        entry.author = metadata.group('author')
+        message = metadata.group('message')
+
+    conventional = CONVENTIONAL.match(message)
+    if conventional:
+        kind = conventional.group('type').lower()
+        entry.breaking = bool(conventional.group('bang')) or kind.startswith('breaking')
+        entry.prefix = 'breaking' if kind.startswith('breaking') else kind
+        entry.scope = conventional.group('scope') or ""
+        entry.description = conventional.group('description')
+    else:
+        entry.description = message
+
+    return entry
+
+
+def parse_changelog(text: str) -> Changelog:
+    """Parse changelog text in a single pass over its lines."""
+    changelog = Changelog()
+    version = None
+    section = None
+
+    for number, raw_line in enumerate(text.split('\n'), start=1):
+        line = raw_line.rstrip()
+
+        if line.startswith('# ') and not changelog.title:
+            changelog.title = line[2:].strip()
+        elif line.startswith('## '):
+            heading = VERSION_HEADING.match(line)
+            name, date = (heading.group('name').strip(), heading.group('date') or "") if heading else (line[3:].strip(), "")
+            version = Version(name=name, line=number, date=date.strip())
+            section = Section(title="", line=number)
+            version.sections.append(section)
+            changelog.versions.append(version)
+        elif version is None:
+            # Preamble - nothing to index before the first version heading
+            continue
+        elif line.startswith('###'):
+            section = Section(title=line.lstrip('#').strip(), line=number)
+            version.sections.append(section)
+        elif line.startswith('- ') or line.startswith('* '):
+            section.entries.append(parse_entry(line[2:].strip(), number))
+
+    return changelog
+
+
+def load_changelog(path="CHANGELOG.md") -> Changelog:
+    """Read and parse a changelog file. A missing file gives an empty changelog."""
+    try:
+        text = Path(path).read_text(encoding='utf-8')
+    except FileNotFoundError:
+        text = ""
+    return parse_changelog(text)
+
+
+# =============================================================================
+# Query CLI
+# =============================================================================
+
+def run_query(changelog: Changelog, query: str, argument: Optional[str] = None, as_json: bool = False) -> int:
+    """
+    Print the answer to a named query. Returns a process exit code.
+
+    Plain output is one value per line so pipelines can use it directly;
+    as_json prints the full structured records instead.
+    """
+    if query == 'latest-version':
+        # Pipelines start from 0.0.0 when nothing has been released yet
+        result = changelog.latest_version() or "0.0.0"
+    elif query == 'latest-entry':
+        result = changelog.latest_entry()
+    elif query == 'unreleased':
+        unreleased = changelog.unreleased()
+        result = unreleased.entries if unreleased else []
+    elif query == 'versions':
+        result = [version.name for version in changelog.versions]
+    elif query in ('entries-since', 'entries-by-prefix'):
+        if not argument:
+            print(f"[ERROR] {query} needs an argument", file=sys.stderr)
+            return 2
+        if query == 'entries-by-prefix':
+            result = changelog.entries_by_prefix(argument)
+        else:
+            try:
+                result = changelog.entries_since(argument)
+            except KeyError:
+                print(f"[ERROR] Version not found in changelog: {argument}", file=sys.stderr)
+                return 1
+    else:
+        print(f"[ERROR] Unknown query '{query}' (expected one of: {', '.join(QUERIES)})", file=sys.stderr)
+        return 2
+
+    if as_json:
+        def to_json(value):
+            return asdict(value) if isinstance(value, Entry) else value
+        data = [to_json(item) for item in result] if isinstance(result, list) else to_json(result)
+        print(json.dumps(data, indent=2))
+    elif isinstance(result, list):
+        for item in result:
+            print(item.text if isinstance(item, Entry) else item)
+    elif result is not None:
+        print(result.text if isinstance(result, Entry) else result)
+
+    return 0
+
+
+def main(argv: List[str]) -> int:
+    """Entry point for `python changelog_parser.py QUERY [ARG] [--json] [--file PATH]`."""
+    as_json = '--json' in argv
+    path = "CHANGELOG.md"
+    args = []
+    skip = False
+    for i, arg in enumerate(argv):
+        if skip:
+            skip = False
+        elif arg == '--file' and i + 1 < len(argv):
+            path = argv[i + 1]
+            skip = True
+        elif arg.startswith('--file='):
+            path = arg[len('--file='):]
+        elif arg != '--json':
+            args.append(arg)
+
+    if not args or args[0] in ('-h', '--help'):
+        print(__doc__)
+        return 0 if args else 2
+
+    return run_query(load_changelog(path), args[0], args[1] if len(args) > 1 else None, as_json)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
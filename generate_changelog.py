@@ -9,33 +9,135 @@ import sys
 import os
 import json
 import time
-import tempfile
-import shutil
 import re
-from datetime import datetime
+import threading
+import contextlib
 from pathlib import Path
-from typing import Optional
-from urllib.request import urlopen, Request
-from urllib.error import URLError, HTTPError
-import socket
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+if TYPE_CHECKING:
+    import http.client
+
+# Everything else (http.client, urllib, asyncio, concurrent.futures, tempfile,
+# shutil, datetime, ...) is imported where it is used: the post-merge hook runs
+# on every merge and most runs exit after a single git call.
 
 # Configuration
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY', '')
 GROQ_MODEL = "llama-3.1-8b-instant"  # Fast and free
+GROQ_REQUESTS_PER_MINUTE = int(os.environ.get('GROQ_RPM', '30'))  # Free tier quota
+GROQ_BURST = 5  # Requests allowed back to back before pacing kicks in
+GROQ_MAX_RETRIES = 4  # Retries on 429 and 5xx responses
+GROQ_BACKOFF_BASE = 1.0  # Seconds, doubled on every retry
+GROQ_BACKOFF_MAX = 60.0
 
 OLLAMA_API_URL = "http://localhost:11434/api/generate"
 OLLAMA_TAGS_URL = "http://localhost:11434/api/tags"
 OLLAMA_MODEL = "phi3:mini"  # Fallback for local use
+OLLAMA_STREAM = True  # Stream tokens and stop at the first complete entry line
+
+# 'fallback' tries Groq then Ollama; 'race' queries both at once (--race)
+PROVIDER_STRATEGY = os.environ.get('CHANGELOG_PROVIDER_STRATEGY', 'fallback')
 
 CHANGELOG_FILE = "CHANGELOG.md"
-MAX_DIFF_CHARS = 2000  # Smaller diff for faster and more focused CI processing
+CHANGELOG_HEAD_SCAN_BYTES = 64 * 1024  # Where "## Unreleased" is looked for before a full rewrite
+CHANGELOG_LOCK_TIMEOUT = 30.0  # Seconds to wait for another writer to release the changelog
+CHANGELOG_WRITE_RETRIES = 5  # Re-read and re-insert attempts if the file changes during a write
+DEDUP_ENABLED = True  # Skip commits/diffs already in the changelog index (disable with --force)
+MAX_DIFF_CHARS = 2000  # Per-diff size in packed requests (single prompts use the model's token budget)
+BATCH_WORKERS = 4  # Concurrent LLM requests in --range backfill mode
+
+# Docs-, lockfile-, test- and version-only changes get a rule-based entry, no LLM call (--no-rules)
+RULES_ENABLED = True
+VERSION_FILE_NAMES = {
+    'package.json', 'pyproject.toml', 'setup.py', 'setup.cfg', 'Cargo.toml', 'version.py', '_version.py',
+    '__init__.py', 'VERSION', 'version.txt', 'pom.xml', 'build.gradle', 'Chart.yaml', 'CHANGELOG.md',
+}
+VERSION_BUMP_MAX_LINES = 20  # Changed lines above this are never just a version bump
+
+# Prompt budgets per model: the diff is fitted to what the model processes within
+# PROMPT_LATENCY_TARGET at its observed speed, never less than its profile's prompt
+# size and never more than its context window
+PROMPT_LATENCY_TARGET = 3.0  # Seconds per request
+COMPLETION_RESERVE_TOKENS = 200  # Context kept free for the answer
+MODEL_PROFILES = {
+    # context: window in tokens; prompt_tokens: prompt size the model always gets
+    'llama-3.1-8b-instant': {'context': 131072, 'prompt_tokens': 3000},
+    'phi3:mini': {'context': 4096, 'prompt_tokens': 1000},
+    'llama-3.3-70b-versatile': {'context': 131072, 'prompt_tokens': 6000},
+    'qwen2.5:0.5b': {'context': 32768, 'prompt_tokens': 1000},
+}
+DEFAULT_MODEL_PROFILE = {'context': 8192, 'prompt_tokens': 1000}
+MODEL_STATS_FILE_NAME = "model-stats.json"  # Observed tokens per second, in the cache directory
+MODEL_STATS_SMOOTHING = 0.3  # Weight of the latest run in the moving average
+
+# Model routing (--route): each request goes to the smallest tier whose limit fits the
+# diff's predicted prompt tokens, one tier down while that model's recent p90 latency is too high
+ROUTING_ENABLED = False
+MODEL_TIERS = {
+    # (max predicted prompt tokens, model), smallest first - None takes everything larger
+    'groq': [(1500, GROQ_MODEL), (None, 'llama-3.3-70b-versatile')],
+    'ollama': [(800, 'qwen2.5:0.5b'), (None, OLLAMA_MODEL)],  # Tiers that are not pulled are skipped
+}
+ROUTING_LATENCY_TARGET = 10.0  # Seconds (p90 of recent calls) above which a tier hands over to the smaller one
+ROUTING_MIN_SAMPLES = 5  # Calls needed before a model's latency is trusted
+ROUTING_LATENCY_WINDOW = 50  # Latest call latencies kept per model in the stats file
+ROUTING_LOG_SIZE = 200  # Latest routing decisions (with their outcome) kept in the stats file
+
+# Packed requests (--pack N): several diffs per LLM call, one shared system prompt
+PACK_MAX_PROMPT_TOKENS = 6000  # Prompt budget per packed request
+PACK_TOKENS_PER_ENTRY = 60  # Completion tokens reserved per diff in the pack
+PACK_MAX_ATTEMPTS = 2  # Packed rounds before missing entries are generated one by one
+CHARS_PER_TOKEN = 4  # Rough estimate for code and English text
+
+# Map-reduce for large diffs (--map-reduce): chunks are summarized in parallel, then combined
+MAP_REDUCE_ENABLED = False
+MAP_REDUCE_WORKERS = 4  # Concurrent map requests per diff (--map-workers)
+MAP_REDUCE_TOKEN_BUDGET = 32000  # Prompt tokens over all chunks of one diff (--map-budget)
+MAP_SUMMARY_TOKENS = 120  # Completion tokens per chunk summary
+
+# Streaming diff capture - memory stays bounded however large the merge is
+DIFF_HEAD_BYTES = 256 * 1024  # Patch bytes kept from the start of each diff
+DIFF_TAIL_BYTES = 32 * 1024  # Patch bytes kept from the end (ring buffer)
+DIFF_MAX_READ_BYTES = 64 * 1024 * 1024  # Stop the child after this much output
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Files that never help the LLM describe a change (still listed in the stat header)
+LOCKFILE_NAMES = {
+    'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'npm-shrinkwrap.json',
+    'Cargo.lock', 'poetry.lock', 'Pipfile.lock', 'composer.lock', 'Gemfile.lock',
+    'go.sum', 'uv.lock',
+}
+GENERATED_PATTERNS = [
+    r'\.min\.(js|css)$', r'\.map$', r'\.snap$', r'_pb2\.py$', r'\.pb\.go$',
+    r'\.generated\.', r'(^|/)(dist|build|vendor|node_modules|__generated__)/',
+]
+
+# On-disk cache of generated entries (disable with --no-cache)
+CACHE_ENABLED = True
+CACHE_DIR_NAME = "changelog-cache"  # Lives inside the .git directory
+CACHE_MAX_ENTRIES = 500
+CACHE_MAX_AGE_DAYS = 30
+# Entries are named by their SHA-256 key - eviction must not touch the other
+# files kept in the cache directory (provider health, model stats, locks)
+CACHE_ENTRY_GLOB = "[0-9a-f]" * 64 + ".json"
+
+# Ollama health probes are shared and cached (in-process and in the cache directory)
+OLLAMA_PROBE_TIMEOUT = 2  # Seconds for a GET /api/tags probe
+OLLAMA_HEALTH_TTL = 120  # Seconds a successful probe is trusted
+OLLAMA_HEALTH_NEGATIVE_TTL = 600  # Seconds "Ollama not reachable" is remembered
+HEALTH_FILE_NAME = "health.json"
+
+# Warm background process for hook runs (--serve); the hook hands its run to it when it is up
+DAEMON_SOCKET = os.environ.get('CHANGELOG_DAEMON_SOCKET', str(Path.home() / ".cache" / "generate-changelog.sock"))
+DAEMON_CONNECT_TIMEOUT = 0.5  # Seconds - a daemon that does not accept by then is treated as down
+# Settings the client's command line changed (--force, --no-cache, ...) - applied to its run only
+DAEMON_SETTINGS = (
+    'DEDUP_ENABLED', 'CACHE_ENABLED', 'RULES_ENABLED', 'PROVIDER_STRATEGY', 'ROUTING_ENABLED',
+    'MAP_REDUCE_ENABLED', 'MAP_REDUCE_WORKERS', 'MAP_REDUCE_TOKEN_BUDGET', 'DIFF_HEAD_BYTES',
+)
 
 # Ollama download URLs (for local fallback)
 OLLAMA_WINDOWS_URL = "https://ollama.com/download/OllamaSetup.exe"
@@ -58,9 +160,36 @@ Example output: feat: add user authentication with OAuth2 support
 
 Do not output any preamble, conversational text, or bullet points. Just the single line entry."""
 
+# "## Unreleased" or the Keep a Changelog form "## [Unreleased]"
+UNRELEASED_HEADING = re.compile(r'^## (?:\[Unreleased\]|Unreleased)(?=[ \t]*\r?$)', re.MULTILINE)
+UNRELEASED_HEADING_BYTES = re.compile(UNRELEASED_HEADING.pattern.encode('ascii'), re.MULTILINE)
+
+# System prompt for packed requests - one JSON answer covering several diffs
+PACKED_SYSTEM_PROMPT = """You are a Senior Technical Writer. You will receive several independent code changes, each starting with a line "=== CHANGE <id> ===". Summarize each change into a single, concise changelog entry.
+
+Use Conventional Commits format with one of these prefixes: feat:, fix:, refactor:, docs:, chore:, perf:, test:
+
+Answer with a JSON object mapping every change id to its entry, and nothing else:
+{"entries": {"1": "feat: add user authentication with OAuth2 support", "2": "fix: handle empty config files"}}"""
+
+# System prompt for the map step of --map-reduce - one part of a larger merge
+MAP_SYSTEM_PROMPT = """You are a Senior Technical Writer. The code changes below are one part of a larger merge. Describe what this part changes in one to three short, factual sentences.
+
+Do not output any preamble, conversational text, or bullet points."""
+
 # Valid prefixes for Conventional Commits
 VALID_PREFIXES = ['feat:', 'fix:', 'refactor:', 'docs:', 'chore:', 'perf:', 'test:']
 
+# Changelog patterns (the same ones changelog_parser.py uses - repeated here so
+# this script keeps working when it is copied into a project on its own)
+# Conventional Commits message: "type(scope)!: description"
+CONVENTIONAL = re.compile(r'^(?P<type>[A-Za-z]+(?: [A-Za-z]+)?)(?:\((?P<scope>[^)]*)\))?(?P<bang>!)?:\s*(?P<description>.*)$')
+# Metadata written by format_changelog_entry: "{timestamp} | N files | by {author} - {message}"
+ENTRY_METADATA = re.compile(r'^(?P<timestamp>.+?) \| (?P<files>\d+) files? \| by (?P<author>.+?) - (?P<message>.+)$')
+# "## [1.2.0] - 2026-02-25", "## [Unreleased]" or "## Unreleased"
+VERSION_HEADING = re.compile(r'^##\s+\[?(?P<name>[^\]]+?)\]?(?:\s+-\s+(?P<date>.+?))?\s*$')
+SEMVER = re.compile(r'^v?(\d+)\.(\d+)\.(\d+)$')
+
 # Mapping from old format to Conventional format
 FORMAT_MAPPING = {
     '[feature]': 'feat:',
@@ -108,7 +237,7 @@ def is_non_interactive_mode() -> bool:
     # Check for auto/hook modes
     if os.environ.get('GIT_HOOK') == 'post-merge':
         return True
-    if '--auto' in sys.argv:
+    if '--auto' in sys.argv or '--repos' in sys.argv:
         return True
     
     # Check for CI flags
@@ -123,8 +252,135 @@ def is_non_interactive_mode() -> bool:
     return False
 
 
+def get_option_value(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Get the value of a CLI option given as "--name value" or "--name=value".
+    Returns the default if the option is not present.
+    """
+    for i, arg in enumerate(sys.argv):
+        if arg == name and i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+        if arg.startswith(f"{name}="):
+            return arg[len(name) + 1:]
+    return default
+
+
+class FileChangedError(RuntimeError):
+    """Raised when a file changed between reading it and replacing it."""
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    """Cheap identity of a file's current contents: (mtime_ns, size, inode)."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def atomic_write(path: Path, write_content, expected_signature=False):
+    """
+    Replace a file atomically: write_content(binary_file) fills a temp file in
+    the same directory, which is then renamed over path (keeping its mode).
+    
+    If expected_signature is given (None meaning "must not exist"), the file
+    is re-checked just before the rename and FileChangedError is raised if
+    someone else modified it in the meantime.
+    """
+    import shutil
+    import tempfile
+    
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_content(f)
+        if path.exists():
+            shutil.copymode(path, tmp_path)
+        if expected_signature is not False and file_signature(path) != expected_signature:
+            raise FileChangedError(f"{path} changed while it was being updated")
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def try_lock_file(lock_file) -> bool:
+    """Take a non-blocking exclusive advisory lock. Returns False if held elsewhere."""
+    try:
+        if sys.platform == 'win32':
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def unlock_file(lock_file):
+    """Release a lock taken with try_lock_file."""
+    if sys.platform == 'win32':
+        import msvcrt
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def get_lock_path(path: Path) -> Path:
+    """
+    Lock file for a changelog: .git/changelog-cache/CHANGELOG.md.lock when the
+    changelog is at a repository root, so it never shows up as an untracked
+    file, otherwise a hidden sibling (.CHANGELOG.md.lock).
+    """
+    git_dir = path.resolve().parent / ".git"
+    try:
+        if git_dir.is_file():
+            # Worktrees and submodules: ".git" is a "gitdir: <path>" pointer
+            pointer = git_dir.read_text(encoding='utf-8').strip()
+            if pointer.startswith('gitdir:'):
+                git_dir = git_dir.parent / pointer[len('gitdir:'):].strip()
+        if git_dir.is_dir():
+            lock_dir = git_dir / CACHE_DIR_NAME
+            lock_dir.mkdir(exist_ok=True)
+            return lock_dir / f"{path.name}.lock"
+    except OSError:
+        pass
+    return path.with_name(f".{path.name}.lock")
+
+
+@contextlib.contextmanager
+def changelog_lock(path: Path, timeout: float = CHANGELOG_LOCK_TIMEOUT):
+    """
+    Hold an exclusive advisory lock on a changelog while updating it.
+    
+    The lock lives in a separate file (see get_lock_path) because the
+    changelog itself is replaced on every write. The lock file is left in
+    place - deleting it would let two writers lock different inodes.
+    """
+    lock_path = get_lock_path(path)
+    started = time.monotonic()
+    with open(lock_path, 'a+b') as lock_file:
+        while not try_lock_file(lock_file):
+            if time.monotonic() - started >= timeout:
+                raise TimeoutError(f"Timed out after {timeout:.0f}s waiting for {lock_path}")
+            time.sleep(0.05)
+        METRICS.incr('changelog_lock_wait_ms', int((time.monotonic() - started) * 1000))
+        try:
+            yield
+        finally:
+            unlock_file(lock_file)
+
+
 def run_git_command(args: list) -> subprocess.CompletedProcess:
     """Run a git command with standard options for cross-platform compatibility."""
+    METRICS.incr('git_subprocesses')
     return subprocess.run(
         args,
         capture_output=True,
@@ -135,6 +391,319 @@ def run_git_command(args: list) -> subprocess.CompletedProcess:
     )
 
 
+# =============================================================================
+# Run Metrics
+# =============================================================================
+
+class RunMetrics:
+    """
+    Timings and counters for one run, reported with --metrics-out (JSON)
+    and --openmetrics-out (text file for the node exporter textfile collector).
+    Safe to update from worker threads.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.provider_calls = []
+        self.routing = []
+        self.exit_code = 0
+    
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage (accumulates if entered more than once)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+    
+    def incr(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def record_provider(self, provider: str, model: str, seconds: float, ok: bool,
+                        prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        with self.lock:
+            self.provider_calls.append({
+                'provider': provider,
+                'model': model,
+                'seconds': round(seconds, 4),
+                'ok': ok,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+            })
+    
+    def record_routing(self, route: dict, ok: bool, seconds: float):
+        """A routing decision (see route_model) and the outcome of the request it routed."""
+        with self.lock:
+            self.routing.append(dict(route, ok=ok, seconds=round(seconds, 4), time=int(time.time())))
+    
+    def to_dict(self) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+            counters['cache_hits'] = CACHE_STATS['hits']
+            counters['cache_misses'] = CACHE_STATS['misses']
+            return {
+                'started': self.started,
+                'duration_seconds': round(time.time() - self.started, 4),
+                'exit_code': self.exit_code,
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'counters': counters,
+                'provider_calls': list(self.provider_calls),
+                'routing': list(self.routing),
+            }
+    
+    def to_openmetrics(self) -> str:
+        report = self.to_dict()
+        lines = [
+            "# TYPE changelog_run_duration_seconds gauge",
+            f"changelog_run_duration_seconds {report['duration_seconds']}",
+            "# TYPE changelog_run_exit_code gauge",
+            f"changelog_run_exit_code {report['exit_code']}",
+            "# TYPE changelog_last_run_timestamp_seconds gauge",
+            f"changelog_last_run_timestamp_seconds {int(report['started'])}",
+            "# TYPE changelog_stage_duration_seconds gauge",
+        ]
+        for name, seconds in report['stages'].items():
+            lines.append(f'changelog_stage_duration_seconds{{stage="{name}"}} {seconds}')
+        for name, value in sorted(report['counters'].items()):
+            lines.append(f"# TYPE changelog_{name} gauge")
+            lines.append(f"changelog_{name} {value}")
+        
+        # One series per provider/model, summed over the run
+        totals = {}
+        for call in report['provider_calls']:
+            key = (call['provider'], call['model'])
+            total = totals.setdefault(key, {'calls': 0, 'failures': 0, 'seconds': 0.0, 'tokens': 0})
+            total['calls'] += 1
+            total['failures'] += 0 if call['ok'] else 1
+            total['seconds'] += call['seconds']
+            total['tokens'] += (call['prompt_tokens'] or 0) + (call['completion_tokens'] or 0)
+        for metric in ('calls', 'failures', 'seconds', 'tokens'):
+            lines.append(f"# TYPE changelog_provider_{metric} gauge")
+            for (provider, model), total in totals.items():
+                lines.append(f'changelog_provider_{metric}{{provider="{provider}",model="{model}"}} {round(total[metric], 4)}')
+        
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = RunMetrics()
+
+
+def write_report_file(path: str, text: str):
+    """Write a report atomically so scrapers never read a partial file."""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(target, lambda f: f.write(text.encode('utf-8')))
+
+
+def write_metrics_reports(metrics_out: Optional[str], openmetrics_out: Optional[str]):
+    """Write the requested run reports (errors are reported, never fatal)."""
+    try:
+        if metrics_out:
+            write_report_file(metrics_out, json.dumps(METRICS.to_dict(), indent=2))
+        if openmetrics_out:
+            write_report_file(openmetrics_out, METRICS.to_openmetrics())
+    except OSError as e:
+        print(f"[WARN] Could not write metrics report: {e}")
+
+
+# =============================================================================
+# HTTP Client (persistent connections)
+# =============================================================================
+
+# Connections are kept per thread - http.client connections are not thread-safe
+_http_local = threading.local()
+
+
+def get_stale_connection_errors() -> tuple:
+    """Errors that mean a kept-alive connection was closed by the server."""
+    import http.client
+    return (
+        http.client.RemoteDisconnected,
+        http.client.CannotSendRequest,
+        http.client.BadStatusLine,
+        BrokenPipeError,
+        ConnectionResetError,
+    )
+
+
+def get_http_connection(scheme: str, host: str, port: Optional[int]) -> Tuple['http.client.HTTPConnection', bool]:
+    """
+    Get this thread's persistent connection for a host, creating it if needed.
+    Returns (connection, reused).
+    """
+    import http.client
+    
+    pool = get_http_pool()
+    key = (scheme, host, port)
+    if key in pool:
+        return pool[key], True
+    
+    if scheme == 'https':
+        conn = http.client.HTTPSConnection(host, port)
+    else:
+        conn = http.client.HTTPConnection(host, port)
+    pool[key] = conn
+    return conn, False
+
+
+def drop_http_connection(scheme: str, host: str, port: Optional[int]):
+    """Close and forget this thread's connection for a host."""
+    pool = getattr(_http_local, 'pool', {})
+    conn = pool.pop((scheme, host, port), None)
+    if conn is not None:
+        conn.close()
+
+
+def get_http_pool() -> dict:
+    """Get the current thread's connection pool."""
+    pool = getattr(_http_local, 'pool', None)
+    if pool is None:
+        pool = _http_local.pool = {}
+    return pool
+
+
+def abort_http_connections(pool: dict, cancel_event: threading.Event):
+    """
+    Cancel another thread's HTTP work: its next request fails immediately and
+    the sockets of its pool are shut down, which unblocks a request in
+    progress (it fails with an OSError).
+    """
+    import socket
+    
+    cancel_event.set()
+    for conn in list(pool.values()):
+        sock = conn.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def is_request_cancelled() -> bool:
+    """True if this thread's HTTP work was cancelled (see abort_http_connections)."""
+    cancel_event = getattr(_http_local, 'cancel_event', None)
+    return cancel_event is not None and cancel_event.is_set()
+
+
+def cancellable_sleep(seconds: float):
+    """Sleep, but raise ConnectionAbortedError as soon as this thread's HTTP work is cancelled."""
+    cancel_event = getattr(_http_local, 'cancel_event', None)
+    if cancel_event is None:
+        time.sleep(seconds)
+    elif cancel_event.wait(seconds):
+        raise ConnectionAbortedError("request cancelled")
+
+
+def close_http_connections():
+    """Close all connections held by the current thread."""
+    pool = getattr(_http_local, 'pool', {})
+    for conn in pool.values():
+        conn.close()
+    pool.clear()
+
+
+def send_http_request(method: str, url: str, body: Optional[bytes], headers: Optional[dict],
+                      timeout: float) -> Tuple['http.client.HTTPResponse', tuple]:
+    """
+    Send a request on this thread's persistent connection and return the
+    response (body not read yet) with the pool key of its connection.
+    A connection the server has closed since its last use is reopened once.
+    """
+    from urllib.parse import urlsplit
+    
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += f"?{parts.query}"
+    key = (parts.scheme, parts.hostname, parts.port)
+    
+    for attempt in range(2):
+        if is_request_cancelled():
+            raise ConnectionAbortedError("request cancelled")
+        
+        conn, reused = get_http_connection(*key)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            return conn.getresponse(), key
+        except get_stale_connection_errors():
+            drop_http_connection(*key)
+            if reused and attempt == 0:
+                continue
+            raise
+        except Exception:
+            drop_http_connection(*key)
+            raise
+
+
+def check_http_status(url: str, response: 'http.client.HTTPResponse', data: bytes):
+    """Raise HTTPError for 4xx/5xx responses, like urlopen."""
+    if response.status >= 400:
+        import io
+        from urllib.error import HTTPError
+        raise HTTPError(url, response.status, response.reason, response.msg, io.BytesIO(data))
+
+
+def http_request(method: str, url: str, body: Optional[bytes] = None,
+                 headers: Optional[dict] = None, timeout: float = 30) -> Tuple[int, dict, bytes]:
+    """
+    Send an HTTP request over a persistent keep-alive connection.
+    
+    A connection the server has closed since its last use is reopened
+    transparently (once). Raises HTTPError for 4xx/5xx responses and
+    OSError for network failures, like urlopen.
+    
+    Returns (status, headers, body).
+    """
+    response, key = send_http_request(method, url, body, headers, timeout)
+    try:
+        data = response.read()
+    except Exception:
+        drop_http_connection(*key)
+        raise
+    
+    if response.will_close:
+        drop_http_connection(*key)
+    
+    check_http_status(url, response, data)
+    response_headers = {k.lower(): v for k, v in response.getheaders()}
+    return response.status, response_headers, data
+
+
+def http_stream_lines(method: str, url: str, body: Optional[bytes] = None,
+                      headers: Optional[dict] = None, timeout: float = 30):
+    """
+    Send an HTTP request and yield the response body line by line.
+    
+    If the caller stops iterating before the end of the body, the connection
+    is closed (which also tells the server to stop generating) instead of
+    being returned to the pool.
+    """
+    response, key = send_http_request(method, url, body, headers, timeout)
+    finished = False
+    try:
+        if response.status >= 400:
+            check_http_status(url, response, response.read())
+        for line in response:
+            yield line
+        finished = True
+    finally:
+        if not finished or response.will_close:
+            drop_http_connection(*key)
+
+
 # =============================================================================
 # Ollama Auto-Install Functions
 # =============================================================================
@@ -155,6 +724,8 @@ def is_ollama_installed() -> bool:
 
 def download_file(url: str, dest_path: str, show_progress: bool = True) -> bool:
     """Download a file from URL to destination path."""
+    from urllib.request import urlopen, Request
+    
     try:
         print(f"Downloading from {url}...")
         
@@ -194,6 +765,7 @@ def install_ollama_windows() -> bool:
     print("Installing Ollama for Windows...")
     
     # Download installer to temp directory
+    import tempfile
     temp_dir = tempfile.gettempdir()
     installer_path = os.path.join(temp_dir, "OllamaSetup.exe")
     
@@ -343,11 +915,12 @@ def start_ollama_service() -> bool:
                 start_new_session=True
             )
         
-        # Wait for service to start
+        # Wait for service to start (always probe - the cached answer is "not running")
+        invalidate_ollama_health()
         print("   Waiting for Ollama to start...")
         for i in range(30):  # Wait up to 30 seconds
             time.sleep(1)
-            if check_ollama_running():
+            if check_ollama_running(max_age=0):
                 print("[OK] Ollama service started!")
                 return True
             print(f"   Still waiting... ({i+1}s)")
@@ -374,6 +947,7 @@ def pull_model(model: str) -> bool:
         
         if result.returncode == 0:
             print(f"\n[OK] Model '{model}' downloaded successfully!")
+            invalidate_ollama_health()
             return True
         else:
             print(f"\n[ERROR] Failed to download model '{model}'")
@@ -430,57 +1004,137 @@ def ensure_ollama_ready(auto_install: bool = True) -> bool:
     print("[OK] Ollama service is running")
     
     # Step 3: Check if model is available
-    if not check_model_available(MODEL):
-        print(f"[WARN] Model '{MODEL}' is not installed")
+    if not check_model_available(OLLAMA_MODEL):
+        print(f"[WARN] Model '{OLLAMA_MODEL}' is not installed")
         print(f"   The model is required for AI-powered changelog generation.")
         
         # In auto mode or CI, just download it
         if not is_non_interactive_mode():
-            response = input(f"   Download '{MODEL}' model now? (~4GB) [Y/n]: ").strip().lower()
+            response = input(f"   Download '{OLLAMA_MODEL}' model now? (~4GB) [Y/n]: ").strip().lower()
             if response and response not in ['y', 'yes']:
                 print("   Skipping model download")
-                print(f"   To download later, run: ollama pull {MODEL}")
+                print(f"   To download later, run: ollama pull {OLLAMA_MODEL}")
                 return False
         
-        if not pull_model(MODEL):
+        if not pull_model(OLLAMA_MODEL):
             return False
     
-    print(f"[OK] Model '{MODEL}' is ready")
+    print(f"[OK] Model '{OLLAMA_MODEL}' is ready")
     
     return True
 
 
-def check_ollama_running() -> bool:
+# Last Ollama probe result, shared by every check in this process
+_ollama_health = None
+
+
+def get_health_file() -> Optional[Path]:
+    """On-disk copy of the last Ollama probe (None if disk caching is off)."""
+    cache_dir = get_cache_dir() if CACHE_ENABLED else None
+    return cache_dir / HEALTH_FILE_NAME if cache_dir else None
+
+
+def is_health_fresh(health: Optional[dict], now: float, max_age: Optional[float]) -> bool:
+    """Whether a probe result is for the configured URL and still within its TTL."""
+    if not health or health.get('url') != OLLAMA_TAGS_URL:
+        return False
+    if max_age is None:
+        max_age = OLLAMA_HEALTH_TTL if health.get('reachable') else OLLAMA_HEALTH_NEGATIVE_TTL
+    return 0 <= now - health.get('checked', 0) < max_age
+
+
+def save_ollama_health(health: dict):
+    """Remember a probe result for this process and for later runs."""
+    global _ollama_health
+    _ollama_health = health
+    
+    health_file = get_health_file()
+    if health_file is None:
+        return
+    try:
+        health_file.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(health).encode('utf-8')
+        atomic_write(health_file, lambda f: f.write(payload))
+    except OSError:
+        pass
+
+
+def invalidate_ollama_health():
+    """Forget cached probe results, e.g. after starting Ollama or pulling a model."""
+    global _ollama_health
+    _ollama_health = None
+    health_file = get_health_file()
+    if health_file is not None:
+        try:
+            health_file.unlink()
+        except OSError:
+            pass
+
+
+def probe_ollama(max_age: Optional[float] = None) -> dict:
+    """
+    Reachability and model list of the local Ollama, from cache when fresh.
+    
+    A single GET /api/tags answers both questions. The result is reused for
+    OLLAMA_HEALTH_TTL seconds, or OLLAMA_HEALTH_NEGATIVE_TTL if Ollama was
+    unreachable, so a machine without Ollama does not pay the probe timeout
+    on every merge. max_age overrides the TTL (0 forces a fresh probe).
+    
+    Returns {'url', 'checked', 'reachable', 'models'}.
+    """
+    import http.client
+    global _ollama_health
+    
+    now = time.time()
+    if is_health_fresh(_ollama_health, now, max_age):
+        METRICS.incr('health_cache_hits')
+        return _ollama_health
+    
+    health_file = get_health_file()
+    if health_file is not None and _ollama_health is None:
+        try:
+            cached = json.loads(health_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            cached = None
+        if is_health_fresh(cached, now, max_age):
+            METRICS.incr('health_cache_hits')
+            _ollama_health = cached
+            return cached
+    
+    METRICS.incr('health_probes')
+    health = {'url': OLLAMA_TAGS_URL, 'checked': now, 'reachable': False, 'models': []}
+    try:
+        status, _, body = http_request('GET', OLLAMA_TAGS_URL, timeout=OLLAMA_PROBE_TIMEOUT)
+        health['reachable'] = status == 200
+        health['models'] = [m.get('name', '') for m in json.loads(body.decode('utf-8')).get('models', [])]
+    except (OSError, http.client.HTTPException, ValueError, AttributeError):
+        pass
+    
+    save_ollama_health(health)
+    return health
+
+
+def check_ollama_running(max_age: Optional[float] = None) -> bool:
     """
     Check if Ollama is running by pinging the tags endpoint.
     Returns True if Ollama is accessible, False otherwise.
+    The answer may come from the health cache (see probe_ollama).
     """
-    try:
-        request = Request(OLLAMA_TAGS_URL)
-        with urlopen(request, timeout=2) as response:
-            return response.status == 200
-    except (URLError, HTTPError, OSError):
-        return False
+    return probe_ollama(max_age)['reachable']
 
 
-def check_model_available(model: str) -> bool:
+def check_model_available(model: str, max_age: Optional[float] = None) -> bool:
     """
     Check if the specified model is available in Ollama.
     Returns True if model exists, False otherwise.
+    Shares the cached /api/tags probe with check_ollama_running.
     """
-    try:
-        request = Request(OLLAMA_TAGS_URL)
-        with urlopen(request, timeout=5) as response:
-            data = json.loads(response.read().decode('utf-8'))
-            models = data.get('models', [])
-            # Check if model name matches (with or without :latest tag)
-            for m in models:
-                model_name = m.get('name', '')
-                if model_name == model or model_name == f"{model}:latest" or model_name.startswith(f"{model}:"):
-                    return True
-            return False
-    except (URLError, HTTPError, OSError, json.JSONDecodeError):
-        return False
+    health = probe_ollama(max_age)
+    # Check if model name matches (with or without :latest tag)
+    for model_name in health['models']:
+        if model_name == model or model_name == f"{model}:latest" or model_name.startswith(f"{model}:"):
+            return True
+    return False
 
 
 def truncate_diff(diff: str, max_chars: int = MAX_DIFF_CHARS) -> str:
@@ -507,440 +1161,2884 @@ def truncate_diff(diff: str, max_chars: int = MAX_DIFF_CHARS) -> str:
     return truncated
 
 
-def get_diff(mode: str = 'auto') -> Optional[str]:
-    """
-    Get git diff based on the context.
+# =============================================================================
+# Git Change Collection
+# =============================================================================
+
+# Record header for `git log` output: \x1e starts a commit, \x1f separates fields
+LOG_RECORD_FORMAT = "%x1e%H%x1f%ci%x1f%an"
+
+NUMSTAT_PATTERN = re.compile(r'^(\d+|-)\t(\d+|-)\t(.+)$')
+
+
+@dataclass
+class GitChanges:
+    """Diff and commit metadata for one changelog entry."""
+    diff: str = ""
+    # (added, deleted, path) per file - counts are None for binary files
+    file_stats: List[Tuple[Optional[int], Optional[int], str]] = field(default_factory=list)
+    timestamp: str = ""
+    author: str = "Unknown"
+    sha: str = ""
+    # Size of the patch git produced and how much of it was not kept in memory
+    diff_bytes: int = 0
+    skipped_bytes: int = 0
     
-    Args:
-        mode: 'auto' (detect), 'ci' (merge commit), 'local' (uncommitted), 'merge' (post-merge hook)
+    @property
+    def files(self) -> List[str]:
+        return [path for _, _, path in self.file_stats]
     
-    Returns the diff string or None if no changes detected.
+    @property
+    def files_changed(self) -> int:
+        return len(self.file_stats)
+
+
+class DiffCapture:
     """
-    try:
-        diff = ""
-        
-        if mode == 'ci':
-            # CI mode: compare HEAD^1 to HEAD (merge commit diff)
-            result = run_git_command(["git", "diff", "HEAD^1", "HEAD", "--no-color"])
-            diff = result.stdout or ""
-            
-            # Fallback to git show if no diff
-            if not diff.strip():
-                result = run_git_command(["git", "show", "--format=", "--no-color", "HEAD"])
-                diff = result.stdout or ""
+    Bounded capture of one streamed diff record.
+    
+    Everything before the first "diff --git" (log header and numstat lines)
+    is kept whole; of the patch itself only the first head_bytes and a ring
+    buffer of the last tail_bytes are kept.
+    """
+    
+    def __init__(self, head_bytes: int = DIFF_HEAD_BYTES, tail_bytes: int = DIFF_TAIL_BYTES):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.prefix = bytearray()
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.in_patch = False
+        self.patch_bytes = 0
+        self.skipped_bytes = 0
+    
+    def feed(self, chunk: bytes):
+        if not self.in_patch:
+            search_from = max(0, len(self.prefix) - len(b'diff --git '))
+            self.prefix += chunk
+            pos = self.prefix.find(b'diff --git ', search_from)
+            if pos == -1:
+                return
+            chunk = bytes(self.prefix[pos:])
+            del self.prefix[pos:]
+            self.in_patch = True
         
-        elif mode == 'merge':
-            # Post-merge hook: check ORIG_HEAD first (handles fast-forward merges)
-            orig_check = run_git_command(["git", "rev-parse", "--verify", "ORIG_HEAD"])
-            
-            if orig_check.returncode == 0 and orig_check.stdout.strip():
-                # ORIG_HEAD exists - use it for accurate diff
-                result = run_git_command(["git", "diff", "ORIG_HEAD", "HEAD", "--no-color"])
-                diff = result.stdout or ""
-            else:
-                # No ORIG_HEAD, fall back to HEAD^1
-                result = run_git_command(["git", "diff", "HEAD^1", "HEAD", "--no-color"])
-                diff = result.stdout or ""
+        self.patch_bytes += len(chunk)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self.tail += chunk
+            overflow = len(self.tail) - self.tail_bytes
+            if overflow > 0:
+                del self.tail[:overflow]
+                self.skipped_bytes += overflow
+    
+    def text(self) -> str:
+        """Decode the kept bytes, cutting at line boundaries around the gap."""
+        head, tail = bytes(self.head), bytes(self.tail)
         
+        if self.skipped_bytes:
+            # Drop the partial lines on both sides of the omitted region
+            cut = head.rfind(b'\n')
+            if cut != -1:
+                self.skipped_bytes += len(head) - cut - 1
+                head = head[:cut + 1]
+            cut = tail.find(b'\n')
+            if cut != -1:
+                self.skipped_bytes += cut + 1
+                tail = tail[cut + 1:]
+            marker = f"\n... [diff truncated: {self.skipped_bytes} bytes omitted] ...\n\n".encode('utf-8')
+            data = bytes(self.prefix) + head + marker + tail
         else:
-            # Local mode: get uncommitted changes (staged + unstaged)
-            staged = run_git_command(["git", "diff", "--cached"])
-            unstaged = run_git_command(["git", "diff"])
-            diff = (staged.stdout or "") + (unstaged.stdout or "")
+            data = bytes(self.prefix) + head + tail
         
-        return diff.strip() if diff.strip() else None
-    
-    except Exception as e:
-        print(f"[ERROR] Error getting diff: {e}")
-        return None
+        return data.decode('utf-8', errors='replace')
 
 
-def generate_with_groq(diff: str) -> Optional[str]:
+def stream_git_diff(args: list, split_records: bool = False,
+                    head_bytes: Optional[int] = None, tail_bytes: Optional[int] = None):
     """
-    Use Groq API to generate a changelog entry from the git diff.
-    Returns the generated entry or None on error.
+    Run a git diff/log command and capture its output with bounded memory.
+    
+    Args:
+        split_records: Split output on the \\x1e record marker of LOG_RECORD_FORMAT
+            and budget each commit separately (used for multi-commit logs).
+    
+    Returns (returncode, stderr, captures). For a single diff, the child is
+    killed once DIFF_MAX_READ_BYTES have been read instead of draining it.
+    Budgets default to DIFF_HEAD_BYTES/DIFF_TAIL_BYTES (raised by --map-reduce).
     """
-    if not GROQ_API_KEY:
-        return None
+    head_bytes = DIFF_HEAD_BYTES if head_bytes is None else head_bytes
+    tail_bytes = DIFF_TAIL_BYTES if tail_bytes is None else tail_bytes
+    METRICS.incr('git_subprocesses')
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    captures = []
+    current = DiffCapture(head_bytes, tail_bytes)
+    total_read = 0
+    killed = False
     
     try:
-        payload = {
-            "model": GROQ_MODEL,
-            "messages": [
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": f"Code changes:\n\n{diff}"}
-            ],
-            "temperature": 0.3,
-            "max_tokens": 100
-        }
-        
-        payload_bytes = json.dumps(payload).encode('utf-8')
-        request = Request(
-            GROQ_API_URL,
-            data=payload_bytes,
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {GROQ_API_KEY}'
-            }
-        )
-        
-        with urlopen(request, timeout=30) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            generated_text = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-            
-            if not generated_text:
-                print("[WARN] Groq returned an empty response")
-                return None
+        while True:
+            chunk = process.stdout.read1(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            total_read += len(chunk)
             
-            return generated_text
+            if split_records:
+                parts = chunk.split(b'\x1e')
+                current.feed(parts[0])
+                for part in parts[1:]:
+                    captures.append(current)
+                    current = DiffCapture(head_bytes, tail_bytes)
+                    current.feed(part)
+            else:
+                current.feed(chunk)
+                if total_read >= DIFF_MAX_READ_BYTES:
+                    # Enough for the budget - don't wait for a huge diff to finish
+                    process.kill()
+                    killed = True
+                    break
+        captures.append(current)
+        stderr = process.stderr.read().decode('utf-8', errors='replace')
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+        process.wait()
     
-    except Exception as e:
-        print(f"[WARN] Groq API error: {e}")
-        return None
+    METRICS.incr('diff_bytes_read', total_read)
+    METRICS.incr('diff_bytes_skipped', sum(c.skipped_bytes for c in captures))
+    if killed:
+        print(f"[WARN] Diff exceeds {DIFF_MAX_READ_BYTES // (1024 * 1024)} MB - stopped reading early")
+    
+    returncode = 0 if killed else process.returncode
+    return returncode, stderr, [c for c in captures if c.prefix or c.head or c.tail]
 
 
-def generate_with_ollama(diff: str) -> Optional[str]:
+def parse_diff_body(body: str) -> Tuple[list, str]:
     """
-    Use Ollama API to generate a changelog entry from the git diff.
-    Returns the generated entry or None on error.
+    Split `git diff --numstat -p` output into per-file stats and the patch text.
+    Numstat lines come first, then the patch starting at "diff --git".
     """
-    try:
-        user_prompt = f"Code changes:\n\n{diff}"
-        full_prompt = f"{SYSTEM_PROMPT}\n\n{user_prompt}"
-        
-        payload = {
-            "model": OLLAMA_MODEL,
-            "prompt": full_prompt,
-            "stream": False
-        }
-        
-        payload_bytes = json.dumps(payload).encode('utf-8')
-        request = Request(
-            OLLAMA_API_URL,
-            data=payload_bytes,
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        with urlopen(request, timeout=300) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            generated_text = result.get("response", "").strip()
-            
-            if not generated_text:
-                print("[WARN] Ollama returned an empty response")
-                return None
-            
-            return generated_text
+    diff_start = body.find('diff --git ')
+    stat_block = body if diff_start == -1 else body[:diff_start]
+    diff = "" if diff_start == -1 else body[diff_start:]
     
-    except URLError as e:
-        if "Connection refused" in str(e) or "No connection" in str(e):
-            print("[WARN] Ollama not running (connection refused)")
-        else:
-            print(f"[WARN] Ollama network error: {e}")
-        return None
-    except Exception as e:
-        print(f"[WARN] Ollama error: {e}")
-        return None
+    file_stats = []
+    for line in stat_block.split('\n'):
+        match = NUMSTAT_PATTERN.match(line)
+        if match:
+            added, deleted, path = match.groups()
+            file_stats.append((
+                None if added == '-' else int(added),
+                None if deleted == '-' else int(deleted),
+                path,
+            ))
+    
+    return file_stats, diff.strip()
+
+
+def parse_log_header(header: str, changes: GitChanges):
+    """Fill sha, timestamp and author from a LOG_RECORD_FORMAT header line."""
+    sha, timestamp, author = (header.lstrip('\x1e').split('\x1f') + ['', ''])[:3]
+    changes.sha = sha.strip()
+    changes.author = author.strip() or "Unknown"
+    try:
+        changes.timestamp = parse_git_timestamp(timestamp.strip())
+    except ValueError:
+        changes.timestamp = current_timestamp()
 
 
-def generate_changelog_entry(diff: str) -> Optional[str]:
+def parse_log_records(output: str) -> List[GitChanges]:
     """
-    Generate a changelog entry from the git diff.
-    Tries Groq first (fast, cloud), then falls back to Ollama (local).
-    Returns the generated entry or None on error.
+    Parse `git log --numstat [-p] --format=LOG_RECORD_FORMAT` output.
+    Returns one GitChanges per commit, in the order git printed them (newest first).
     """
-    # Truncate diff if too large
-    original_size = len(diff)
-    diff = truncate_diff(diff)
-    if len(diff) < original_size:
-        print(f"[WARN] Diff truncated from {original_size} to {len(diff)} characters")
+    return [parse_log_record(chunk) for chunk in output.split('\x1e') if chunk.strip()]
+
+
+def parse_log_record(chunk: str) -> GitChanges:
+    """Parse one LOG_RECORD_FORMAT record: header line, numstat lines, patch."""
+    header, _, body = chunk.partition('\n')
+    file_stats, diff = parse_diff_body(body)
+    changes = GitChanges(diff=diff, file_stats=file_stats, diff_bytes=len(diff))
+    parse_log_header(header, changes)
+    return changes
+
+
+def changes_from_capture(capture: DiffCapture, with_header: bool) -> GitChanges:
+    """Build a GitChanges record from a streamed capture."""
+    text = capture.text()
+    if with_header:
+        changes = parse_log_record(text)
+    else:
+        file_stats, diff = parse_diff_body(text)
+        changes = GitChanges(diff=diff, file_stats=file_stats, timestamp=current_timestamp())
+    changes.diff_bytes = capture.patch_bytes
+    changes.skipped_bytes = capture.skipped_bytes
+    return changes
+
+
+def collect_commit_changes(rev: str = "HEAD", with_patch: bool = True) -> Optional[GitChanges]:
+    """
+    Collect diff (against the first parent), numstat, timestamp and author
+    of a single commit with one `git log` call.
+    """
+    args = ["git", "log", "-1", "-m", "--first-parent", "--numstat", "--no-color",
+            f"--format={LOG_RECORD_FORMAT}"]
     
-    # Try Groq first (fast, reliable for CI)
-    if GROQ_API_KEY:
-        print("[INFO] Using Groq API...")
-        result = generate_with_groq(diff)
-        if result:
-            return result
-        print("[WARN] Groq failed, trying Ollama...")
+    if not with_patch:
+        result = run_git_command(args + [rev])
+        if result.returncode != 0:
+            return None
+        records = parse_log_records(result.stdout or "")
+        return records[0] if records else None
     
-    # Fall back to Ollama (local)
-    if check_ollama_running():
-        print("[INFO] Using Ollama (local)...")
-        result = generate_with_ollama(diff)
-        if result:
-            return result
+    returncode, _, captures = stream_git_diff(args + ["-p", rev])
+    if returncode != 0 or not captures:
+        return None
+    return changes_from_capture(captures[0], with_header=True)
+
+
+def collect_git_changes(mode: str = 'auto') -> Optional[GitChanges]:
+    """
+    Collect the diff and commit metadata for the given mode.
+    Runs at most two git commands whatever the mode.
     
-    print("[ERROR] No AI provider available")
-    return None
+    Args:
+        mode: 'auto' (detect), 'ci' (merge commit), 'local' (uncommitted), 'merge' (post-merge hook)
+    
+    Returns a GitChanges record (diff may be empty) or None on error.
+    """
+    try:
+        if mode == 'ci':
+            # CI mode: compare HEAD^1 to HEAD (merge commit diff), metadata in the same call
+            return collect_commit_changes("HEAD") or GitChanges(timestamp=current_timestamp())
+        
+        if mode == 'merge':
+            # Post-merge hook: diff from ORIG_HEAD (handles fast-forward merges)
+            returncode, _, captures = stream_git_diff(["git", "diff", "--numstat", "-p", "--no-color", "ORIG_HEAD", "HEAD"])
+            if returncode != 0:
+                # No ORIG_HEAD, fall back to HEAD^1
+                return collect_commit_changes("HEAD") or GitChanges(timestamp=current_timestamp())
+        else:
+            # Local mode: uncommitted changes (staged + unstaged)
+            returncode, _, captures = stream_git_diff(["git", "diff", "--numstat", "-p", "--no-color", "HEAD"])
+            if returncode != 0:
+                # No commits yet - only staged changes exist
+                returncode, _, captures = stream_git_diff(["git", "diff", "--numstat", "-p", "--no-color", "--cached"])
+        
+        if not captures:
+            return GitChanges(timestamp=current_timestamp())
+        changes = changes_from_capture(captures[0], with_header=False)
+        
+        # Timestamp and author still come from the current commit
+        if changes.diff:
+            meta = run_git_command(["git", "log", "-1", f"--format={LOG_RECORD_FORMAT}", "HEAD"])
+            if meta.returncode == 0 and meta.stdout.strip():
+                parse_log_header(meta.stdout.strip(), changes)
+            if mode != 'merge':
+                # Uncommitted work has no commit of its own - only the diff identifies it
+                changes.sha = ""
+        
+        return changes
+    
+    except Exception as e:
+        print(f"[ERROR] Error getting diff: {e}")
+        return None
+
+
+def get_diff(mode: str = 'auto') -> Optional[str]:
+    """
+    Get git diff based on the context.
+    
+    Args:
+        mode: 'auto' (detect), 'ci' (merge commit), 'local' (uncommitted), 'merge' (post-merge hook)
+    
+    Returns the diff string or None if no changes detected.
+    """
+    changes = collect_git_changes(mode)
+    return changes.diff if changes and changes.diff else None
 
 
 # =============================================================================
-# Quality Functions: Timestamp, Validation, Deduplication
+# Diff Summarization
 # =============================================================================
 
-def format_timestamp(dt) -> str:
+MIN_FILE_BUDGET = 120  # Below this a file is only represented by its stat line
+
+
+@dataclass
+class FileDiff:
+    """One file of a parsed git diff."""
+    path: str
+    header: str
+    hunks: List[str] = field(default_factory=list)
+    additions: int = 0
+    deletions: int = 0
+    binary: bool = False
+    
+    @property
+    def size(self) -> int:
+        return len(self.header) + sum(len(hunk) for hunk in self.hunks)
+
+
+def parse_diff(diff: str) -> List[FileDiff]:
+    """Split `git diff` output into files and hunks."""
+    files = []
+    current = None
+    hunk_lines = None
+    header_lines = []
+    
+    def finish_hunk():
+        if current is not None and hunk_lines:
+            current.hunks.append("\n".join(hunk_lines) + "\n")
+    
+    def finish_file():
+        finish_hunk()
+        if current is not None:
+            current.header = "\n".join(header_lines) + "\n"
+            files.append(current)
+    
+    for line in diff.split('\n'):
+        if line.startswith('diff --git '):
+            finish_file()
+            # "diff --git a/path b/path" - the new path is authoritative
+            parts = line[len('diff --git '):].split(' b/', 1)
+            path = parts[1] if len(parts) == 2 else parts[0]
+            current = FileDiff(path=path, header="")
+            header_lines = [line]
+            hunk_lines = None
+        elif current is None:
+            continue
+        elif line.startswith('@@'):
+            finish_hunk()
+            hunk_lines = [line]
+        elif hunk_lines is not None:
+            hunk_lines.append(line)
+            if line.startswith('+'):
+                current.additions += 1
+            elif line.startswith('-'):
+                current.deletions += 1
+        else:
+            if line.startswith('Binary files') or line.startswith('GIT binary patch'):
+                current.binary = True
+            if line.startswith('+++ ') and line[4:] != '/dev/null':
+                current.path = line[4:][2:] if line[4:].startswith('b/') else line[4:]
+            # index and ---/+++ lines only repeat what "diff --git" already says
+            if not line.startswith(('index ', '--- ', '+++ ')):
+                header_lines.append(line)
+    
+    finish_file()
+    return files
+
+
+def is_noise_file(path: str) -> bool:
+    """True for lockfiles and generated files that are left out of the prompt."""
+    if path.rsplit('/', 1)[-1] in LOCKFILE_NAMES:
+        return True
+    return any(re.search(pattern, path) for pattern in GENERATED_PATTERNS)
+
+
+def is_test_file(path: str) -> bool:
+    """True for files in a test directory or named like a test."""
+    name = path.rsplit('/', 1)[-1].lower()
+    return bool(re.search(r'(^|/)(tests?|__tests__|spec)/', path) or re.search(r'(^test_|_test\.|\.test\.|\.spec\.)', name))
+
+
+def file_importance(path: str) -> float:
+    """Relative weight of a file when sharing the prompt budget."""
+    name = path.rsplit('/', 1)[-1].lower()
+    if is_test_file(path):
+        return 0.5
+    if name.endswith(('.md', '.rst', '.txt')) or path.startswith('docs/'):
+        return 0.4
+    if name.endswith(('.json', '.yml', '.yaml', '.toml', '.ini', '.cfg', '.lock')):
+        return 0.6
+    return 1.0
+
+
+def allocate_budget(files: List[FileDiff], budget: int) -> dict:
     """
-    Format datetime to readable string: "Dec 31, 2025 at 2:30 PM"
-    Cross-platform compatible (avoids %-I which is POSIX-only).
+    Share the character budget across files proportionally to importance.
+    Files that need less than their share give the rest back to the others.
+    Returns {index: allowed_chars}.
     """
-    # Use %I (with leading zero) then strip it manually for cross-platform support
-    formatted = dt.strftime("%b %d, %Y at %I:%M %p")
-    # Remove leading zero from hour: "at 02:30" -> "at 2:30"
-    formatted = formatted.replace(" at 0", " at ")
-    return formatted
+    allocation = {}
+    pending = {i: file_importance(f.path) for i, f in enumerate(files)}
+    
+    while pending and budget > 0:
+        total_weight = sum(pending.values())
+        satisfied = [i for i, weight in pending.items() if files[i].size <= budget * weight / total_weight]
+        if not satisfied:
+            for i, weight in pending.items():
+                allocation[i] = int(budget * weight / total_weight)
+            break
+        for i in satisfied:
+            allocation[i] = files[i].size
+            budget -= files[i].size
+            del pending[i]
+    
+    return allocation
+
+
+def render_file(file_diff: FileDiff, limit: int) -> str:
+    """Render a file's header and as many whole hunks as fit in limit characters."""
+    parts = [file_diff.header]
+    used = len(file_diff.header)
+    limit -= 40  # Room for the omission marker
+    cut_short = False
+    omitted = 0
+    
+    for hunk in file_diff.hunks:
+        if not cut_short and used + len(hunk) <= limit:
+            parts.append(hunk)
+            used += len(hunk)
+            continue
+        
+        if not cut_short:
+            cut_short = True
+            # Partial hunk, cut at a line boundary
+            cut = hunk.rfind('\n', 0, limit - used)
+            if limit - used >= MIN_FILE_BUDGET // 2 and cut > 0:
+                parts.append(hunk[:cut + 1])
+                used += cut + 1
+                continue
+        omitted += 1
+    
+    if omitted:
+        parts.append(f"... [{omitted} more hunk{'s' if omitted != 1 else ''} omitted]\n")
+    elif cut_short:
+        parts.append("...\n")
+    return "".join(parts)
+
+
+def format_stat_header(files: List[FileDiff], file_stats: Optional[list], max_chars: int) -> str:
+    """
+    One line per changed file with its line counts, most important first.
+    Uses numstat when available (it covers files lost while streaming).
+    """
+    if file_stats:
+        stats = [(path, added, deleted) for added, deleted, path in file_stats]
+    else:
+        stats = [(f.path, None if f.binary else f.additions, None if f.binary else f.deletions) for f in files]
+    
+    def sort_key(stat):
+        path, added, deleted = stat
+        return (is_noise_file(path), -file_importance(path), -((added or 0) + (deleted or 0)))
+    
+    lines = []
+    used = 0
+    for index, (path, added, deleted) in enumerate(sorted(stats, key=sort_key)):
+        counts = "binary" if added is None else f"+{added} -{deleted}"
+        note = ", omitted" if is_noise_file(path) else ""
+        line = f"  {path} ({counts}{note})\n"
+        if used + len(line) > max_chars:
+            lines.append(f"  ... and {len(stats) - index} more files\n")
+            break
+        lines.append(line)
+        used += len(line)
+    
+    return f"Files changed ({len(stats)}):\n" + "".join(lines) + "\n"
+
+
+def summarize_diff(diff: str, max_chars: int = MAX_DIFF_CHARS, file_stats: Optional[list] = None) -> str:
+    """
+    Fit a diff into max_chars by sharing the budget across files and hunks.
+    
+    Lockfiles, binaries and generated files are dropped (they still appear in
+    the stat header), and every remaining file gets a share of the budget by
+    size and importance, so multi-file merges are not reduced to their first file.
+    Falls back to truncate_diff() for input that is not a git diff.
+    """
+    if len(diff) <= max_chars:
+        return diff
+    
+    files = parse_diff(diff)
+    if not files:
+        return truncate_diff(diff, max_chars)
+    
+    # The stat header may use at most a quarter of the budget
+    header = format_stat_header(files, file_stats, max_chars // 4)
+    budget = max_chars - len(header)
+    kept = [f for f in files if not f.binary and not is_noise_file(f.path)]
+    
+    # Too many files to show them all usefully - keep the most important ones
+    max_files = max(1, budget // (2 * MIN_FILE_BUDGET))
+    if len(kept) > max_files:
+        ranked = sorted(kept, key=lambda f: (-file_importance(f.path), -f.size))[:max_files]
+        kept = [f for f in kept if f in ranked]
+    
+    allocation = allocate_budget(kept, budget)
+    
+    bodies = [render_file(f, allocation[i]) for i, f in enumerate(kept) if allocation.get(i, 0) >= MIN_FILE_BUDGET]
+    summary = header + "".join(bodies)
+    
+    # Per-file rendering can overshoot by a line; never hand the LLM more than the budget
+    return summary if len(summary) <= max_chars else truncate_diff(summary, max_chars)
+
+
+# =============================================================================
+# Rule-Based Classification
+# =============================================================================
+
+# A changed line that only carries a version number, e.g. '+  "version": "1.2.3",'
+VERSION_LINE = re.compile(
+    r'''^[+-]\s*(?:"version"\s*:|version\s*[=:]|__version__\s*=|VERSION\s*=|<version>)?\s*'''
+    r'''["']?v?(\d+\.\d+\.\d+[\w.+-]*?)["']?,?\s*(?:</version>)?\s*$''',
+    re.IGNORECASE
+)
+
+
+def is_docs_file(path: str) -> bool:
+    """True for documentation files (requirements.txt and other .txt config are not)."""
+    name = path.rsplit('/', 1)[-1].lower()
+    return (name.endswith(('.md', '.rst', '.adoc')) or path.startswith(('docs/', 'doc/'))
+            or name in ('license', 'license.txt', 'authors', 'notice'))
+
+
+def describe_files(paths: List[str], noun: str) -> str:
+    """'README.md and docs/setup.md', or '<noun> (7 files)' when there are many."""
+    names = sorted(set(paths))
+    if len(names) == 1:
+        return names[0]
+    if len(names) <= 3:
+        return ", ".join(names[:-1]) + f" and {names[-1]}"
+    return f"{noun} ({len(names)} files)"
+
+
+def get_version_bump(diff: str, file_stats: list) -> Optional[str]:
+    """
+    The new version if every changed line of the diff only carries a
+    version number, else None. Line counts must match the numstat, so a
+    diff cut short while streaming never qualifies.
+    """
+    expected = sum((added or 0) + (deleted or 0) for added, deleted, _ in file_stats)
+    if not expected or expected > VERSION_BUMP_MAX_LINES:
+        return None
+    
+    changed = 0
+    version = None
+    for line in diff.split('\n'):
+        if not line.startswith(('+', '-')) or line.startswith(('+++', '---')):
+            continue
+        match = VERSION_LINE.match(line)
+        if not match:
+            return None
+        changed += 1
+        if line.startswith('+'):
+            version = match.group(1)
+    return version if changed == expected else None
+
+
+def classify_trivial_change(diff: str, file_stats: Optional[list] = None) -> Optional[str]:
+    """
+    Entry for a change whose kind is unambiguous from its file list, or None
+    if it needs the LLM. Rules, most specific first:
+    
+        version   only version numbers changed  -> chore: bump version to X
+        lockfile  only lockfiles                -> chore: update <lockfiles>
+        docs      only documentation            -> docs: update <files>
+        tests     only test files               -> test: update <files>
+    
+    Hits are counted per rule (rule_hits_<rule>) so the rules can be tuned.
+    """
+    if not RULES_ENABLED or not diff:
+        return None
+    if not file_stats:
+        file_stats = [(None if f.binary else f.additions, None if f.binary else f.deletions, f.path)
+                      for f in parse_diff(diff)]
+    paths = [path for _, _, path in file_stats]
+    if not paths:
+        return None
+    
+    rule = entry = None
+    names = [path.rsplit('/', 1)[-1] for path in paths]
+    if all(name in VERSION_FILE_NAMES or name in LOCKFILE_NAMES for name in names):
+        version = get_version_bump(diff, file_stats)
+        if version:
+            rule, entry = 'version', f"chore: bump version to {version}"
+    if rule is None and all(name in LOCKFILE_NAMES for name in names):
+        rule, entry = 'lockfile', f"chore: update {describe_files(names, 'dependency lockfiles')}"
+    elif rule is None and all(is_docs_file(path) for path in paths):
+        rule, entry = 'docs', f"docs: update {describe_files(paths, 'documentation')}"
+    elif rule is None and all(is_test_file(path) for path in paths):
+        rule, entry = 'tests', f"test: update {describe_files(paths, 'tests')}"
+    
+    if rule is None:
+        return None
+    METRICS.incr(f'rule_hits_{rule}')
+    print(f"[INFO] Trivial change ({rule} rule) - no AI provider needed")
+    return entry
+
+
+# =============================================================================
+# Token Budgets
+# =============================================================================
+
+# How BPE tokenizers roughly split code: words, runs of up to 3 digits,
+# newlines, indentation and symbols (pairs like "()" are often one token)
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|\n| {2,}|[^\sA-Za-z\d]{1,2}")
+TOKEN_SAMPLE_CHARS = 32 * 1024  # Characters sampled to measure a diff's characters per token
+
+_model_stats = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Pure-Python estimate of a prompt's token count (no tokenizer needed).
+    One token per word, number group or symbol, plus one for every 8
+    characters of long identifiers.
+    """
+    words = TOKEN_PATTERN.findall(text)
+    return len(words) + sum(len(word) // 8 for word in words if len(word) > 8)
+
+
+def get_model_stats_file() -> Optional[Path]:
+    """Where observed model speeds are kept (None if disk caching is off)."""
+    cache_dir = get_cache_dir() if CACHE_ENABLED else None
+    return cache_dir / MODEL_STATS_FILE_NAME if cache_dir else None
+
+
+def load_stats_document() -> dict:
+    """Contents of the stats file: {'models': {...}, 'routing': [...]}."""
+    global _model_stats
+    if _model_stats is None:
+        _model_stats = {'models': {}, 'routing': []}
+        stats_file = get_model_stats_file()
+        try:
+            if stats_file is not None:
+                document = json.loads(stats_file.read_text(encoding='utf-8'))
+                _model_stats['models'] = document.get('models', {})
+                _model_stats['routing'] = document.get('routing', [])
+        except (OSError, ValueError, AttributeError):
+            pass
+    return _model_stats
+
 
+def load_model_stats() -> dict:
+    """Observed performance per model: {model: {'tokens_per_second', 'latencies', 'updated'}}."""
+    return load_stats_document()['models']
 
-def get_merge_timestamp() -> str:
+
+def save_model_stats(provider_calls: list, routing: list = ()):
     """
-    Get the timestamp of the current commit in readable format.
-    Returns: "Dec 31, 2025 at 2:30 PM"
+    Fold this run's provider calls into the observed speed of each model
+    (prompt tokens per second of wall-clock time, as a moving average) and
+    its window of recent latencies, and append the run's routing decisions.
     """
+    stats_file = get_model_stats_file()
+    if not (provider_calls or routing) or stats_file is None:
+        return
+    
+    document = load_stats_document()
+    stats = document['models']
+    now = int(time.time())
+    observed = {}
+    for call in provider_calls:
+        model_stats = stats.setdefault(call['model'], {})
+        model_stats['latencies'] = (model_stats.get('latencies', []) + [call['seconds']])[-ROUTING_LATENCY_WINDOW:]
+        model_stats['updated'] = now
+        if call['ok'] and call['prompt_tokens'] and call['seconds'] > 0:
+            tokens, seconds = observed.get(call['model'], (0, 0.0))
+            observed[call['model']] = (tokens + call['prompt_tokens'], seconds + call['seconds'])
+    
+    for model, (tokens, seconds) in observed.items():
+        speed = tokens / seconds
+        previous = stats[model].get('tokens_per_second')
+        if previous:
+            speed = MODEL_STATS_SMOOTHING * speed + (1 - MODEL_STATS_SMOOTHING) * previous
+        stats[model]['tokens_per_second'] = round(speed, 1)
+    document['routing'] = (document['routing'] + list(routing))[-ROUTING_LOG_SIZE:]
+    
+    payload = json.dumps(document, indent=2).encode('utf-8')
     try:
-        result = run_git_command(["git", "show", "-s", "--format=%ci", "HEAD"])
-        if result.returncode == 0 and result.stdout.strip():
-            # Parse ISO format: "2025-12-31 14:30:00 +0000"
-            timestamp_str = result.stdout.strip()
-            # Remove timezone for parsing
-            timestamp_str = timestamp_str.rsplit(' ', 1)[0]
-            dt = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-            return format_timestamp(dt)
-    except Exception as e:
-        print(f"[WARN] Could not get commit timestamp: {e}")
+        stats_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(stats_file, lambda f: f.write(payload))
+    except OSError:
+        pass
+
+
+def get_chars_per_token(text: str) -> float:
+    """Characters per estimated token, measured on a sample of the text."""
+    sample = text[:TOKEN_SAMPLE_CHARS]
+    return len(sample) / max(estimate_tokens(sample), 1) if sample else CHARS_PER_TOKEN
+
+
+def get_prompt_budget(model: str) -> int:
+    """
+    Prompt tokens to spend on one request to model: what it processed within
+    PROMPT_LATENCY_TARGET in earlier runs, floored at its profile's prompt
+    size (a run that looked slow must not starve later prompts) and never
+    more than its context window allows.
+    """
+    profile = MODEL_PROFILES.get(model, DEFAULT_MODEL_PROFILE)
+    ceiling = profile['context'] - COMPLETION_RESERVE_TOKENS
+    budget = min(profile['prompt_tokens'], ceiling)
+    speed = load_model_stats().get(model, {}).get('tokens_per_second')
+    if speed:
+        budget = max(budget, min(int(speed * PROMPT_LATENCY_TARGET), ceiling))
+    return budget
+
+
+def fit_diff_to_model(diff: str, model: str, file_stats: Optional[list] = None,
+                      system_prompt: str = SYSTEM_PROMPT) -> str:
+    """
+    Summarize a diff to fill the model's prompt budget (see get_prompt_budget).
+    The budget in tokens is turned into characters using this diff's own
+    characters-per-token ratio, measured on a sample.
+    """
+    budget = get_prompt_budget(model) - estimate_tokens(system_prompt) - 10
+    fitted = summarize_diff(diff, int(budget * get_chars_per_token(diff)), file_stats=file_stats)
+    tokens = estimate_tokens(fitted)
+    if tokens > budget:
+        # The sample was not representative - shrink once by the measured overshoot
+        fitted = summarize_diff(diff, int(len(fitted) * budget / tokens), file_stats=file_stats)
+    return fitted
+
+
+# =============================================================================
+# Model Routing (--route)
+# =============================================================================
+
+def predict_prompt_tokens(diff: str) -> int:
+    """Tokens the whole diff would take as a prompt, before it is fitted to a model."""
+    return estimate_tokens(SYSTEM_PROMPT) + int(len(diff) / get_chars_per_token(diff))
+
+
+def get_latency_percentile(model: str, pct: float = 90) -> Optional[float]:
+    """
+    Nearest-rank percentile of the model's recent call latencies, from the
+    stats file (None until ROUTING_MIN_SAMPLES calls were seen).
+    """
+    latencies = sorted(load_model_stats().get(model, {}).get('latencies', []))
+    if len(latencies) < ROUTING_MIN_SAMPLES:
+        return None
+    return latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+
+
+def route_model(provider: str, diff: str) -> dict:
+    """
+    Pick the model for one request to provider.
+    Returns the decision: {'provider', 'model', 'predicted_tokens', 'reason'}.
     
-    # Fallback to current time
-    return format_timestamp(datetime.now())
+    Without --route this is always the provider's default model. With it,
+    the diff goes to the smallest tier in MODEL_TIERS whose limit fits its
+    predicted prompt tokens ('size'), then one tier down for as long as the
+    chosen model's p90 latency is above ROUTING_LATENCY_TARGET ('latency').
+    """
+    default = GROQ_MODEL if provider == 'groq' else OLLAMA_MODEL
+    if not ROUTING_ENABLED:
+        return {'provider': provider, 'model': default, 'predicted_tokens': None, 'reason': 'default'}
+    
+    tiers = MODEL_TIERS.get(provider) or [(None, default)]
+    if provider == 'ollama':
+        # Only local models that are pulled (the health probe is cached)
+        tiers = [tier for tier in tiers if check_model_available(tier[1])] or [(None, default)]
+    
+    predicted = predict_prompt_tokens(diff)
+    index = next((i for i, (limit, _) in enumerate(tiers) if limit is None or predicted <= limit), len(tiers) - 1)
+    reason = 'size'
+    while index > 0:
+        p90 = get_latency_percentile(tiers[index][1])
+        if p90 is None or p90 <= ROUTING_LATENCY_TARGET:
+            break
+        index -= 1
+        reason = 'latency'
+    
+    return {'provider': provider, 'model': tiers[index][1], 'predicted_tokens': predicted, 'reason': reason}
+
+
+def route_and_fit(provider: str, diff: str, file_stats: Optional[list] = None) -> Tuple[dict, str]:
+    """Route a request to provider (see route_model) and fit the diff to that model's prompt budget."""
+    route = route_model(provider, diff)
+    model = route['model']
+    if ROUTING_ENABLED:
+        print(f"[INFO] Routing {provider} to {model} "
+              f"(~{route['predicted_tokens']} predicted tokens, by {route['reason']})")
+    with METRICS.stage('summarize'):
+        prompt = fit_diff_to_model(diff, model, file_stats)
+    tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt)
+    print(f"[INFO] Prompt for {model}: ~{tokens} tokens (budget {get_prompt_budget(model)})")
+    return route, prompt
+
+
+def record_route(route: dict, ok: bool, start: float):
+    """Log a routing decision with its outcome (saved to the stats file at the end of the run)."""
+    if ROUTING_ENABLED:
+        METRICS.record_routing(route, ok, time.perf_counter() - start)
+
+
+# =============================================================================
+# Groq Rate Limiting
+# =============================================================================
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread of the process.
+    
+    Requests are paced at the configured rate, and the server's rate-limit
+    headers (or a 429) can pause all callers until the quota resets.
+    """
+    
+    def __init__(self, requests_per_minute: int, burst: int):
+        self.rate = max(requests_per_minute, 1) / 60.0
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may be sent (a cancelled race loser stops waiting)."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            cancellable_sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Hold back every caller for the given time and empty the bucket."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+    
+    def update_from_headers(self, headers: dict):
+        """Pause until reset when Groq reports an exhausted request or token quota."""
+        for kind in ('requests', 'tokens'):
+            if headers.get(f'x-ratelimit-remaining-{kind}') == '0':
+                reset = parse_duration(headers.get(f'x-ratelimit-reset-{kind}', ''))
+                if reset:
+                    self.pause(reset)
+
 
+GROQ_RATE_LIMITER = RateLimiter(GROQ_REQUESTS_PER_MINUTE, GROQ_BURST)
 
-def get_files_changed_count() -> int:
+
+def parse_duration(value: str) -> Optional[float]:
     """
-    Get the number of files changed in the current commit.
-    For merge commits, compares HEAD^1 to HEAD.
-    Returns the count of changed files.
+    Parse a rate-limit duration in seconds.
+    Accepts plain seconds ("7", "7.66") and Groq's "1h2m3.5s" / "250ms" forms.
     """
+    value = (value or '').strip()
+    if not value:
+        return None
     try:
-        # For merge commits (like GitHub PR merges), use diff from first parent
-        result = run_git_command(["git", "diff", "--name-only", "HEAD^1", "HEAD"])
-        if result.returncode == 0:
-            stdout = result.stdout.strip()
-            return len([f for f in stdout.split('\n') if f]) if stdout else 0
-        
-        # Fallback for non-merge commits (only if first command failed)
-        result = run_git_command(["git", "diff-tree", "--no-commit-id", "--name-only", "-r", "HEAD"])
-        if result.returncode == 0:
-            stdout = result.stdout.strip()
-            return len([f for f in stdout.split('\n') if f]) if stdout else 0
-    except Exception as e:
-        print(f"[WARN] Could not get files changed count: {e}")
-    return 0
+        return float(value)
+    except ValueError:
+        pass
+    
+    match = re.fullmatch(r'(?:(\d+)h)?(?:(\d+)m(?!s))?(?:([\d.]+)s)?(?:([\d.]+)ms)?', value)
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds, millis = match.groups()
+    return (int(hours or 0) * 3600 + int(minutes or 0) * 60
+            + float(seconds or 0) + float(millis or 0) / 1000)
+
 
+def get_retry_delay(attempt: int, headers: dict) -> float:
+    """Delay before retry number attempt+1: Retry-After if given, else jittered exponential backoff."""
+    import random
+    
+    retry_after = parse_duration(headers.get('retry-after', ''))
+    if retry_after is not None:
+        return retry_after + random.uniform(0, 0.5)
+    backoff = min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * (2 ** attempt))
+    return backoff * random.uniform(0.5, 1.0)
+
+
+# =============================================================================
+# AI Providers
+# =============================================================================
 
-def get_commit_author() -> str:
+def generate_with_groq(diff: str, system_prompt: str = SYSTEM_PROMPT, max_tokens: int = 100,
+                       json_output: bool = False, model: Optional[str] = None) -> Optional[str]:
     """
-    Get the author of the current commit.
-    Returns the author name.
+    Use Groq API to generate a changelog entry from the git diff.
+    Returns the generated entry or None on error.
+    
+    Packed requests (see generate_packed_entries) pass their own prompt
+    and ask for a JSON object with json_output. model defaults to GROQ_MODEL.
     """
+    if not GROQ_API_KEY:
+        return None
+    
+    model = model or GROQ_MODEL
+    # Wall time of each HTTP attempt - rate limiter and backoff waits are not
+    # the model's latency and would skew routing and prompt budgets
+    attempt_seconds = []
     try:
-        result = run_git_command(["git", "show", "-s", "--format=%an", "HEAD"])
-        if result.returncode == 0 and result.stdout.strip():
-            return result.stdout.strip()
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Code changes:\n\n{diff}"}
+            ],
+            "temperature": 0.3,
+            "max_tokens": max_tokens
+        }
+        if json_output:
+            payload["response_format"] = {"type": "json_object"}
+        METRICS.incr('estimated_prompt_tokens', estimate_tokens(system_prompt) + estimate_tokens(diff))
+        
+        payload_bytes = json.dumps(payload).encode('utf-8')
+        body = send_groq_request(payload_bytes, attempt_seconds)
+        
+        result = json.loads(body.decode('utf-8'))
+        generated_text = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+        usage = result.get("usage") or {}
+        METRICS.record_provider('groq', model, attempt_seconds[-1], bool(generated_text),
+                                usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        
+        if not generated_text:
+            print("[WARN] Groq returned an empty response")
+            return None
+        
+        return generated_text
+    
     except Exception as e:
-        print(f"[WARN] Could not get commit author: {e}")
-    return "Unknown"
+        if is_request_cancelled():
+            # Lost a race - not a provider failure
+            return None
+        if attempt_seconds:
+            METRICS.record_provider('groq', model, attempt_seconds[-1], False)
+        print(f"[WARN] Groq API error: {e}")
+        return None
+
+
+def send_groq_request(payload_bytes: bytes, attempt_seconds: Optional[list] = None) -> bytes:
+    """
+    POST to the Groq API through the shared rate limiter.
+    Retries 429 and 5xx responses with backoff; a 429 pauses every thread.
+    Returns the response body.
+    
+    The wall time of every HTTP attempt (from after the rate limiter lets
+    it through to its response) is appended to attempt_seconds.
+    """
+    from urllib.error import HTTPError
+    
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        if is_request_cancelled():
+            raise ConnectionAbortedError("request cancelled")
+        GROQ_RATE_LIMITER.acquire()
+        started = time.perf_counter()
+        try:
+            try:
+                _, headers, body = http_request(
+                    'POST',
+                    GROQ_API_URL,
+                    body=payload_bytes,
+                    headers={
+                        'Content-Type': 'application/json',
+                        'Authorization': f'Bearer {GROQ_API_KEY}'
+                    },
+                    timeout=30
+                )
+            finally:
+                if attempt_seconds is not None:
+                    attempt_seconds.append(time.perf_counter() - started)
+            GROQ_RATE_LIMITER.update_from_headers(headers)
+            return body
+        except HTTPError as e:
+            headers = {k.lower(): v for k, v in e.headers.items()} if e.headers else {}
+            GROQ_RATE_LIMITER.update_from_headers(headers)
+            if attempt == GROQ_MAX_RETRIES or (e.code != 429 and e.code < 500):
+                raise
+            
+            delay = get_retry_delay(attempt, headers)
+            print(f"[WARN] Groq returned HTTP {e.code}, retrying in {delay:.1f}s ({attempt + 1}/{GROQ_MAX_RETRIES})")
+            if e.code == 429:
+                # Quota is shared - hold back the other workers too
+                GROQ_RATE_LIMITER.pause(delay)
+            else:
+                cancellable_sleep(delay)
+
+
+def is_entry_line(line: str) -> bool:
+    """True if a line (ignoring bullets) starts with a Conventional Commits prefix."""
+    line = line.strip()
+    if line[:2] in ('- ', '+ ', '* '):
+        line = line[2:]
+    return line.lower().startswith(tuple(VALID_PREFIXES))
+
+
+def generate_with_ollama(diff: str, system_prompt: str = SYSTEM_PROMPT, json_output: bool = False,
+                         single_entry: bool = True, model: Optional[str] = None) -> Optional[str]:
+    """
+    Use Ollama API to generate a changelog entry from the git diff.
+    Returns the generated entry or None on error.
+    
+    With json_output the reply is constrained to JSON. It is read whole, like
+    any reply that is not a single entry (streaming stops at the first entry line).
+    model defaults to OLLAMA_MODEL.
+    """
+    from urllib.error import URLError
+    
+    model = model or OLLAMA_MODEL
+    start = time.perf_counter()
+    try:
+        user_prompt = f"Code changes:\n\n{diff}"
+        full_prompt = f"{system_prompt}\n\n{user_prompt}"
+        
+        stream = OLLAMA_STREAM and single_entry and not json_output
+        payload = {
+            "model": model,
+            "prompt": full_prompt,
+            "stream": stream
+        }
+        if json_output:
+            payload["format"] = "json"
+        # Streaming stops before Ollama's final counts - the estimate stands in for them
+        prompt_tokens = estimate_tokens(full_prompt)
+        METRICS.incr('estimated_prompt_tokens', prompt_tokens)
+        
+        payload_bytes = json.dumps(payload).encode('utf-8')
+        
+        # Time the request alone, as for Groq - this feeds routing and prompt budgets
+        start = time.perf_counter()
+        if stream:
+            generated_text, usage = stream_ollama_entry(payload_bytes)
+        else:
+            _, _, body = http_request(
+                'POST',
+                OLLAMA_API_URL,
+                body=payload_bytes,
+                headers={'Content-Type': 'application/json'},
+                timeout=300
+            )
+            usage = json.loads(body.decode('utf-8'))
+            generated_text = usage.get("response", "").strip()
+        
+        if is_request_cancelled():
+            # Lost a race - a stream cut short is not a provider failure
+            return None
+        METRICS.record_provider('ollama', model, time.perf_counter() - start, bool(generated_text),
+                                usage.get("prompt_eval_count") or prompt_tokens, usage.get("eval_count"))
+        
+        if not generated_text:
+            print("[WARN] Ollama returned an empty response")
+            return None
+        
+        return generated_text
+    
+    except ConnectionRefusedError:
+        METRICS.record_provider('ollama', model, time.perf_counter() - start, False)
+        print("[WARN] Ollama not running (connection refused)")
+        # Remember it so later runs skip Ollama without probing
+        save_ollama_health({'url': OLLAMA_TAGS_URL, 'checked': time.time(), 'reachable': False, 'models': []})
+        return None
+    except URLError as e:
+        METRICS.record_provider('ollama', model, time.perf_counter() - start, False)
+        print(f"[WARN] Ollama network error: {e}")
+        return None
+    except Exception as e:
+        if is_request_cancelled():
+            return None
+        METRICS.record_provider('ollama', model, time.perf_counter() - start, False)
+        print(f"[WARN] Ollama error: {e}")
+        return None
+
+
+def stream_ollama_entry(payload_bytes: bytes) -> Tuple[str, dict]:
+    """
+    Read NDJSON chunks from /api/generate and stop as soon as a complete
+    line with a valid Conventional Commits prefix has been generated.
+    Returns that line, or the whole response if no such line appears,
+    with token usage (Ollama's final counts, or the chunks seen if stopped early).
+    """
+    start = time.time()
+    text = ""
+    checked_lines = 0
+    usage = {"eval_count": 0}
+    
+    lines = http_stream_lines(
+        'POST',
+        OLLAMA_API_URL,
+        body=payload_bytes,
+        headers={'Content-Type': 'application/json'},
+        timeout=300
+    )
+    try:
+        for raw_line in lines:
+            if not raw_line.strip():
+                continue
+            chunk = json.loads(raw_line.decode('utf-8'))
+            token = chunk.get("response", "")
+            
+            if token and not text:
+                ttft = time.time() - start
+                METRICS.incr('ollama_first_token_ms', int(ttft * 1000))
+                print(f"[INFO] Ollama first token after {ttft:.2f}s")
+            text += token
+            usage["eval_count"] += 1 if token else 0
+            
+            # Only lines followed by a newline are complete
+            completed = text.split('\n')[:-1]
+            for line in completed[checked_lines:]:
+                if is_entry_line(line):
+                    print(f"[INFO] Ollama entry complete after {time.time() - start:.2f}s")
+                    return line.strip(), usage
+            checked_lines = len(completed)
+            
+            if chunk.get("done"):
+                usage = chunk
+                break
+    finally:
+        # Closes the connection if we stopped early, so Ollama stops generating
+        lines.close()
+    
+    return text.strip(), usage
+
+
+# =============================================================================
+# LLM Result Cache
+# =============================================================================
+
+_cache_lock = threading.Lock()
+_cache_dirs = {}  # Absolute cache directory per repository directory (None outside a repository)
+_repo_local = threading.local()  # Repository a --repos worker thread is working on
+CACHE_STATS = {'hits': 0, 'misses': 0}
+
+
+def get_cache_dir() -> Optional[Path]:
+    """
+    Get the absolute cache directory inside the git directory (.git/changelog-cache)
+    of the current repository: the one this thread works on in --repos mode,
+    otherwise the working directory's. Returns None if not in a git repository.
+    """
+    repo = getattr(_repo_local, 'path', None) or os.getcwd()
+    if repo not in _cache_dirs:
+        git_dir = Path(repo) / ".git"
+        if not git_dir.is_dir():
+            # Worktrees and submodules use a .git file - ask git for the real location
+            result = run_git_command(["git", "-C", repo, "rev-parse", "--git-common-dir"])
+            git_dir = Path(repo) / result.stdout.strip() if result.returncode == 0 and result.stdout.strip() else None
+        _cache_dirs[repo] = git_dir.resolve() / CACHE_DIR_NAME if git_dir else None
+    return _cache_dirs[repo]
+
+
+def get_cache_key(provider: str, model: str, diff: str) -> str:
+    """Content-addressed key for a generation request."""
+    import hashlib
+    
+    payload = json.dumps([provider, model, SYSTEM_PROMPT, diff])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_get(provider: str, model: str, diff: str) -> Optional[str]:
+    """
+    Look up a previously generated entry.
+    Returns the cached entry or None if missing, expired or unreadable.
+    """
+    cache_dir = get_cache_dir()
+    if not CACHE_ENABLED or cache_dir is None:
+        return None
+    
+    cache_path = cache_dir / f"{get_cache_key(provider, model, diff)}.json"
+    try:
+        if time.time() - cache_path.stat().st_mtime > CACHE_MAX_AGE_DAYS * 86400:
+            return None
+        data = json.loads(cache_path.read_text(encoding='utf-8'))
+        # Refresh mtime so eviction drops the least recently used entries
+        os.utime(cache_path)
+        return data.get('entry') or None
+    except (OSError, ValueError):
+        return None
+
+
+def cache_put(provider: str, model: str, diff: str, entry: str):
+    """Store a generated entry, then evict old entries if over the limits."""
+    import tempfile
+    
+    cache_dir = get_cache_dir()
+    if not CACHE_ENABLED or cache_dir is None:
+        return
+    
+    key = get_cache_key(provider, model, diff)
+    data = {
+        'provider': provider,
+        'model': model,
+        'entry': entry,
+        'created': int(time.time()),
+    }
+    
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file first so concurrent readers never see partial JSON
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_dir / f"{key}.json")
+        evict_cache(cache_dir)
+    except OSError as e:
+        print(f"[WARN] Could not write cache entry: {e}")
+
+
+def evict_cache(cache_dir: Path):
+    """Remove expired entries and the least recently used ones beyond CACHE_MAX_ENTRIES."""
+    with _cache_lock:
+        now = time.time()
+        entries = []
+        for path in cache_dir.glob(CACHE_ENTRY_GLOB):
+            try:
+                mtime = path.stat().st_mtime
+                if now - mtime > CACHE_MAX_AGE_DAYS * 86400:
+                    path.unlink()
+                else:
+                    entries.append((mtime, path))
+            except OSError:
+                continue
+        
+        if len(entries) > CACHE_MAX_ENTRIES:
+            entries.sort()
+            for _, path in entries[:len(entries) - CACHE_MAX_ENTRIES]:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+def cache_lookup(diff: str, prompts: Optional[dict] = None, models: Optional[dict] = None) -> Optional[str]:
+    """
+    Check the cache for every configured provider (same order as generation).
+    prompts maps a provider to the diff fitted for its model, if they differ;
+    models maps a provider to a routed model (see route_model).
+    Counts one hit or miss per lookup.
+    """
+    if not CACHE_ENABLED:
+        return None
+    
+    models = models or {}
+    candidates = []
+    if GROQ_API_KEY:
+        candidates.append(('groq', models.get('groq', GROQ_MODEL)))
+    candidates.append(('ollama', models.get('ollama', OLLAMA_MODEL)))
+    
+    for provider, model in candidates:
+        entry = cache_get(provider, model, (prompts or {}).get(provider, diff))
+        if entry:
+            with _cache_lock:
+                CACHE_STATS['hits'] += 1
+            print(f"[INFO] Using cached {provider} result")
+            return entry
+    
+    with _cache_lock:
+        CACHE_STATS['misses'] += 1
+    return None
+
+
+def print_cache_stats():
+    """Print cache hit/miss counters for this run."""
+    if CACHE_ENABLED:
+        print(f"[INFO] Cache: {CACHE_STATS['hits']} hit(s), {CACHE_STATS['misses']} miss(es)")
+
+
+# =============================================================================
+# Provider Racing
+# =============================================================================
+
+# Chat filler some models put after the prefix ("feat: Sure! Here you go")
+CONVERSATIONAL_DESCRIPTION = re.compile(
+    r"^(sure|certainly|of course|okay|absolutely|here(?:'s| is| are| you go)|as requested|i(?:'ve| have|'ll| will))\b",
+    re.IGNORECASE)
+
+
+def is_valid_entry(entry: str) -> bool:
+    """
+    True if an LLM answer is usable as-is: its first line, ignoring a bullet,
+    has a Conventional Commits prefix and a description (or an old-style
+    prefix validate_entry converts). A bare bullet of prose is not an entry,
+    and neither is a prefix followed by chat filler.
+    """
+    first_line = entry.strip().split('\n', 1)[0].strip()
+    if first_line[:2] in ('- ', '+ ', '* '):
+        first_line = first_line[2:].strip()
+    
+    conventional = CONVENTIONAL.match(first_line)
+    if conventional:
+        kind = conventional.group('type').lower()
+        if kind.startswith('breaking') or f"{kind}:" in VALID_PREFIXES:
+            description = conventional.group('description').strip()
+            return bool(description) and not CONVERSATIONAL_DESCRIPTION.match(description)
+    return first_line.lower().startswith(tuple(FORMAT_MAPPING))
+
+
+def generate_with_ollama_if_running(diff: str, model: Optional[str] = None) -> Optional[str]:
+    """Ollama generation including its availability check (for racing)."""
+    if not check_ollama_running():
+        return None
+    return generate_with_ollama(diff, model=model)
+
+
+async def race_providers_async(diff: str, prompts: Optional[dict] = None,
+                               models: Optional[dict] = None) -> Optional[Tuple[str, str]]:
+    """
+    Start Groq and Ollama at once and return (provider, entry) for the first
+    answer that passes is_valid_entry. The loser's connection is shut down.
+    If no answer is valid, the first non-empty one is returned.
+    prompts maps a provider to the diff fitted for its model, models to the
+    model it was routed to.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    
+    loop = asyncio.get_running_loop()
+    providers = {
+        'groq': generate_with_groq,
+        'ollama': generate_with_ollama_if_running,
+    }
+    pools = {}
+    cancel_events = {name: threading.Event() for name in providers}
+    
+    def run(name: str) -> Optional[str]:
+        pools[name] = get_http_pool()
+        _http_local.cancel_event = cancel_events[name]
+        try:
+            return providers[name]((prompts or {}).get(name, diff), model=(models or {}).get(name))
+        finally:
+            _http_local.cancel_event = None
+    
+    start = time.time()
+    executor = ThreadPoolExecutor(max_workers=len(providers))
+    tasks = {asyncio.ensure_future(loop.run_in_executor(executor, run, name)): name for name in providers}
+    fallback = None
+    
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                result = task.result() if not task.exception() else None
+                if not result:
+                    continue
+                if is_valid_entry(result):
+                    print(f"[INFO] Race won by {name} in {time.time() - start:.2f}s")
+                    for loser in pending:
+                        print(f"[INFO] Cancelling {tasks[loser]}")
+                        abort_http_connections(pools.get(tasks[loser], {}), cancel_events[tasks[loser]])
+                    return name, result
+                fallback = fallback or (name, result)
+    finally:
+        executor.shutdown(wait=False)
+    
+    if fallback:
+        print(f"[INFO] No provider returned a valid entry - using {fallback[0]} answer")
+    return fallback
+
+
+def race_providers(diff: str, prompts: Optional[dict] = None,
+                   models: Optional[dict] = None) -> Optional[Tuple[str, str]]:
+    """Synchronous wrapper for race_providers_async()."""
+    import asyncio
+    
+    return asyncio.run(race_providers_async(diff, prompts, models))
+
+
+def generate_changelog_entry(diff: str, file_stats: Optional[list] = None) -> Optional[str]:
+    """
+    Generate a changelog entry from the git diff.
+    Tries Groq first (fast, cloud), then falls back to Ollama (local).
+    Returns the generated entry or None on error.
+    
+    Args:
+        file_stats: Numstat of the change (see GitChanges), used for the
+            per-file summary header when the diff has to be shortened.
+    """
+    # Docs-, lockfile-, test- and version-only changes don't need an LLM
+    entry = classify_trivial_change(diff, file_stats)
+    if entry:
+        return entry
+    
+    # Large merges: summarize every part in parallel instead of cutting most of it.
+    # Diffs within the first provider's prompt budget fit a single prompt.
+    if MAP_REDUCE_ENABLED and estimate_tokens(diff) > get_prompt_budget(GROQ_MODEL if GROQ_API_KEY else OLLAMA_MODEL):
+        result = map_reduce_entry(diff, file_stats)
+        if result:
+            return result
+        print("[WARN] Map-reduce failed, summarizing the diff into a single prompt")
+    
+    # Pick each provider's model (by diff size and recent latency with --route) and fit the
+    # diff to its prompt budget. Routing Ollama probes it, so with --route a Groq run only
+    # routes Ollama if it falls back to it.
+    primary = 'groq' if GROQ_API_KEY else 'ollama'
+    racing = PROVIDER_STRATEGY == 'race' and GROQ_API_KEY
+    routes, prompts = {}, {}
+    for provider in ('groq', 'ollama'):
+        if provider == primary or (provider == 'ollama' and (racing or not ROUTING_ENABLED)):
+            routes[provider], prompts[provider] = route_and_fit(provider, diff, file_stats)
+    models = {provider: route['model'] for provider, route in routes.items()}
+    original_size = len(diff)
+    METRICS.incr('diff_chars_before_summary', original_size)
+    METRICS.incr('diff_chars_after_summary', len(prompts[primary]))
+    if len(prompts[primary]) < original_size:
+        print(f"[WARN] Diff summarized from {original_size} to {len(prompts[primary])} characters")
+    
+    # Re-runs of an already summarized diff skip the LLM entirely
+    cached = cache_lookup(prompts[primary], prompts, models)
+    if cached:
+        return cached
+    
+    # Race both providers - tail latency is bounded by the fastest healthy one
+    if racing:
+        print("[INFO] Racing Groq and Ollama...")
+        start = time.perf_counter()
+        winner = race_providers(prompts[primary], prompts, models)
+        if winner:
+            provider, result = winner
+            record_route(routes[provider], True, start)
+            cache_put(provider, models[provider], prompts[provider], result)
+            return result
+        print("[ERROR] No AI provider available")
+        return None
+    
+    # Try Groq first (fast, reliable for CI)
+    if GROQ_API_KEY:
+        print("[INFO] Using Groq API...")
+        start = time.perf_counter()
+        result = generate_with_groq(prompts['groq'], model=models['groq'])
+        record_route(routes['groq'], bool(result), start)
+        if result:
+            cache_put('groq', models['groq'], prompts['groq'], result)
+            return result
+        print("[WARN] Groq failed, trying Ollama...")
+    
+    # Fall back to Ollama (local)
+    if check_ollama_running():
+        print("[INFO] Using Ollama (local)...")
+        if 'ollama' not in routes:
+            routes['ollama'], prompts['ollama'] = route_and_fit('ollama', diff, file_stats)
+            models['ollama'] = routes['ollama']['model']
+        start = time.perf_counter()
+        result = generate_with_ollama(prompts['ollama'], model=models['ollama'])
+        record_route(routes['ollama'], bool(result), start)
+        if result:
+            cache_put('ollama', models['ollama'], prompts['ollama'], result)
+            return result
+    
+    print("[ERROR] No AI provider available")
+    return None
+
+
+# =============================================================================
+# Quality Functions: Timestamp, Validation, Deduplication
+# =============================================================================
+
+def format_timestamp(dt) -> str:
+    """
+    Format datetime to readable string: "Dec 31, 2025 at 2:30 PM"
+    Cross-platform compatible (avoids %-I which is POSIX-only).
+    """
+    # Use %I (with leading zero) then strip it manually for cross-platform support
+    formatted = dt.strftime("%b %d, %Y at %I:%M %p")
+    # Remove leading zero from hour: "at 02:30" -> "at 2:30"
+    formatted = formatted.replace(" at 0", " at ")
+    return formatted
+
+
+def current_timestamp() -> str:
+    """The current local time in the changelog format."""
+    from datetime import datetime
+    return format_timestamp(datetime.now())
+
+
+def parse_git_timestamp(timestamp_str: str) -> str:
+    """
+    Convert a git ISO timestamp ("2025-12-31 14:30:00 +0000", as printed by %ci)
+    to the readable changelog format.
+    """
+    from datetime import datetime
+    
+    # Remove timezone for parsing (fromisoformat avoids the slow first strptime call)
+    timestamp_str = timestamp_str.rsplit(' ', 1)[0]
+    dt = datetime.fromisoformat(timestamp_str)
+    return format_timestamp(dt)
+
+
+def validate_entry(entry: str, default_prefix: str = "feat:") -> str:
+    """
+    Ensure entry follows Conventional format, fix if needed.
+    Converts [Feature] -> feat:, [Fix] -> fix:, etc.
+    Preserves entries that already have timestamp metadata format, and
+    scoped, "type!:" and "BREAKING CHANGE:" entries.
+    
+    Entries with no recognized prefix get default_prefix (none if empty).
+    """
+    entry = entry.strip()
+    
+    # Remove leading bullet points or dashes
+    if entry.startswith('- '):
+        entry = entry[2:]
+    elif entry.startswith('+ '):
+        entry = entry[2:]
+    elif entry.startswith('* '):
+        entry = entry[2:]
+    
+    # Check if entry already has timestamp metadata format:
+    # "Dec 31, 2025 at 2:30 PM | 3 files | by John - feat: description"
+    # or older format: "Dec 31, 2025 at 2:30 PM - feat: description"
+    timestamp_pattern = r'^[A-Z][a-z]{2} \d{1,2}, \d{4} at \d{1,2}:\d{2} [AP]M'
+    if re.match(timestamp_pattern, entry):
+        # Entry already has timestamp, check if it has a valid prefix after the metadata
+        # Look for " - feat:" or " | by ... - feat:" pattern
+        for prefix in VALID_PREFIXES:
+            if f" - {prefix}" in entry.lower():
+                # Already properly formatted with timestamp and valid prefix
+                return entry
+        # Has timestamp but no valid prefix - this shouldn't happen normally
+        # Return as-is to avoid corruption
+        return entry
+    
+    # Check if already valid: "feat: ...", "fix(scope): ...", "feat!: ...", "BREAKING CHANGE: ..."
+    conventional = CONVENTIONAL.match(entry)
+    if conventional:
+        kind = conventional.group('type').lower()
+        if kind.startswith('breaking'):
+            return entry
+        if f"{kind}:" in VALID_PREFIXES:
+            # Ensure proper capitalization: "feat: message"
+            return kind + entry[len(kind):]
+    
+    entry_lower = entry.lower()
+    
+    # Try to convert from old format
+    for old_format, new_format in FORMAT_MAPPING.items():
+        if entry_lower.startswith(old_format):
+            rest = entry[len(old_format):].strip()
+            # Remove any following colons or dashes
+            if rest.startswith(':') or rest.startswith('-'):
+                rest = rest[1:].strip()
+            return f"{new_format} {rest}"
+    
+    # If no recognized format, default to feat:
+    return f"{default_prefix} {entry}" if default_prefix else entry
+
+
+def read_changelog() -> str:
+    """
+    Read the current CHANGELOG.md content.
+    Creates the file if it doesn't exist.
+    """
+    changelog_path = Path(CHANGELOG_FILE)
+    
+    if changelog_path.exists():
+        return changelog_path.read_text(encoding='utf-8')
+    else:
+        return ""
+
+
+def format_changelog_entry(validated_entry: str, timestamp: str, files_changed: int, author: str) -> str:
+    """
+    Build the changelog line for a validated entry.
+    Format: "- Dec 31, 2025 at 2:30 PM | 3 files | by John - feat: description"
+    """
+    return f"- {timestamp} | {files_changed} file{'s' if files_changed != 1 else ''} | by {author} - {validated_entry}"
+
+
+def insert_changelog_entries(content: str, formatted_entries: list) -> str:
+    """
+    Insert formatted entries (newest first) at the top of the Unreleased section.
+    Returns the new changelog content.
+    """
+    # Entries are separated by a blank line, same as repeated single inserts
+    block = "\n\n".join(formatted_entries)
+    
+    # Prepare the new content
+    existing_content = content.strip()
+    
+    unreleased = UNRELEASED_HEADING.search(existing_content)
+    
+    if not existing_content:
+        # Empty file - create structure
+        return f"# Changelog\n\n## Unreleased\n\n{block}\n"
+    elif unreleased:
+        # Find the Unreleased section and insert after it (keeping its heading style)
+        before, heading = existing_content[:unreleased.start()], unreleased.group(0)
+        rest = existing_content[unreleased.end():].strip()
+        if rest:
+            return f"{before}{heading}\n\n{block}\n\n{rest}\n"
+        return f"{before}{heading}\n\n{block}\n"
+    elif existing_content.startswith("#"):
+        # Has a header but no Unreleased section - add one after the first header line
+        lines = existing_content.split('\n', 1)
+        rest = lines[1].strip() if len(lines) > 1 else ""
+        return f"{lines[0]}\n\n## Unreleased\n\n{block}\n\n{rest}\n" if rest else f"{lines[0]}\n\n## Unreleased\n\n{block}\n"
+    else:
+        # No header at all - create full structure
+        return f"# Changelog\n\n## Unreleased\n\n{block}\n\n{existing_content}\n"
+
+
+def get_index_path(changelog_path: Path) -> Path:
+    """Sidecar index next to the changelog, e.g. .changelog-index.json."""
+    return changelog_path.with_name(f".{changelog_path.stem.lower()}-index.json")
+
+
+def get_diff_hash(diff: str) -> str:
+    """Short content hash identifying a diff."""
+    import hashlib
+    
+    return hashlib.sha256(diff.encode('utf-8')).hexdigest()[:32]
+
+
+def load_changelog_index(changelog_path: Path) -> dict:
+    """
+    Load the sidecar index mapping commit SHAs and diff hashes to the entry
+    line they produced. A missing or unreadable index is treated as empty.
+    """
+    try:
+        data = json.loads(get_index_path(changelog_path).read_text(encoding='utf-8'))
+        if data.get('version') == 1:
+            return data
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {'version': 1, 'changelog': None, 'commits': {}, 'diffs': {}}
+
+
+def changelog_contains_line(changelog_path: Path, line: str) -> bool:
+    """Stream the changelog looking for an exact entry line."""
+    try:
+        with open(changelog_path, encoding='utf-8') as f:
+            return any(existing.rstrip('\r\n') == line for existing in f)
+    except OSError:
+        return False
+
+
+def find_recorded_entry(changes: Optional[GitChanges], changelog_path: Optional[Path] = None,
+                        index: Optional[dict] = None) -> Optional[str]:
+    """
+    Return the changelog line already written for these changes, or None.
+    
+    The lookup is by commit SHA - the hook's merge diff and CI runs carry
+    HEAD's. Changes without one (uncommitted working-tree changes in local
+    mode) are looked up by diff hash instead. A different commit with the
+    same diff, such as a PR re-landed after a revert, is a new entry. The index is trusted as long as the changelog is the file it
+    last wrote; if the changelog was edited since, a hit is confirmed
+    against the file.
+    """
+    if not DEDUP_ENABLED or changes is None:
+        return None
+    changelog_path = changelog_path or Path(CHANGELOG_FILE)
+    index = index if index is not None else load_changelog_index(changelog_path)
+    
+    if changes.sha:
+        line = index['commits'].get(changes.sha)
+    else:
+        line = index['diffs'].get(get_diff_hash(changes.diff)) if changes.diff else None
+    if line is None:
+        return None
+    
+    signature = file_signature(changelog_path)
+    if signature is None:
+        return None
+    if index.get('changelog') != list(signature) and not changelog_contains_line(changelog_path, line):
+        return None
+    return line
+
+
+def record_changelog_entries(changelog_path: Path, changes_list: list, formatted_entries: list):
+    """
+    Add freshly written entries to the sidecar index.
+    Must be called with the changelog lock held, right after the write.
+    """
+    index = load_changelog_index(changelog_path)
+    for changes, formatted_entry in zip(changes_list, formatted_entries):
+        if changes is None:
+            continue
+        line = formatted_entry.split('\n', 1)[0]
+        if changes.sha:
+            index['commits'][changes.sha] = line
+        if changes.diff:
+            index['diffs'][get_diff_hash(changes.diff)] = line
+    index['changelog'] = list(file_signature(changelog_path) or []) or None
+    
+    payload = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    try:
+        atomic_write(get_index_path(changelog_path), lambda f: f.write(payload))
+    except OSError as e:
+        print(f"[WARN] Could not update changelog index: {e}")
+
+
+def splice_changelog_entries(path: Path, formatted_entries: list, signature=False) -> bool:
+    """
+    Insert entries below "## Unreleased" without loading the whole file.
+    
+    Only the first CHANGELOG_HEAD_SCAN_BYTES are searched; the rest of the
+    file is streamed into a temp file that then replaces the changelog, so
+    the cost depends on the header size rather than the file size.
+    Returns False if the file needs the full rewrite path instead.
+    Raises FileChangedError if the file no longer matches signature.
+    """
+    import shutil
+    
+    block = "\n\n".join(formatted_entries).encode('utf-8')
+    
+    with open(path, 'rb') as source:
+        head = source.read(CHANGELOG_HEAD_SCAN_BYTES)
+        if len(head) < CHANGELOG_HEAD_SCAN_BYTES:
+            # Whole file already in memory - the regular path is just as cheap
+            return False
+        
+        heading = UNRELEASED_HEADING_BYTES.search(head)
+        if heading is None:
+            return False
+        index, marker = heading.start(), heading.group(0)
+        
+        # Entries go after the header, replacing the whitespace that follows it
+        rest = heading.end()
+        while rest < len(head) and head[rest:rest + 1] in b" \t\r\n":
+            rest += 1
+        if rest == len(head):
+            return False
+        
+        def write_content(target):
+            target.write(head[:index] + marker + b"\n\n" + block + b"\n\n")
+            target.write(head[rest:])
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        
+        atomic_write(path, write_content, signature)
+    
+    return True
+
+
+def update_changelog(path: Path, formatted_entries: list, changes_list: Optional[list], rewrite):
+    """
+    Locked read-modify-write of the changelog shared by every writer.
+    
+    Writers take an advisory lock, and if the file is still modified
+    underneath us (an editor, a writer that ignores the lock) the update is
+    re-read and re-applied instead of dropping entries.
+    
+    If changes_list (parallel to formatted_entries) is given, entries that
+    another run recorded in the meantime are dropped and the rest are added
+    to the sidecar index. rewrite(signature, entries) does the actual write
+    (passing signature on to atomic_write) and its result is returned.
+    """
+    with changelog_lock(path):
+        if changes_list is not None:
+            index = load_changelog_index(path)
+            pending = [(changes, entry) for changes, entry in zip(changes_list, formatted_entries)
+                       if not find_recorded_entry(changes, path, index)]
+            changes_list = [changes for changes, _ in pending]
+            formatted_entries = [entry for _, entry in pending]
+        
+        for attempt in range(CHANGELOG_WRITE_RETRIES):
+            signature = file_signature(path)
+            try:
+                result = rewrite(signature, formatted_entries)
+                if changes_list and formatted_entries:
+                    record_changelog_entries(path, changes_list, formatted_entries)
+                return result
+            except FileChangedError:
+                METRICS.incr('changelog_write_retries')
+                print(f"[WARN] {path} changed during update, retrying ({attempt + 1}/{CHANGELOG_WRITE_RETRIES})")
+                time.sleep(0.05 * (attempt + 1))
+    
+    raise FileChangedError(f"{path} kept changing, gave up after {CHANGELOG_WRITE_RETRIES} attempts")
+
+
+def write_changelog_entries(formatted_entries: list, path: Optional[Path] = None,
+                            changes_list: Optional[list] = None) -> int:
+    """
+    Insert formatted entries (newest first) into the changelog.
+    Large files are spliced in place; small or unusual ones are rewritten.
+    Safe to run concurrently (see update_changelog).
+    
+    Returns the number of entries written.
+    """
+    path = path or Path(CHANGELOG_FILE)
+    
+    def rewrite(signature, entries):
+        if not entries:
+            return 0
+        if signature is None or not splice_changelog_entries(path, entries, signature):
+            content = path.read_text(encoding='utf-8') if signature is not None else ""
+            new_content = insert_changelog_entries(content, entries)
+            atomic_write(path, lambda f: f.write(new_content.encode('utf-8')), signature)
+        return len(entries)
+    
+    return update_changelog(path, formatted_entries, changes_list, rewrite)
+
+
+@dataclass
+class ReleaseEntry:
+    """What the release bump needs to know about one changelog bullet."""
+    prefix: str = ""  # Conventional type, lowercase ("feat", "fix", "breaking", ...)
+    breaking: bool = False
+
+
+def parse_release_entry(text: str) -> ReleaseEntry:
+    """Conventional type and breaking flag of a bullet, after any generator metadata."""
+    metadata = ENTRY_METADATA.match(text)
+    conventional = CONVENTIONAL.match(metadata.group('message') if metadata else text)
+    if not conventional:
+        return ReleaseEntry()
+    kind = conventional.group('type').lower()
+    if kind.startswith('breaking'):
+        return ReleaseEntry(prefix='breaking', breaking=True)
+    return ReleaseEntry(prefix=kind, breaking=bool(conventional.group('bang')))
+
+
+def get_release_bump(entries: list) -> str:
+    """
+    Pick the semver bump for a set of parsed entries:
+    breaking ("feat!:", "BREAKING CHANGE:") -> major, feat -> minor, anything else -> patch.
+    """
+    if any(entry.breaking for entry in entries):
+        return 'major'
+    if any(entry.prefix == 'feat' for entry in entries):
+        return 'minor'
+    return 'patch'
+
+
+def bump_version(version: str, bump: str) -> str:
+    """Apply a 'major' / 'minor' / 'patch' bump to "x.y.z" (a leading "v" is dropped)."""
+    major, minor, patch = (int(part) for part in version.lstrip('v').split('.'))
+    if bump == 'major':
+        return f"{major + 1}.0.0"
+    if bump == 'minor':
+        return f"{major}.{minor + 1}.0"
+    return f"{major}.{minor}.{patch + 1}"
+
+
+def cut_release(content: str, date: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Move the Unreleased entries under a new "## [x.y.z] - date" heading.
+    
+    The version is the highest released one bumped according to the entries'
+    Conventional Commits prefixes. The (now empty) Unreleased heading stays
+    on top for the next entries.
+    
+    Returns (new_content, version, bump), or None if nothing is unreleased.
+    """
+    lines = content.split('\n')
+    
+    # (line index, version name) of every "## " heading
+    headings = []
+    for index, line in enumerate(lines):
+        line = line.rstrip()
+        if line.startswith('## '):
+            heading = VERSION_HEADING.match(line)
+            headings.append((index, heading.group('name').strip() if heading else line[3:].strip()))
+    
+    start = next((index for index, name in headings if name.lower() == 'unreleased'), None)
+    if start is None:
+        return None
+    end = next((index for index, _ in headings if index > start), len(lines))
+    entries = [parse_release_entry(line.rstrip()[2:].strip()) for line in lines[start + 1:end]
+               if line.startswith(('- ', '* '))]
+    if not entries:
+        return None
+    
+    released = [tuple(int(part) for part in match.groups())
+                for match in (SEMVER.match(name) for _, name in headings) if match]
+    latest = '.'.join(str(part) for part in max(released)) if released else "0.0.0"
+    bump = get_release_bump(entries)
+    version = bump_version(latest, bump)
+    
+    head = '\n'.join(lines[:start + 1])
+    body = '\n'.join(lines[start + 1:end]).strip()
+    rest = '\n'.join(lines[end:]).strip()
+    
+    new_content = f"{head}\n\n## [{version}] - {date}\n\n{body}\n"
+    if rest:
+        new_content += f"\n{rest}\n"
+    return new_content, version, bump
+
+
+def release_changelog(formatted_entries: list = (), path: Optional[Path] = None,
+                      changes_list: Optional[list] = None) -> Optional[Tuple[str, str]]:
+    """
+    Add entries to Unreleased and cut a release from it in one locked write.
+    
+    Returns (version, bump), or None if there was nothing to release.
+    """
+    from datetime import datetime
+    
+    path = path or Path(CHANGELOG_FILE)
+    date = datetime.now().strftime('%Y-%m-%d')
+    
+    def rewrite(signature, entries):
+        content = path.read_text(encoding='utf-8') if signature is not None else ""
+        if entries:
+            content = insert_changelog_entries(content, entries)
+        released = cut_release(content, date)
+        if released is None:
+            return None
+        new_content, version, bump = released
+        atomic_write(path, lambda f: f.write(new_content.encode('utf-8')), signature)
+        return version, bump
+    
+    return update_changelog(path, list(formatted_entries), changes_list, rewrite)
+
+
+def report_release(release: Optional[Tuple[str, str]]):
+    """Print the outcome of a release and expose the version to GitHub Actions."""
+    if release is None:
+        print(f"[INFO] No unreleased entries in {CHANGELOG_FILE} - nothing to release")
+        return
+    version, bump = release
+    print(f"[OK] Released {version} ({bump} bump) in {CHANGELOG_FILE}")
+    
+    # Later workflow steps read it as steps.<id>.outputs.new_version
+    github_output = os.environ.get('GITHUB_OUTPUT')
+    if github_output:
+        with open(github_output, 'a', encoding='utf-8') as f:
+            f.write(f"new_version={version}\n")
+
+
+def write_changelog(content: Optional[str], new_entry: str, changes: Optional[GitChanges] = None,
+                    release: bool = False, default_prefix: str = "feat:"):
+    """
+    Prepend the new entry to the CHANGELOG.md file.
+    Validates entry format and adds timestamp.
+    
+    Args:
+        content: Ignored - kept for existing callers. The file is always
+            re-read under the changelog lock so concurrent runs can't
+            overwrite each other's entries.
+        changes: Metadata collected with the diff. If omitted, it is read
+            from the current commit with a single git call.
+        release: Also cut a release from the Unreleased entries, in the
+            same write (see release_changelog).
+        default_prefix: Prefix for an entry that has none (see validate_entry).
+    """
+    # Validate the entry to Conventional format
+    validated_entry = validate_entry(new_entry, default_prefix)
+    
+    # Get commit metadata
+    if changes is None:
+        changes = collect_commit_changes("HEAD", with_patch=False) or GitChanges(timestamp=current_timestamp())
+    
+    formatted_entry = format_changelog_entry(validated_entry, changes.timestamp, changes.files_changed, changes.author)
+    
+    # Write to file
+    if release:
+        report_release(release_changelog([formatted_entry], Path(CHANGELOG_FILE), [changes]))
+    elif write_changelog_entries([formatted_entry], Path(CHANGELOG_FILE), [changes]):
+        print(f"[OK] Updated {CHANGELOG_FILE}")
+    else:
+        print(f"[INFO] Entry already recorded by another run - {CHANGELOG_FILE} unchanged")
+
+
+def run_preflight_checks(required: bool = True):
+    """
+    Make sure at least one AI provider is usable before doing any work.
+    Exits the process if neither Groq nor Ollama can be used, unless
+    required is False (a fallback entry was given), in which case it only warns.
+    """
+    print("Running pre-flight checks...")
+    
+    # Check if we have at least one AI provider
+    has_groq = bool(GROQ_API_KEY)
+    has_ollama = check_ollama_running()
+    
+    if has_groq:
+        print("[OK] Groq API key configured")
+    elif has_ollama:
+        print("[OK] Ollama is running")
+    elif not required:
+        print("[WARN] No AI provider available - the fallback entry will be used")
+        return
+    else:
+        # No provider available - try to setup Ollama
+        if not ensure_ollama_ready(auto_install=True):
+            print("\n[ERROR] No AI provider available")
+            print("   Either set GROQ_API_KEY or install Ollama from: https://ollama.com/download")
+            sys.exit(1)
+    
+    print("\n[OK] All pre-flight checks passed!")
+
+
+def cut_pending_release():
+    """--release with no new entry: release whatever is already in Unreleased."""
+    with METRICS.stage('write'):
+        try:
+            report_release(release_changelog())
+        except (TimeoutError, FileChangedError) as e:
+            print(f"[ERROR] Could not update {CHANGELOG_FILE}: {e}")
+            sys.exit(1)
+
+
+def main(auto_write=False, ci_mode=False, release=False, fallback_entry=None):
+    """Main function to orchestrate the changelog generation.
+    
+    Args:
+        auto_write: If True, skip confirmation and write automatically.
+        ci_mode: If True, running in CI environment (GitHub Actions).
+        release: If True, also move the Unreleased entries under a new
+            version heading (bumped from their prefixes) in the same write.
+        fallback_entry: Entry to write if no AI provider produces one.
+            It only gets a prefix if it already has one (a patch bump otherwise).
+    """
+    # Check if we're in a CI environment
+    is_ci = ci_mode or os.environ.get('GITHUB_ACTIONS') == 'true'
+    
+    # Check if we're in a post-merge context
+    is_post_merge = os.environ.get('GIT_HOOK') == 'post-merge'
+    
+    with METRICS.stage('collect_changes'):
+        if is_ci:
+            print("Checking CI merge changes...")
+            changes = collect_git_changes(mode='ci')
+        elif is_post_merge:
+            print("Checking post-merge changes...")
+            changes = collect_git_changes(mode='merge')
+        else:
+            print("Checking for uncommitted changes...")
+            changes = collect_git_changes(mode='local')
+    
+    diff = changes.diff if changes else None
+    if not diff:
+        print("[INFO] No changes detected")
+        if release:
+            cut_pending_release()
+        sys.exit(0)
+    
+    if changes.skipped_bytes:
+        print(f"Found changes ({changes.diff_bytes} bytes, {changes.skipped_bytes} skipped while streaming)")
+    else:
+        print(f"Found changes ({len(diff)} characters)")
+    
+    # A retried hook or CI job must not append the same merge twice
+    recorded = find_recorded_entry(changes)
+    if recorded:
+        print(f"[INFO] Already recorded in {CHANGELOG_FILE}: {recorded}")
+        print("       Use --force to generate a new entry anyway")
+        if release:
+            cut_pending_release()
+        sys.exit(0)
+    
+    # Docs-, lockfile-, test- and version-only changes never touch the network
+    entry = classify_trivial_change(diff, changes.file_stats)
+    
+    if not entry:
+        # Only now is a provider needed - runs without changes never touch the network
+        with METRICS.stage('preflight'):
+            run_preflight_checks(required=not fallback_entry)
+        
+        print("\n" + "="*50)
+        print("Generating changelog entry with Ollama...")
+        print("="*50 + "\n")
+        
+        # Generate changelog entry
+        with METRICS.stage('generate'):
+            entry = generate_changelog_entry(diff, changes.file_stats)
+    
+    # A fallback such as a PR title is written as given: without a prefix it is a patch, not a feat
+    default_prefix = "feat:"
+    if not entry and fallback_entry:
+        print("[WARN] Failed to generate changelog entry - using the fallback entry")
+        entry = fallback_entry
+        default_prefix = ""
+    
+    if not entry:
+        print("[ERROR] Failed to generate changelog entry")
+        sys.exit(1)
+    
+    # Display the generated entry
+    print("Generated changelog entry:")
+    print("-" * 50)
+    print(entry)
+    print("-" * 50)
+    print()
+    
+    # Skip confirmation if auto_write is True, in CI mode, or in post-merge hook
+    if not auto_write and not is_ci and not is_post_merge:
+        response = input("Write this entry to CHANGELOG.md? [Y/n]: ").strip().lower()
+        if response and response not in ['y', 'yes']:
+            print("Cancelled")
+            sys.exit(0)
+    else:
+        print("Auto-writing to CHANGELOG.md...")
+    
+    with METRICS.stage('write'):
+        # Write the new entry (the writer reads only the head of a large changelog)
+        try:
+            write_changelog(None, entry, changes, release=release, default_prefix=default_prefix)
+        except (TimeoutError, FileChangedError) as e:
+            print(f"[ERROR] Could not update {CHANGELOG_FILE}: {e}")
+            sys.exit(1)
+    
+    print_cache_stats()
+    print("Done!")
+
+
+# =============================================================================
+# Packed Requests (--pack)
+# =============================================================================
+
+def build_packs(items: List[Tuple[int, str]], pack_size: int) -> List[List[Tuple[int, str]]]:
+    """
+    Group (id, diff) items, in order, into packs of at most pack_size diffs
+    whose prompt fits PACK_MAX_PROMPT_TOKENS. An oversized diff gets a pack of its own.
+    """
+    budget = PACK_MAX_PROMPT_TOKENS - estimate_tokens(PACKED_SYSTEM_PROMPT)
+    packs = []
+    pack = []
+    used = 0
+    for item in items:
+        cost = estimate_tokens(item[1]) + 10  # Plus the "=== CHANGE n ===" separator
+        if pack and (len(pack) >= pack_size or used + cost > budget):
+            packs.append(pack)
+            pack = []
+            used = 0
+        pack.append(item)
+        used += cost
+    if pack:
+        packs.append(pack)
+    return packs
+
+
+def parse_packed_reply(reply: Optional[str], ids: List[int]) -> dict:
+    """
+    Entries by id from a packed JSON reply. Ids missing from the reply are
+    left out (re-packed); ids whose entry fails is_valid_entry map to None
+    (generated one by one).
+    """
+    try:
+        data = json.loads(reply or "")
+    except ValueError:
+        return {}
+    if isinstance(data, dict) and isinstance(data.get('entries'), (dict, list)):
+        data = data['entries']
+    if isinstance(data, list):
+        # Some models answer [{"id": 1, "entry": "..."}] instead of a mapping
+        data = {str(item.get('id')): item.get('entry') for item in data if isinstance(item, dict)}
+    if not isinstance(data, dict):
+        return {}
+    
+    entries = {}
+    for item_id in ids:
+        entry = data.get(str(item_id))
+        if entry is None:
+            continue
+        if isinstance(entry, str) and is_valid_entry(entry):
+            entries[item_id] = validate_entry(entry.strip().split('\n', 1)[0])
+        else:
+            entries[item_id] = None
+    return entries
+
+
+def generate_pack(pack: List[Tuple[int, str]]) -> Tuple[str, dict]:
+    """
+    Send one packed request, Groq first then Ollama.
+    Returns (provider, {id: entry}) as parsed by parse_packed_reply.
+    """
+    ids = [item_id for item_id, _ in pack]
+    prompt = "\n\n".join(f"=== CHANGE {item_id} ===\n{diff}" for item_id, diff in pack)
+    METRICS.incr('packed_requests')
+    
+    if GROQ_API_KEY:
+        reply = generate_with_groq(prompt, PACKED_SYSTEM_PROMPT, json_output=True,
+                                   max_tokens=PACK_TOKENS_PER_ENTRY * len(pack) + 20)
+        entries = parse_packed_reply(reply, ids)
+        if any(entries.values()):
+            return 'groq', entries
+    
+    if check_ollama_running():
+        reply = generate_with_ollama(prompt, PACKED_SYSTEM_PROMPT, json_output=True)
+        return 'ollama', parse_packed_reply(reply, ids)
+    return '', {}
 
 
-def validate_entry(entry: str) -> str:
+def generate_packed_entries(records: List[GitChanges], pack_size: int, workers: int = BATCH_WORKERS) -> List[Optional[str]]:
     """
-    Ensure entry follows Conventional format, fix if needed.
-    Converts [Feature] -> feat:, [Fix] -> fix:, etc.
-    Preserves entries that already have timestamp metadata format.
-    """
-    entry = entry.strip()
+    Generate one entry per record, bundling up to pack_size summarized
+    diffs into each LLM request so the system prompt and request overhead
+    are paid once per pack instead of once per diff.
     
-    # Remove leading bullet points or dashes
-    if entry.startswith('- '):
-        entry = entry[2:]
-    elif entry.startswith('+ '):
-        entry = entry[2:]
-    elif entry.startswith('* '):
-        entry = entry[2:]
+    Entries missing from a reply are re-packed for another round; what is
+    still missing after PACK_MAX_ATTEMPTS rounds, and every entry that came
+    back malformed, is generated with single requests. Returns entries
+    parallel to records.
+    """
+    from concurrent.futures import ThreadPoolExecutor
     
-    # Check if entry already has timestamp metadata format:
-    # "Dec 31, 2025 at 2:30 PM | 3 files | by John - feat: description"
-    # or older format: "Dec 31, 2025 at 2:30 PM - feat: description"
-    timestamp_pattern = r'^[A-Z][a-z]{2} \d{1,2}, \d{4} at \d{1,2}:\d{2} [AP]M'
-    if re.match(timestamp_pattern, entry):
-        # Entry already has timestamp, check if it has a valid prefix after the metadata
-        # Look for " - feat:" or " | by ... - feat:" pattern
-        for prefix in VALID_PREFIXES:
-            if f" - {prefix}" in entry.lower():
-                # Already properly formatted with timestamp and valid prefix
-                return entry
-        # Has timestamp but no valid prefix - this shouldn't happen normally
-        # Return as-is to avoid corruption
-        return entry
+    entries = [None] * len(records)
+    diffs = {}
+    for i, record in enumerate(records):
+        if not record.diff:
+            continue
+        entries[i] = classify_trivial_change(record.diff, record.file_stats)
+        if entries[i]:
+            continue
+        with METRICS.stage('summarize'):
+            diff = summarize_diff(record.diff, file_stats=record.file_stats)
+        entries[i] = cache_lookup(diff)
+        if not entries[i]:
+            diffs[i + 1] = diff  # Ids in the prompt are 1-based
     
-    # Check if already valid (starts with conventional prefix)
-    entry_lower = entry.lower()
-    for prefix in VALID_PREFIXES:
-        if entry_lower.startswith(prefix):
-            # Ensure proper capitalization: "feat: message"
-            return prefix + entry[len(prefix):]
+    queue = list(diffs)
+    rejected = []
+    for attempt in range(PACK_MAX_ATTEMPTS):
+        if not queue:
+            break
+        packs = build_packs([(item_id, diffs[item_id]) for item_id in queue], pack_size)
+        retry = " (retrying missing entries)" if attempt else ""
+        print(f"[INFO] Sending {len(queue)} diffs in {len(packs)} packed requests{retry}")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for provider, packed in executor.map(generate_pack, packs):
+                for item_id, entry in packed.items():
+                    if entry is None:
+                        rejected.append(item_id)
+                        continue
+                    entries[item_id - 1] = entry
+                    cache_put(provider, GROQ_MODEL if provider == 'groq' else OLLAMA_MODEL, diffs[item_id], entry)
+        queue = [item_id for item_id in queue if entries[item_id - 1] is None and item_id not in rejected]
+        METRICS.incr('packed_entries_requeued', len(queue))
     
-    # Try to convert from old format
-    for old_format, new_format in FORMAT_MAPPING.items():
-        if entry_lower.startswith(old_format):
-            rest = entry[len(old_format):].strip()
-            # Remove any following colons or dashes
-            if rest.startswith(':') or rest.startswith('-'):
-                rest = rest[1:].strip()
-            return f"{new_format} {rest}"
+    METRICS.incr('packed_entries_rejected', len(rejected))
+    queue = sorted(queue + rejected)
+    if queue:
+        print(f"[WARN] {len(queue)} entries missing or malformed in packed replies - generating them one by one")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            singles = executor.map(generate_backfill_entry, [records[item_id - 1] for item_id in queue])
+            for item_id, entry in zip(queue, singles):
+                entries[item_id - 1] = entry
     
-    # If no recognized format, default to feat:
-    return f"feat: {entry}"
+    return entries
 
 
-def read_changelog() -> str:
+# =============================================================================
+# Map-Reduce Summarization (--map-reduce)
+# =============================================================================
+
+def split_diff_chunks(diff: str, chunk_chars: int, max_chars: Optional[int] = None) -> Tuple[List[str], int]:
     """
-    Read the current CHANGELOG.md content.
-    Creates the file if it doesn't exist.
+    Split a diff into chunks of at most chunk_chars at file and hunk
+    boundaries. A file too large for one chunk is split between hunks,
+    its header repeated in each piece; a single oversized hunk is cut at a
+    line boundary. Lockfiles, binaries and generated files are left out.
+    
+    If the pieces exceed max_chars, the most important files are kept
+    (see file_importance), in diff order. Returns (chunks, omitted files).
     """
-    changelog_path = Path(CHANGELOG_FILE)
+    files = [f for f in parse_diff(diff) if not f.binary and not is_noise_file(f.path)]
     
-    if changelog_path.exists():
-        return changelog_path.read_text(encoding='utf-8')
-    else:
-        return ""
+    pieces = []  # (file index, text)
+    for index, file_diff in enumerate(files):
+        limit = chunk_chars - len(file_diff.header)
+        piece = file_diff.header
+        for hunk in file_diff.hunks:
+            if len(hunk) > limit:
+                cut = hunk.rfind('\n', 0, max(limit - 4, 0))
+                hunk = hunk[:cut + 1] + "...\n"
+            if len(piece) + len(hunk) > chunk_chars and piece != file_diff.header:
+                pieces.append((index, piece))
+                piece = file_diff.header
+            piece += hunk
+        pieces.append((index, piece))
+    
+    omitted = 0
+    if max_chars is not None and sum(len(text) for _, text in pieces) > max_chars:
+        sizes = {}
+        for index, text in pieces:
+            sizes[index] = sizes.get(index, 0) + len(text)
+        keep = set()
+        used = 0
+        for index in sorted(sizes, key=lambda i: -file_importance(files[i].path)):
+            if used + sizes[index] <= max_chars:
+                keep.add(index)
+                used += sizes[index]
+        omitted = len(files) - len(keep)
+        pieces = [(i, text) for i, text in pieces if i in keep]
+    
+    # Pack consecutive pieces into as few chunks as fit
+    chunks = []
+    chunk = ""
+    for _, text in pieces:
+        if chunk and len(chunk) + len(text) > chunk_chars:
+            chunks.append(chunk)
+            chunk = ""
+        chunk += text
+    if chunk:
+        chunks.append(chunk)
+    return chunks, omitted
 
 
-def write_changelog(content: str, new_entry: str):
+def summarize_chunk(chunk: str) -> Optional[str]:
     """
-    Prepend the new entry to the CHANGELOG.md file.
-    Validates entry format and adds timestamp.
+    Map step: a short plain-text summary of one chunk (Groq first, then Ollama).
+    The chunk is fitted to each model's prompt budget, like a single request.
     """
-    changelog_path = Path(CHANGELOG_FILE)
+    result = None
+    if GROQ_API_KEY:
+        prompt = fit_diff_to_model(chunk, GROQ_MODEL, system_prompt=MAP_SYSTEM_PROMPT)
+        result = generate_with_groq(prompt, MAP_SYSTEM_PROMPT, max_tokens=MAP_SUMMARY_TOKENS)
+    if not result and check_ollama_running():
+        prompt = fit_diff_to_model(chunk, OLLAMA_MODEL, system_prompt=MAP_SYSTEM_PROMPT)
+        result = generate_with_ollama(prompt, MAP_SYSTEM_PROMPT, single_entry=False)
+    return " ".join(result.split()) if result else None
+
+
+def map_reduce_entry(diff: str, file_stats: Optional[list] = None) -> Optional[str]:
+    """
+    Generate the entry for a large diff in two steps: every chunk is
+    summarized concurrently (MAP_REDUCE_WORKERS requests at a time, at most
+    MAP_REDUCE_TOKEN_BUDGET prompt tokens in total), then one reduce call
+    turns the stat header and the chunk summaries into the changelog line.
+    Wall-clock time is about two single calls however large the diff is;
+    a diff that fits one chunk after all skips the map step.
+    Returns None if no chunk could be summarized or the reduce call failed.
+    """
+    from concurrent.futures import ThreadPoolExecutor
     
-    # Validate the entry to Conventional format
-    validated_entry = validate_entry(new_entry)
+    # The full diff is the cache key - a re-run skips every map call
+    cached = cache_lookup(diff)
+    if cached:
+        return cached
     
-    # Get commit metadata
-    timestamp = get_merge_timestamp()
-    files_changed = get_files_changed_count()
-    author = get_commit_author()
+    # Chunks fill the first provider's prompt budget; tokens are converted to
+    # characters with the diff's own ratio (see fit_diff_to_model)
+    model = GROQ_MODEL if GROQ_API_KEY else OLLAMA_MODEL
+    chars_per_token = get_chars_per_token(diff)
+    chunk_tokens = get_prompt_budget(model) - estimate_tokens(MAP_SYSTEM_PROMPT) - 10
+    with METRICS.stage('summarize'):
+        chunks, omitted = split_diff_chunks(diff, int(chunk_tokens * chars_per_token),
+                                            max_chars=int(MAP_REDUCE_TOKEN_BUDGET * chars_per_token))
+    if not chunks:
+        return None
+    note = f", {omitted} less important files left out for the token budget" if omitted else ""
     
-    # Format: "- Dec 31, 2025 at 2:30 PM | 3 files | by John - feat: description"
-    formatted_entry = f"- {timestamp} | {files_changed} file{'s' if files_changed != 1 else ''} | by {author} - {validated_entry}"
+    if len(chunks) == 1:
+        # One prompt holds it - a map call would only add a second round trip
+        print(f"[INFO] Map-reduce: a {len(diff)} character diff fits one prompt{note}")
+        reduce_input = chunks[0]
+    else:
+        print(f"[INFO] Map-reduce: summarizing {len(chunks)} chunks of a {len(diff)} character diff{note}")
+        METRICS.incr('map_reduce_chunks', len(chunks))
+        
+        with ThreadPoolExecutor(max_workers=max(1, MAP_REDUCE_WORKERS)) as executor:
+            summaries = list(executor.map(summarize_chunk, chunks))
+        summaries = [summary for summary in summaries if summary]
+        if not summaries:
+            return None
+        if len(summaries) < len(chunks):
+            print(f"[WARN] Map-reduce: {len(chunks) - len(summaries)} chunks could not be summarized")
+        
+        # Reduce: the regular entry prompt over the file list and the part summaries
+        files = parse_diff(diff)
+        reduce_input = (format_stat_header(files, file_stats, MAX_DIFF_CHARS // 2)
+                        + "Summary of each part of the change:\n"
+                        + "".join(f"- {summary}\n" for summary in summaries))
     
-    # Prepare the new content
-    existing_content = content.strip()
+    result = generate_with_groq(fit_diff_to_model(reduce_input, GROQ_MODEL)) if GROQ_API_KEY else None
+    provider, model = 'groq', GROQ_MODEL
+    if not result and check_ollama_running():
+        result = generate_with_ollama(fit_diff_to_model(reduce_input, OLLAMA_MODEL))
+        provider, model = 'ollama', OLLAMA_MODEL
+    if result:
+        cache_put(provider, model, diff, result)
+    return result
+
+
+# =============================================================================
+# Batch Backfill Mode
+# =============================================================================
+
+def get_merge_commits(rev_range: str) -> Optional[List[GitChanges]]:
+    """
+    Collect every merge commit in the range together with its first-parent diff.
+    Uses a single `git log` call for the whole range.
+    Returns the list of records (newest first) or None if git failed.
+    """
+    returncode, stderr, captures = stream_git_diff([
+        "git", "log", "--merges", "--first-parent", "-m", "-p", "--numstat",
+        "--no-color", f"--format={LOG_RECORD_FORMAT}", rev_range
+    ], split_records=True)
     
-    if not existing_content:
-        # Empty file - create structure
-        new_content = f"# Changelog\n\n## Unreleased\n\n{formatted_entry}\n"
-    elif "## Unreleased" in existing_content:
-        # Find the Unreleased section and insert after it
-        parts = existing_content.split("## Unreleased", 1)
-        rest = parts[1].strip()
-        if rest:
-            new_content = f"{parts[0]}## Unreleased\n\n{formatted_entry}\n\n{rest}\n"
-        else:
-            new_content = f"{parts[0]}## Unreleased\n\n{formatted_entry}\n"
-    elif existing_content.startswith("#"):
-        # Has a header but no Unreleased section - add one after the first header line
-        lines = existing_content.split('\n', 1)
-        rest = lines[1].strip() if len(lines) > 1 else ""
-        new_content = f"{lines[0]}\n\n## Unreleased\n\n{formatted_entry}\n\n{rest}\n" if rest else f"{lines[0]}\n\n## Unreleased\n\n{formatted_entry}\n"
-    else:
-        # No header at all - create full structure
-        new_content = f"# Changelog\n\n## Unreleased\n\n{formatted_entry}\n\n{existing_content}\n"
+    if returncode != 0:
+        print(f"[ERROR] git log failed for range '{rev_range}': {stderr.strip()}")
+        return None
     
-    # Write to file
-    changelog_path.write_text(new_content, encoding='utf-8')
-    print(f"[OK] Updated {CHANGELOG_FILE}")
+    return [changes_from_capture(capture, with_header=True) for capture in captures]
 
 
-def main(auto_write=False, ci_mode=False):
-    """Main function to orchestrate the changelog generation.
+def generate_backfill_entry(record: GitChanges) -> Optional[str]:
+    """Generate the changelog entry for one merge record (runs in a worker thread)."""
+    if not record.diff:
+        return None
+    return generate_changelog_entry(record.diff, record.file_stats)
+
+
+def run_backfill(rev_range: str, workers: int = BATCH_WORKERS, auto_write: bool = False,
+                 release: bool = False, pack_size: int = 0):
+    """
+    Generate changelog entries for every merge commit in a range.
+    
+    Entries are generated concurrently through a bounded worker pool, then
+    written in commit order with a single changelog rewrite.
     
     Args:
+        rev_range: Git revision range, e.g. "v1.0.0..HEAD"
+        workers: Maximum number of concurrent LLM requests
         auto_write: If True, skip confirmation and write automatically.
-        ci_mode: If True, running in CI environment (GitHub Actions).
+        release: If True, cut a release from the Unreleased entries in the same write.
+        pack_size: If above 1, send up to this many diffs per LLM request
+            (see generate_packed_entries).
     """
-    # Pre-flight checks
-    print("Running pre-flight checks...")
-    
-    # Check if we have at least one AI provider
-    has_groq = bool(GROQ_API_KEY)
-    has_ollama = check_ollama_running()
-    
-    if has_groq:
-        print("[OK] Groq API key configured")
-    elif has_ollama:
-        print("[OK] Ollama is running")
-    else:
-        # No provider available - try to setup Ollama
-        if not ensure_ollama_ready(auto_install=True):
-            print("\n[ERROR] No AI provider available")
-            print("   Either set GROQ_API_KEY or install Ollama from: https://ollama.com/download")
-            sys.exit(1)
+    from concurrent.futures import ThreadPoolExecutor
     
-    print("\n[OK] All pre-flight checks passed!")
+    with METRICS.stage('preflight'):
+        run_preflight_checks()
     
-    # Check if we're in a CI environment
-    is_ci = ci_mode or os.environ.get('GITHUB_ACTIONS') == 'true'
+    print(f"Collecting merge commits in {rev_range}...")
+    with METRICS.stage('collect_changes'):
+        records = get_merge_commits(rev_range)
     
-    # Check if we're in a post-merge context
-    is_post_merge = os.environ.get('GIT_HOOK') == 'post-merge'
+    if records is None:
+        sys.exit(1)
     
-    if is_ci:
-        print("Checking CI merge changes...")
-        diff = get_diff(mode='ci')
-    elif is_post_merge:
-        print("Checking post-merge changes...")
-        diff = get_diff(mode='merge')
-    else:
-        print("Checking for uncommitted changes...")
-        diff = get_diff(mode='local')
+    if not records:
+        print("[INFO] No merge commits found in range")
+        sys.exit(0)
     
-    if not diff:
-        print("[INFO] No changes detected")
+    index = load_changelog_index(Path(CHANGELOG_FILE))
+    new_records = [record for record in records if not find_recorded_entry(record, index=index)]
+    if len(new_records) < len(records):
+        print(f"[INFO] Skipping {len(records) - len(new_records)} merge commits already in {CHANGELOG_FILE}")
+    records = new_records
+    if not records:
+        print("[INFO] Every merge commit in range is already recorded")
         sys.exit(0)
     
-    print(f"Found changes ({len(diff)} characters)")
+    workers = max(1, workers)
+    print(f"Found {len(records)} merge commits")
     print("\n" + "="*50)
-    print("Generating changelog entry with Ollama...")
+    print(f"Generating changelog entries ({workers} workers)...")
     print("="*50 + "\n")
     
-    # Generate changelog entry
-    entry = generate_changelog_entry(diff)
+    start = time.time()
+    with METRICS.stage('generate'):
+        if pack_size > 1:
+            entries = generate_packed_entries(records, pack_size, workers)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                entries = list(executor.map(generate_backfill_entry, records))
+    elapsed = time.time() - start
+    print_cache_stats()
+    
+    formatted_entries = []
+    written_records = []
+    for record, entry in zip(records, entries):
+        if not entry:
+            print(f"[WARN] No entry generated for {record.sha[:8]} - skipping")
+            continue
+        formatted_entries.append(format_changelog_entry(
+            validate_entry(entry), record.timestamp, record.files_changed, record.author
+        ))
+        written_records.append(record)
     
-    if not entry:
-        print("[ERROR] Failed to generate changelog entry")
+    print(f"\n[OK] Generated {len(formatted_entries)}/{len(records)} entries in {elapsed:.1f}s")
+    
+    if not formatted_entries:
+        print("[ERROR] Failed to generate any changelog entries")
         sys.exit(1)
     
-    # Display the generated entry
-    print("Generated changelog entry:")
     print("-" * 50)
-    print(entry)
+    for formatted_entry in formatted_entries:
+        print(formatted_entry)
     print("-" * 50)
     print()
     
-    # Skip confirmation if auto_write is True, in CI mode, or in post-merge hook
-    if not auto_write and not is_ci and not is_post_merge:
-        response = input("Write this entry to CHANGELOG.md? [Y/n]: ").strip().lower()
+    if not auto_write:
+        response = input(f"Write {len(formatted_entries)} entries to CHANGELOG.md? [Y/n]: ").strip().lower()
         if response and response not in ['y', 'yes']:
             print("Cancelled")
             sys.exit(0)
     else:
         print("Auto-writing to CHANGELOG.md...")
     
-    # Read existing changelog
-    existing_content = read_changelog()
-    
-    # Write the new entry
-    write_changelog(existing_content, entry)
+    # Single rewrite for the whole range
+    with METRICS.stage('write'):
+        try:
+            if release:
+                report_release(release_changelog(formatted_entries, changes_list=written_records))
+            else:
+                written = write_changelog_entries(formatted_entries, changes_list=written_records)
+                print(f"[OK] Updated {CHANGELOG_FILE} ({written} new entries)")
+        except (TimeoutError, FileChangedError) as e:
+            print(f"[ERROR] Could not update {CHANGELOG_FILE}: {e}")
+            sys.exit(1)
     
     print("Done!")
 
 
+# =============================================================================
+# Multi-Repository Mode (--repos)
+# =============================================================================
+
+@dataclass
+class RepoRun:
+    """Outcome of one repository in a --repos run."""
+    path: str
+    status: str = "pending"  # written, recorded, no changes, failed
+    detail: str = ""
+    changes: Optional[GitChanges] = None
+    collect_seconds: float = 0.0
+    generate_seconds: float = 0.0
+    write_seconds: float = 0.0
+
+
+def load_repo_list(spec: str) -> List[str]:
+    """
+    Repository paths from a --repos argument: a comma-separated list of
+    paths, or a manifest file with one path per line (# comments allowed)
+    or a JSON list. Relative manifest paths are relative to the manifest.
+    """
+    manifest = Path(spec)
+    if not manifest.is_file():
+        return [str(Path(path.strip()).resolve()) for path in spec.split(',') if path.strip()]
+    
+    text = manifest.read_text(encoding='utf-8')
+    if text.lstrip().startswith('['):
+        paths = json.loads(text)
+    else:
+        paths = [line.split('#', 1)[0].strip() for line in text.splitlines()]
+    return [str((manifest.parent / path).resolve()) for path in paths if path]
+
+
+def collect_repo_changes(path: str, dedup: bool = True) -> RepoRun:
+    """
+    Collect the merge commit at HEAD of one repository (runs in a worker process).
+    Flags are passed in explicitly - spawned workers don't see __main__'s settings.
+    """
+    global DEDUP_ENABLED
+    DEDUP_ENABLED = dedup
+    run = RepoRun(path=path)
+    start = time.perf_counter()
+    try:
+        os.chdir(path)
+        root = get_git_root()
+        if root is None or root.resolve() != Path(path).resolve():
+            # A stray directory inside another checkout must not write to that checkout's changelog
+            run.status, run.detail = "failed", "not a git repository root"
+            return run
+        run.changes = collect_git_changes(mode='ci')
+        if run.changes is None:
+            run.status, run.detail = "failed", "could not read the diff"
+        elif not run.changes.diff:
+            run.status = "no changes"
+        else:
+            recorded = find_recorded_entry(run.changes, root / CHANGELOG_FILE)
+            if recorded:
+                run.status, run.detail, run.changes = "recorded", "already in changelog", None
+    except OSError as e:
+        run.status, run.detail = "failed", str(e)
+    finally:
+        run.collect_seconds = time.perf_counter() - start
+    return run
+
+
+def generate_repo_entry(run: RepoRun) -> RepoRun:
+    """Generate and write the entry for one repository (runs in a worker thread)."""
+    changes = run.changes
+    start = time.perf_counter()
+    # Cache lookups and writes go to this repository's .git, not the working directory's
+    _repo_local.path = run.path
+    try:
+        entry = generate_changelog_entry(changes.diff, changes.file_stats)
+    finally:
+        _repo_local.path = None
+    run.generate_seconds = time.perf_counter() - start
+    if not entry:
+        run.status, run.detail = "failed", "no entry generated"
+        return run
+    
+    formatted_entry = format_changelog_entry(validate_entry(entry), changes.timestamp,
+                                             changes.files_changed, changes.author)
+    start = time.perf_counter()
+    try:
+        written = write_changelog_entries([formatted_entry], Path(run.path) / CHANGELOG_FILE, [changes])
+        run.status = "written" if written else "recorded"
+        run.detail = formatted_entry[2:] if written else "recorded by another run"
+    except (OSError, TimeoutError, FileChangedError) as e:
+        run.status, run.detail = "failed", f"could not update {CHANGELOG_FILE}: {e}"
+    run.write_seconds = time.perf_counter() - start
+    return run
+
+
+def print_repo_summary(runs: List[RepoRun], elapsed: float):
+    """Table of per-repository status and timings."""
+    width = max([len(Path(run.path).name) for run in runs] + [10])
+    print("\n" + "="*50)
+    print(f"Summary ({len(runs)} repositories in {elapsed:.1f}s)")
+    print("="*50)
+    print(f"{'repository':<{width}}  {'status':<10} {'collect':>8} {'generate':>9} {'write':>7}  detail")
+    for run in runs:
+        print(f"{Path(run.path).name:<{width}}  {run.status:<10} {run.collect_seconds:>7.2f}s "
+              f"{run.generate_seconds:>8.2f}s {run.write_seconds:>6.2f}s  {run.detail}")
+    
+    counts = {}
+    for run in runs:
+        counts[run.status] = counts.get(run.status, 0) + 1
+    print("\n" + ", ".join(f"{count} {status}" for status, count in counts.items()))
+
+
+def run_repos(paths: List[str], workers: int = BATCH_WORKERS):
+    """
+    Add the entry for the latest merge of every repository in paths.
+    
+    Diffs are collected in a process pool; entries are then generated
+    through the shared provider clients with at most `workers` requests in
+    flight across all repositories, and each repository's changelog is
+    written on its own as soon as its entry is ready.
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    
+    if not paths:
+        print("[ERROR] --repos needs at least one repository")
+        sys.exit(1)
+    
+    start = time.time()
+    print(f"Collecting changes in {len(paths)} repositories...")
+    with METRICS.stage('collect_changes'):
+        with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as executor:
+            runs = list(executor.map(collect_repo_changes, paths, [DEDUP_ENABLED] * len(paths)))
+    
+    pending = [run for run in runs if run.changes is not None and run.status == "pending"]
+    if pending:
+        # The run's Ollama health and model stats are kept in the first repository, never in the working directory
+        _repo_local.path = pending[0].path
+        with METRICS.stage('preflight'):
+            run_preflight_checks()
+        
+        workers = max(1, workers)
+        print("\n" + "="*50)
+        print(f"Generating {len(pending)} changelog entries ({workers} workers)...")
+        print("="*50 + "\n")
+        with METRICS.stage('generate'), ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(generate_repo_entry, pending))
+        print_cache_stats()
+    else:
+        print("[INFO] No repository needs a new entry")
+    
+    print_repo_summary(runs, time.time() - start)
+    if any(run.status == "failed" for run in runs):
+        sys.exit(1)
+
+
+# =============================================================================
+# Daemon Mode (--serve)
+# =============================================================================
+
+class DaemonOutput:
+    """File-like object that forwards a run's printed output to the daemon client."""
+    
+    def __init__(self, conn):
+        self.conn = conn
+    
+    def write(self, text: str) -> int:
+        if text:
+            try:
+                self.conn.sendall((json.dumps({'out': text}) + "\n").encode('utf-8'))
+            except OSError:
+                pass  # Client went away - finish the run anyway
+        return len(text)
+    
+    def flush(self):
+        pass
+
+
+def send_daemon_message(conn, message: dict):
+    try:
+        conn.sendall((json.dumps(message) + "\n").encode('utf-8'))
+    except OSError:
+        pass
+
+
+def run_daemon_job(repo: str, release: bool, output: DaemonOutput, options: Optional[dict] = None) -> int:
+    """
+    Run the post-merge flow for one repository inside the daemon.
+    Per-run state is reset; connections and the Ollama health cache stay warm.
+    Returns the run's exit code.
+    
+    options carries the client's command line: 'settings' (values of
+    DAEMON_SETTINGS, restored after the run), 'fallback_entry',
+    'metrics_out' and 'openmetrics_out'.
+    """
+    global METRICS, _model_stats
+    METRICS = RunMetrics()
+    _cache_dirs.clear()
+    _model_stats = None
+    CACHE_STATS.update(hits=0, misses=0)
+    
+    options = options or {}
+    defaults = {name: globals()[name] for name in DAEMON_SETTINGS}
+    for name, value in (options.get('settings') or {}).items():
+        # Only known settings, with the type the daemon has for them
+        if name in defaults and type(value) is type(defaults[name]):
+            globals()[name] = value
+    
+    cwd = os.getcwd()
+    previous_hook = os.environ.get('GIT_HOOK')
+    os.environ['GIT_HOOK'] = 'post-merge'
+    try:
+        os.chdir(repo)
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                main(auto_write=True, release=release, fallback_entry=options.get('fallback_entry'))
+                return 0
+            except SystemExit as e:
+                return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception as e:
+                print(f"[ERROR] Changelog daemon: {e}")
+                return 1
+    except OSError as e:
+        output.write(f"[ERROR] Cannot enter repository {repo}: {e}\n")
+        return 1
+    finally:
+        save_model_stats(METRICS.provider_calls, METRICS.routing)
+        with contextlib.redirect_stdout(output):
+            write_metrics_reports(options.get('metrics_out'), options.get('openmetrics_out'))
+        globals().update(defaults)
+        os.chdir(cwd)
+        if previous_hook is None:
+            os.environ.pop('GIT_HOOK', None)
+        else:
+            os.environ['GIT_HOOK'] = previous_hook
+
+
+def handle_daemon_request(conn):
+    """Read one {"repo", "release", "options"} request, run it and stream back output and exit code."""
+    with conn.makefile('rb') as reader:
+        try:
+            request = json.loads(reader.readline().decode('utf-8'))
+            repo = request['repo']
+            release = bool(request.get('release', False))
+            options = request.get('options') or {}
+            if not isinstance(options, dict):
+                raise TypeError("options must be an object")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            send_daemon_message(conn, {'out': "[ERROR] Invalid daemon request\n", 'exit': 2})
+            return
+    
+    print(f"[INFO] Run for {repo}")
+    exit_code = run_daemon_job(repo, release, DaemonOutput(conn), options)
+    send_daemon_message(conn, {'exit': exit_code})
+    print(f"[INFO] Done for {repo} (exit {exit_code})")
+
+
+def is_daemon_running(socket_path: str) -> bool:
+    """Whether something accepts connections on the daemon socket."""
+    import socket
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.settimeout(DAEMON_CONNECT_TIMEOUT)
+    try:
+        probe.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def serve_daemon(socket_path: str = DAEMON_SOCKET) -> int:
+    """
+    Serve hook runs on a Unix socket until interrupted (--serve).
+    
+    Runs are handled one at a time, since each one changes directory and
+    redirects output. The daemon stops when generate_changelog.py changes
+    on disk, telling the waiting client to run the new version itself.
+    """
+    import signal
+    import socket
+    
+    if not hasattr(socket, 'AF_UNIX'):
+        print("[ERROR] --serve needs Unix domain sockets, which are not available on this platform")
+        print("   The hook runs the generator directly instead")
+        return 1
+    
+    path = Path(socket_path)
+    if path.exists():
+        if is_daemon_running(socket_path):
+            print(f"[ERROR] A changelog daemon is already listening on {path}")
+            return 1
+        path.unlink()  # Left behind by a daemon that did not shut down cleanly
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # Owner-only socket: requests run code paths as this user
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(16)
+    
+    # SIGTERM should clean up the socket like Ctrl+C does
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    source = Path(__file__).resolve()
+    source_mtime = source.stat().st_mtime_ns
+    print(f"[OK] Changelog daemon listening on {path} (Ctrl+C to stop)")
+    
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                if source.stat().st_mtime_ns != source_mtime:
+                    send_daemon_message(conn, {'exit': None})
+                    print(f"[INFO] {source.name} changed - stopping so the new version is used")
+                    break
+                try:
+                    handle_daemon_request(conn)
+                except OSError as e:
+                    # A client that disconnects mid-request must not stop the daemon
+                    print(f"[WARN] Daemon request failed: {e}")
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopping changelog daemon")
+    finally:
+        server.close()
+        try:
+            path.unlink()
+        except OSError:
+            pass
+    return 0
+
+
+def run_via_daemon(release: bool = False, socket_path: str = DAEMON_SOCKET,
+                   options: Optional[dict] = None) -> Optional[int]:
+    """
+    Hand this hook run to a --serve daemon and relay its output.
+    options are passed on to run_daemon_job (this process's DAEMON_SETTINGS
+    are always sent). Returns the run's exit code, or None if no daemon
+    took the run (the caller then runs it in this process).
+    """
+    if sys.platform == 'win32' or not os.path.exists(socket_path):
+        return None
+    import socket
+    
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(DAEMON_CONNECT_TIMEOUT)
+        client.connect(socket_path)
+        client.settimeout(None)  # The run itself takes as long as the provider does
+        options = dict(options or {}, settings={name: globals()[name] for name in DAEMON_SETTINGS})
+        request = {'repo': os.getcwd(), 'release': release, 'options': options}
+        client.sendall((json.dumps(request) + "\n").encode('utf-8'))
+        with client.makefile('rb') as replies:
+            for line in replies:
+                message = json.loads(line.decode('utf-8'))
+                if message.get('out'):
+                    sys.stdout.write(message['out'])
+                if 'exit' in message:
+                    return message['exit']
+    except (OSError, ValueError):
+        pass
+    finally:
+        client.close()
+    return None
+
+
 # =============================================================================
 # Git Hook Installation
 # =============================================================================
@@ -960,13 +4058,18 @@ fi
 
 cd "$REPO_ROOT"
 
+# Run as a module so compiled bytecode is reused (a script passed by path is
+# recompiled on every merge). The bytecode is kept in the git directory,
+# not in a __pycache__/ in the working tree.
+export PYTHONPYCACHEPREFIX="$(cd "$(git rev-parse --git-common-dir)" && pwd)/changelog-cache/pycache"
+
 # Try py (Windows), then python3, then python
 if command -v py >/dev/null 2>&1; then
-    py "$REPO_ROOT/generate_changelog.py" --auto
+    py -m generate_changelog --auto
 elif command -v python3 >/dev/null 2>&1; then
-    python3 "$REPO_ROOT/generate_changelog.py" --auto
+    python3 -m generate_changelog --auto
 elif command -v python >/dev/null 2>&1; then
-    python "$REPO_ROOT/generate_changelog.py" --auto
+    python -m generate_changelog --auto
 else
     echo "[ERROR] Python not found"
     exit 1
@@ -1062,6 +4165,7 @@ def install_hook() -> bool:
     print("   2. Make changes and commit")
     print("   3. Merge to main:    git checkout main && git merge test-branch")
     print("   4. Check CHANGELOG.md - a new entry should appear!")
+    print("\nCommit .changelog-index.json along with CHANGELOG.md - it keeps entries from being added twice.")
     print("\nTo uninstall: python generate_changelog.py --uninstall")
     
     return True
@@ -1117,11 +4221,42 @@ Options:
     --github      Force GitHub Actions mode
     --bitbucket   Force Bitbucket Pipelines mode
     --gitlab      Force GitLab CI mode
+    --range A..B  Backfill entries for every merge commit in a revision range
+    --repos LIST  Add the latest merge of each repository to its own CHANGELOG.md
+                  (comma-separated paths, or a manifest file with one path per line)
+    --workers N   Concurrent LLM requests for --range and --repos (default: 4)
+    --pack N      With --range, send up to N diffs per LLM request (one JSON reply)
+    --no-cache    Always call the AI provider (ignore .git/changelog-cache)
+    --race        Query Groq and Ollama at once and keep the first valid answer
+    --route       Pick a model per request: small diffs go to the smallest model tier,
+                  large ones to a stronger model, slow models hand over to a smaller tier
+    --map-reduce  For large diffs, summarize every chunk in parallel, then combine
+                  the summaries into the entry (instead of cutting the diff down)
+    --map-workers N   Concurrent chunk requests per diff with --map-reduce (default: 4)
+    --map-budget N    Prompt tokens over all chunks of one diff (default: 32000)
+    --no-rules    Use the AI provider for docs-, lockfile-, test- and version-only changes too
+                  (by default they get a rule-based docs:/chore:/test: entry)
+    --force       Generate even if the commit/diff is already in .changelog-index.json
+    --release     Also move the Unreleased entries under a new "## [x.y.z] - date" heading
+                  (breaking -> major, feat -> minor, otherwise patch) in the same write
+    --fallback-entry TEXT  Entry to write if no AI provider can generate one
+                           (written as given - without a prefix it counts as a patch)
+    --query Q [ARG]  Answer a question about CHANGELOG.md and exit (add --json for records):
+                     latest-version, latest-entry, unreleased, versions,
+                     entries-since VERSION, entries-by-prefix PREFIX
+    --serve       Run a background daemon that keeps connections and caches warm;
+                  the post-merge hook hands its runs to it while it is up (Unix only)
+    --no-daemon   Run in this process even if a --serve daemon is running
+    --metrics-out FILE      Write a JSON run report (stage timings, counters, provider calls)
+    --openmetrics-out FILE  Write the same metrics in OpenMetrics text format
     --help        Show this help message
 
 AI Providers (tried in order):
     1. Groq API (fast, cloud) - set GROQ_API_KEY environment variable
     2. Ollama (local) - install from https://ollama.com/download
+    With --race (or CHANGELOG_PROVIDER_STRATEGY=race) both are queried at once.
+    With --route each request picks a model tier (MODEL_TIERS) from the diff size and
+    recent latencies; decisions and outcomes are logged in .git/changelog-cache/model-stats.json.
 
 Supported CI Platforms:
     - GitHub Actions (auto-detected via GITHUB_ACTIONS env var)
@@ -1134,6 +4269,8 @@ Format:
     Entries use Conventional Commits format with metadata:
     - Dec 31, 2025 at 2:30 PM | 3 files | by John - feat: add new feature
     - Dec 30, 2025 at 10:00 AM | 1 file | by Jane - fix: resolve bug in auth
+    .changelog-index.json next to CHANGELOG.md records the commit (or diff) behind each
+    entry so reruns don't add it twice - commit it together with CHANGELOG.md.
 
 Examples:
     # First-time setup (recommended)
@@ -1148,17 +4285,56 @@ Examples:
     # Force specific platform
     python generate_changelog.py --bitbucket
     
+    # CI: generate the entry and cut the next release in one run
+    python generate_changelog.py --ci --release --fallback-entry "fix: update dependencies"
+    
+    # Read the changelog from a pipeline
+    python generate_changelog.py --query latest-version
+    
+    # Nightly run over a fleet of checkouts
+    python generate_changelog.py --repos repos.txt --workers 8
+    
+    # Keep a warm process for post-merge hooks (leave running in a terminal or service)
+    python generate_changelog.py --serve
+    
+    # Backfill a release from its merge commits
+    python generate_changelog.py --range v1.0.0..v1.1.0 --workers 8
+    
+    # Same, with fewer and larger requests (8 merges per request)
+    python generate_changelog.py --range v1.0.0..v1.1.0 --pack 8
+    
     # Remove the hook
     python generate_changelog.py --uninstall
 """)
 
 
 if __name__ == "__main__":
+    # Fix Windows console encoding
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+    
     # Check for --help
     if '--help' in sys.argv or '-h' in sys.argv:
         print_help()
         sys.exit(0)
     
+    # Check for --query flag (read-only, no AI provider needed)
+    if '--query' in sys.argv:
+        try:
+            from changelog_parser import load_changelog, run_query
+        except ImportError:
+            print("[ERROR] --query needs changelog_parser.py next to generate_changelog.py")
+            sys.exit(2)
+        query_args = sys.argv[sys.argv.index('--query') + 1:]
+        query_args = [arg for arg in query_args if arg != '--json']
+        if not query_args:
+            print("[ERROR] --query needs a query name (see --help)")
+            sys.exit(2)
+        sys.exit(run_query(load_changelog(CHANGELOG_FILE), query_args[0],
+                           query_args[1] if len(query_args) > 1 else None, '--json' in sys.argv))
+    
     # Check for --install flag
     if '--install' in sys.argv:
         success = install_hook()
@@ -1182,24 +4358,111 @@ if __name__ == "__main__":
             print("\n[ERROR] Setup failed.")
             sys.exit(1)
     
-    # Detect CI platform (with CLI override support)
-    if '--github' in sys.argv:
-        platform = 'github'
-    elif '--bitbucket' in sys.argv:
-        platform = 'bitbucket'
-    elif '--gitlab' in sys.argv:
-        platform = 'gitlab'
-    elif '--ci' in sys.argv:
-        platform = detect_ci_platform()
-    else:
-        platform = detect_ci_platform()
+    # Check for --race flag (applies to every generation mode)
+    if '--race' in sys.argv:
+        PROVIDER_STRATEGY = 'race'
+    
+    # Check for --no-cache flag (applies to every generation mode)
+    if '--no-cache' in sys.argv:
+        CACHE_ENABLED = False
     
-    # Determine if we're in CI mode
-    ci_mode = platform in ('github', 'bitbucket', 'gitlab', 'jenkins', 'circleci')
+    # Check for --no-rules flag (send docs/lockfile/test/version-only changes to the LLM too)
+    if '--no-rules' in sys.argv:
+        RULES_ENABLED = False
     
-    if ci_mode:
-        print(f"[INFO] Detected CI platform: {platform}")
+    # Check for --route flag (pick a model tier per request by diff size and latency history)
+    if '--route' in sys.argv:
+        ROUTING_ENABLED = True
     
-    # Check for --auto flag or post-merge hook
-    auto_write = '--auto' in sys.argv or os.environ.get('GIT_HOOK') == 'post-merge' or ci_mode
-    main(auto_write=auto_write, ci_mode=ci_mode)
+    # Check for --force flag (write even if the changes are already recorded)
+    if '--force' in sys.argv:
+        DEDUP_ENABLED = False
+    
+    # Check for --map-reduce flag (large diffs summarized chunk by chunk, then combined)
+    if '--map-reduce' in sys.argv:
+        MAP_REDUCE_ENABLED = True
+        try:
+            MAP_REDUCE_WORKERS = int(get_option_value('--map-workers', str(MAP_REDUCE_WORKERS)))
+            MAP_REDUCE_TOKEN_BUDGET = int(get_option_value('--map-budget', str(MAP_REDUCE_TOKEN_BUDGET)))
+        except ValueError:
+            print("[ERROR] --map-workers and --map-budget must be integers")
+            sys.exit(1)
+        # Capture enough of the diff to fill the budget
+        DIFF_HEAD_BYTES = max(DIFF_HEAD_BYTES, MAP_REDUCE_TOKEN_BUDGET * CHARS_PER_TOKEN)
+    
+    # Check for --serve flag (long-lived daemon for hook runs)
+    if '--serve' in sys.argv:
+        sys.exit(serve_daemon())
+    
+    metrics_out = get_option_value('--metrics-out')
+    openmetrics_out = get_option_value('--openmetrics-out')
+    
+    try:
+        # Check for --range flag (batch backfill of merge commits)
+        rev_range = get_option_value('--range')
+        if rev_range:
+            try:
+                workers = int(get_option_value('--workers', str(BATCH_WORKERS)))
+                pack_size = int(get_option_value('--pack', '0'))
+            except ValueError:
+                print("[ERROR] --workers and --pack must be integers")
+                sys.exit(1)
+            run_backfill(rev_range, workers=workers, auto_write='--auto' in sys.argv or is_non_interactive_mode(),
+                         release='--release' in sys.argv, pack_size=pack_size)
+            sys.exit(0)
+        
+        # Check for --repos flag (one entry per repository, shared provider clients)
+        repos = get_option_value('--repos')
+        if repos:
+            try:
+                workers = int(get_option_value('--workers', str(BATCH_WORKERS)))
+                paths = load_repo_list(repos)
+            except ValueError:
+                print("[ERROR] --workers must be an integer and the --repos manifest a path list")
+                sys.exit(1)
+            except OSError as e:
+                print(f"[ERROR] Could not read --repos manifest: {e}")
+                sys.exit(1)
+            run_repos(paths, workers=workers)
+            sys.exit(0)
+        
+        # Detect CI platform (with CLI override support)
+        if '--github' in sys.argv:
+            platform = 'github'
+        elif '--bitbucket' in sys.argv:
+            platform = 'bitbucket'
+        elif '--gitlab' in sys.argv:
+            platform = 'gitlab'
+        elif '--ci' in sys.argv:
+            platform = detect_ci_platform()
+        else:
+            platform = detect_ci_platform()
+        
+        # Determine if we're in CI mode
+        ci_mode = platform in ('github', 'bitbucket', 'gitlab', 'jenkins', 'circleci')
+        
+        if ci_mode:
+            print(f"[INFO] Detected CI platform: {platform}")
+        
+        # Check for --auto flag or post-merge hook
+        auto_write = '--auto' in sys.argv or os.environ.get('GIT_HOOK') == 'post-merge' or ci_mode
+        
+        # Hook runs go to a warm --serve daemon when one is up
+        if os.environ.get('GIT_HOOK') == 'post-merge' and not ci_mode and '--no-daemon' not in sys.argv:
+            exit_code = run_via_daemon(release='--release' in sys.argv, options={
+                'fallback_entry': get_option_value('--fallback-entry'),
+                # Relative to this directory, not the daemon's
+                'metrics_out': os.path.abspath(metrics_out) if metrics_out else None,
+                'openmetrics_out': os.path.abspath(openmetrics_out) if openmetrics_out else None,
+            })
+            if exit_code is not None:
+                metrics_out = openmetrics_out = None  # Written by the daemon
+                sys.exit(exit_code)
+        main(auto_write=auto_write, ci_mode=ci_mode, release='--release' in sys.argv,
+             fallback_entry=get_option_value('--fallback-entry'))
+    except SystemExit as e:
+        METRICS.exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        raise
+    finally:
+        save_model_stats(METRICS.provider_calls, METRICS.routing)
+        write_metrics_reports(metrics_out, openmetrics_out)
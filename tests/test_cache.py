@@ -0,0 +1,43 @@
+"""LLM result cache: eviction only ever removes cached entries."""
+
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import generate_changelog as gc
+
+
+class EvictCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+
+    def touch(self, name: str, age_days: float = 0) -> Path:
+        path = self.cache_dir / name
+        path.write_text("{}", encoding='utf-8')
+        mtime = time.time() - age_days * 86400
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_least_recently_used_entries_go_first(self):
+        entries = [self.touch(f"{i:064x}.json", age_days=3 - i) for i in range(3)]
+        with mock.patch.object(gc, 'CACHE_MAX_ENTRIES', 2):
+            gc.evict_cache(self.cache_dir)
+        self.assertEqual([path.exists() for path in entries], [False, True, True])
+
+    def test_health_and_model_stats_are_kept(self):
+        kept = [self.touch(gc.HEALTH_FILE_NAME, age_days=365), self.touch(gc.MODEL_STATS_FILE_NAME, age_days=365)]
+        expired = self.touch(f"{1:064x}.json", age_days=365)
+        with mock.patch.object(gc, 'CACHE_MAX_ENTRIES', 0):
+            gc.evict_cache(self.cache_dir)
+        self.assertEqual([path.exists() for path in kept], [True, True])
+        self.assertFalse(expired.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
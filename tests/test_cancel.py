@@ -0,0 +1,55 @@
+"""Cancelled race losers stop waiting on backoff and the Groq rate limiter."""
+
+import threading
+import time
+import unittest
+
+import generate_changelog as gc
+
+
+class CancellationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cancel_event = threading.Event()
+        gc._http_local.cancel_event = self.cancel_event
+        self.addCleanup(setattr, gc._http_local, 'cancel_event', None)
+
+    def test_paused_limiter_returns_when_cancelled(self):
+        limiter = gc.RateLimiter(60, 1)
+        limiter.pause(30)
+        threading.Timer(0.05, self.cancel_event.set).start()
+        start = time.monotonic()
+        with self.assertRaises(ConnectionAbortedError):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_cancellable_sleep(self):
+        self.cancel_event.set()
+        with self.assertRaises(ConnectionAbortedError):
+            gc.cancellable_sleep(30)
+
+    def test_sleep_without_cancellation(self):
+        gc._http_local.cancel_event = None
+        gc.cancellable_sleep(0)
+
+
+class RaceWinnerTest(unittest.TestCase):
+    """Only a real entry may win the race and cancel the other provider."""
+
+    def test_conventional_entries_win(self):
+        self.assertTrue(gc.is_valid_entry("fix(parser): handle empty files"))
+        self.assertTrue(gc.is_valid_entry("- feat!: drop v1 api\nextra text"))
+        self.assertTrue(gc.is_valid_entry("BREAKING CHANGE: config format"))
+        self.assertTrue(gc.is_valid_entry("[Bugfix] handle empty files"))
+
+    def test_unprefixed_bullet_does_not_win(self):
+        self.assertFalse(gc.is_valid_entry("- Updated the code base"))
+        self.assertFalse(gc.is_valid_entry("Here is the changelog entry:\nfeat: add login"))
+
+    def test_unknown_type_or_empty_description_does_not_win(self):
+        self.assertFalse(gc.is_valid_entry("Note: this adds a login page"))
+        self.assertFalse(gc.is_valid_entry("feat:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""changelog_parser: versions, sections, entry metadata and queries."""
+
+import unittest
+
+from changelog_parser import parse_changelog, parse_entry
+
+CHANGELOG = """# Changelog
+
+Preamble text - not an entry.
+- not an entry either
+
+## [Unreleased]
+
+- Jan 2, 2026 at 9:00 AM | 3 files | by Jane Doe - feat(auth)!: drop v1 tokens
+- fix: handle empty files
+
+## [0.10.0] - 2026-02-25
+
+### Added
+- feat: add Jenkinsfile for CI/CD pipeline (#19) by @dev
+  - nested detail, not an entry
+
+### Fixed
+* fix: resolve bug in auth
+
+## v0.9.0 - 2026-01-10
+
+- BREAKING CHANGE: config format
+- Update deps (#3) by @me
+"""
+
+
+class ParseChangelogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.changelog = parse_changelog(CHANGELOG)
+
+    def test_title_and_versions(self):
+        self.assertEqual(self.changelog.title, "Changelog")
+        self.assertEqual([v.name for v in self.changelog.versions], ["Unreleased", "0.10.0", "v0.9.0"])
+        self.assertEqual(self.changelog.versions[1].date, "2026-02-25")
+
+    def test_latest_version_compares_numerically(self):
+        self.assertEqual(self.changelog.latest_version(), "0.10.0")
+        self.assertEqual(parse_changelog("## v1.2.0\n## 1.10.0\n").latest_version(), "1.10.0")
+        self.assertIsNone(parse_changelog("# Changelog\n").latest_version())
+
+    def test_sections_and_entries(self):
+        released = self.changelog.find_version("0.10.0")
+        self.assertEqual([s.title for s in released.sections], ["", "Added", "Fixed"])
+        self.assertEqual(len(released.entries), 2)
+        self.assertEqual(len(self.changelog.entries()), 6)
+
+    def test_entry_metadata(self):
+        entry = self.changelog.latest_entry()
+        self.assertEqual((entry.timestamp, entry.files_changed, entry.author),
+                         ("Jan 2, 2026 at 9:00 AM", 3, "Jane Doe"))
+        self.assertEqual((entry.prefix, entry.scope, entry.breaking, entry.description),
+                         ("feat", "auth", True, "drop v1 tokens"))
+        self.assertEqual(entry.line, 8)
+
+    def test_breaking_change_and_unprefixed_entries(self):
+        breaking, unprefixed = self.changelog.find_version("0.9.0").entries
+        self.assertEqual((breaking.prefix, breaking.breaking), ("breaking", True))
+        self.assertEqual((unprefixed.prefix, unprefixed.description), ("", "Update deps (#3) by @me"))
+
+    def test_unreleased(self):
+        unreleased = self.changelog.unreleased()
+        self.assertTrue(unreleased.is_unreleased)
+        self.assertEqual([e.prefix for e in unreleased.entries], ["feat", "fix"])
+        self.assertIsNotNone(parse_changelog("## Unreleased\n").unreleased())
+
+    def test_entries_since(self):
+        self.assertEqual([e.prefix for e in self.changelog.entries_since("v0.10.0")], ["feat", "fix"])
+        with self.assertRaises(KeyError):
+            self.changelog.entries_since("9.9.9")
+
+    def test_entries_by_prefix(self):
+        self.assertEqual(len(self.changelog.entries_by_prefix("fix:")), 2)
+        self.assertEqual(len(self.changelog.entries_by_prefix("FEAT")), 2)
+
+    def test_crlf_line_endings(self):
+        changelog = parse_changelog(CHANGELOG.replace("\n", "\r\n"))
+        self.assertEqual(changelog.latest_version(), "0.10.0")
+        self.assertEqual(changelog.latest_entry().description, "drop v1 tokens")
+
+
+class ParseEntryTest(unittest.TestCase):
+
+    def test_plain_description(self):
+        entry = parse_entry("just some text", 1)
+        self.assertEqual((entry.prefix, entry.description, entry.breaking), ("", "just some text", False))
+
+    def test_bang_without_scope(self):
+        entry = parse_entry("refactor!: rename settings", 1)
+        self.assertEqual((entry.prefix, entry.scope, entry.breaking), ("refactor", "", True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Changelog index lookups (find_recorded_entry / record_changelog_entries)."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import generate_changelog as gc
+
+ENTRY = "- Jan 1, 2026 at 9:00 AM | 1 file | by Dev - fix: handle empty files"
+DIFF = "diff --git a/app.py b/app.py\n-x = 1\n+x = 2\n"
+
+
+class FindRecordedEntryTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "CHANGELOG.md"
+        self.path.write_text(f"# Changelog\n\n## Unreleased\n\n{ENTRY}\n", encoding='utf-8')
+
+    def record(self, changes: gc.GitChanges):
+        gc.record_changelog_entries(self.path, [changes], [ENTRY])
+
+    def test_same_commit_is_recorded(self):
+        self.record(gc.GitChanges(sha="a" * 40, diff=DIFF))
+        self.assertEqual(gc.find_recorded_entry(gc.GitChanges(sha="a" * 40, diff=DIFF), self.path), ENTRY)
+
+    def test_other_commit_with_same_diff_is_new(self):
+        # A PR re-landed after a revert has the same diff but its own merge commit
+        self.record(gc.GitChanges(sha="a" * 40, diff=DIFF))
+        self.assertIsNone(gc.find_recorded_entry(gc.GitChanges(sha="b" * 40, diff=DIFF), self.path))
+
+    def test_changes_without_commit_match_by_diff(self):
+        self.record(gc.GitChanges(sha="", diff=DIFF))
+        self.assertEqual(gc.find_recorded_entry(gc.GitChanges(sha="", diff=DIFF), self.path), ENTRY)
+        self.assertIsNone(gc.find_recorded_entry(gc.GitChanges(sha="", diff=DIFF + "+y = 3\n"), self.path))
+
+    def test_entry_removed_from_edited_changelog(self):
+        self.record(gc.GitChanges(sha="a" * 40, diff=DIFF))
+        self.path.write_text("# Changelog\n\n## Unreleased\n\n- feat: something else entirely\n", encoding='utf-8')
+        self.assertIsNone(gc.find_recorded_entry(gc.GitChanges(sha="a" * 40, diff=DIFF), self.path))
+
+    def test_force_disables_lookup(self):
+        self.record(gc.GitChanges(sha="a" * 40, diff=DIFF))
+        gc.DEDUP_ENABLED = False
+        self.addCleanup(setattr, gc, 'DEDUP_ENABLED', True)
+        self.assertIsNone(gc.find_recorded_entry(gc.GitChanges(sha="a" * 40, diff=DIFF), self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
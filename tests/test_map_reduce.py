@@ -0,0 +1,52 @@
+"""Map-reduce (--map-reduce): when it kicks in and how many calls it makes."""
+
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+import generate_changelog as gc
+
+SMALL_DIFF = "diff --git a/app.py b/app.py\n-x = 1\n+x = 2\n"
+
+
+class MapReduceTest(unittest.TestCase):
+
+    def setUp(self):
+        for name in ('MAP_REDUCE_ENABLED', 'CACHE_ENABLED', 'GROQ_API_KEY'):
+            self.addCleanup(setattr, gc, name, getattr(gc, name))
+        gc.MAP_REDUCE_ENABLED = True
+        gc.CACHE_ENABLED = False
+        gc.GROQ_API_KEY = 'test-key'
+        self.groq = mock.Mock(return_value="feat: add login")
+        patcher = mock.patch.object(gc, 'generate_with_groq', self.groq)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.enterContext(contextlib.redirect_stdout(io.StringIO()))
+
+    def test_diff_within_prompt_budget_skips_map_reduce(self):
+        with mock.patch.object(gc, 'map_reduce_entry') as map_reduce, \
+                mock.patch.object(gc, 'get_prompt_budget', return_value=gc.estimate_tokens(SMALL_DIFF)):
+            gc.generate_changelog_entry(SMALL_DIFF)
+        map_reduce.assert_not_called()
+
+    def test_diff_over_prompt_budget_uses_map_reduce(self):
+        with mock.patch.object(gc, 'map_reduce_entry', return_value="feat: big") as map_reduce, \
+                mock.patch.object(gc, 'get_prompt_budget', return_value=gc.estimate_tokens(SMALL_DIFF) - 1):
+            self.assertEqual(gc.generate_changelog_entry(SMALL_DIFF), "feat: big")
+        map_reduce.assert_called_once()
+
+    def test_single_chunk_is_one_call(self):
+        with mock.patch.object(gc, 'split_diff_chunks', return_value=([SMALL_DIFF], 0)):
+            self.assertEqual(gc.map_reduce_entry(SMALL_DIFF), "feat: add login")
+        self.assertEqual(self.groq.call_count, 1)
+
+    def test_several_chunks_are_mapped_then_reduced(self):
+        with mock.patch.object(gc, 'split_diff_chunks', return_value=([SMALL_DIFF, SMALL_DIFF], 0)), \
+                mock.patch.object(gc, 'summarize_chunk', return_value="changes x") as summarize:
+            self.assertEqual(gc.map_reduce_entry(SMALL_DIFF), "feat: add login")
+        self.assertEqual((summarize.call_count, self.groq.call_count), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
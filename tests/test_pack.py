@@ -0,0 +1,57 @@
+"""Packed generation (--pack): reply validation and the single-request fallback."""
+
+import contextlib
+import io
+import json
+import unittest
+from unittest import mock
+
+import generate_changelog as gc
+
+
+def reply(**entries) -> str:
+    return json.dumps({"entries": {key.lstrip('_'): value for key, value in entries.items()}})
+
+
+class ParsePackedReplyTest(unittest.TestCase):
+
+    def test_valid_entries_are_normalized(self):
+        self.assertEqual(gc.parse_packed_reply(reply(_1="Fix: handle empty files", _2="- feat(ui): dark mode"), [1, 2]),
+                         {1: "fix: handle empty files", 2: "feat(ui): dark mode"})
+
+    def test_malformed_entries_are_rejected(self):
+        parsed = gc.parse_packed_reply(reply(_1="feat: Sure! Here you go", _2="Updated the code", _3=["x"]), [1, 2, 3])
+        self.assertEqual(parsed, {1: None, 2: None, 3: None})
+
+    def test_missing_ids_are_left_out(self):
+        self.assertEqual(gc.parse_packed_reply(reply(_1="fix: typo"), [1, 2]), {1: "fix: typo"})
+        self.assertEqual(gc.parse_packed_reply("not json", [1]), {})
+
+
+class GeneratePackedEntriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, gc, 'CACHE_ENABLED', gc.CACHE_ENABLED)
+        gc.CACHE_ENABLED = False
+        self.records = [gc.GitChanges(diff=f"diff --git a/app{i}.py b/app{i}.py\n+x = {i}\n") for i in range(3)]
+
+    def generate(self, packed: dict) -> tuple:
+        single = mock.Mock(side_effect=lambda record: f"fix: single {self.records.index(record)}")
+        with mock.patch.object(gc, 'generate_pack', lambda pack: ('groq', {i: packed[i] for i, _ in pack if i in packed})), \
+                mock.patch.object(gc, 'generate_backfill_entry', single), \
+                contextlib.redirect_stdout(io.StringIO()):
+            return gc.generate_packed_entries(self.records, pack_size=3, workers=1), single
+
+    def test_malformed_entries_go_straight_to_single_requests(self):
+        entries, single = self.generate({1: "feat: one", 2: None})
+        self.assertEqual(entries, ["feat: one", "fix: single 1", "fix: single 2"])
+        self.assertEqual(single.call_count, 2)
+
+    def test_no_single_requests_when_every_entry_is_valid(self):
+        entries, single = self.generate({1: "feat: one", 2: "feat: two", 3: "fix: three"})
+        self.assertEqual(entries, ["feat: one", "feat: two", "fix: three"])
+        single.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Release bump selection: entry validation, semver bump and cut_release."""
+
+import sys
+import unittest
+from unittest import mock
+
+import generate_changelog as gc
+from changelog_parser import parse_entry
+
+
+def bump_for(*entries: str, default_prefix: str = "feat:") -> str:
+    """Bump chosen for entries as write_changelog would record them."""
+    parsed = []
+    for number, entry in enumerate(entries, start=1):
+        line = gc.format_changelog_entry(gc.validate_entry(entry, default_prefix), "Jan 1, 2026 at 9:00 AM", 1, "Dev")
+        parsed.append(parse_entry(line[2:], number))
+    return gc.get_release_bump(parsed)
+
+
+class ValidateEntryTest(unittest.TestCase):
+
+    def test_keeps_breaking_bang(self):
+        self.assertEqual(gc.validate_entry("feat!: drop v1 api"), "feat!: drop v1 api")
+
+    def test_keeps_breaking_change_footer(self):
+        self.assertEqual(gc.validate_entry("BREAKING CHANGE: config format"), "BREAKING CHANGE: config format")
+
+    def test_keeps_scope(self):
+        self.assertEqual(gc.validate_entry("Fix(parser): handle empty files"), "fix(parser): handle empty files")
+
+    def test_converts_old_format(self):
+        self.assertEqual(gc.validate_entry("[Bugfix] handle empty files"), "fix: handle empty files")
+
+    def test_unprefixed_gets_default_prefix(self):
+        self.assertEqual(gc.validate_entry("add login page"), "feat: add login page")
+
+    def test_unprefixed_fallback_is_kept(self):
+        self.assertEqual(gc.validate_entry("Update deps (#3) by @me", ""), "Update deps (#3) by @me")
+
+
+class ReleaseBumpTest(unittest.TestCase):
+
+    def test_bang_is_major(self):
+        self.assertEqual(bump_for("fix: typo", "feat!: drop v1 api"), 'major')
+
+    def test_breaking_change_is_major(self):
+        self.assertEqual(bump_for("BREAKING CHANGE: config format"), 'major')
+
+    def test_feat_is_minor(self):
+        self.assertEqual(bump_for("fix: typo", "feat: add login page"), 'minor')
+
+    def test_scoped_fix_is_patch(self):
+        self.assertEqual(bump_for("fix(scope): handle empty files"), 'patch')
+
+    def test_unprefixed_fallback_is_patch(self):
+        self.assertEqual(bump_for("Update deps (#3) by @me", default_prefix=""), 'patch')
+
+    def test_bump_version(self):
+        self.assertEqual(gc.bump_version("v1.2.3", 'major'), "2.0.0")
+        self.assertEqual(gc.bump_version("1.2.3", 'minor'), "1.3.0")
+        self.assertEqual(gc.bump_version("1.2.3", 'patch'), "1.2.4")
+
+    def test_cut_release(self):
+        content = ("# Changelog\n\n## [Unreleased]\n\n- fix: typo\n- feat!: drop v1 api\n\n"
+                   "## [1.4.0] - 2026-01-01\n\n- feat: old\n")
+        new_content, version, bump = gc.cut_release(content, "2026-02-01")
+        self.assertEqual((version, bump), ("2.0.0", 'major'))
+        self.assertIn("## [Unreleased]\n\n## [2.0.0] - 2026-02-01\n\n- fix: typo\n- feat!: drop v1 api\n", new_content)
+        self.assertTrue(new_content.rstrip().endswith("- feat: old"))
+
+    def test_cut_release_without_entries(self):
+        self.assertIsNone(gc.cut_release("# Changelog\n\n## [Unreleased]\n", "2026-02-01"))
+
+    def test_cut_release_picks_highest_version(self):
+        content = ("## [Unreleased]\n\n- Jan 1, 2026 at 9:00 AM | 1 file | by Dev - fix(api): typo\n\n"
+                   "## v1.9.0\n\n## [1.10.0] - 2026-01-01\n")
+        self.assertEqual(gc.cut_release(content, "2026-02-01")[1:], ("1.10.1", 'patch'))
+
+    def test_writes_without_changelog_parser_module(self):
+        # The script is often copied into a project on its own
+        with mock.patch.dict(sys.modules, {'changelog_parser': None}):
+            self.assertEqual(gc.validate_entry("feat!: drop v1 api"), "feat!: drop v1 api")
+            self.assertEqual(gc.cut_release("## Unreleased\n\n- feat: login\n", "2026-02-01")[1], "0.1.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Model routing by predicted prompt size and latency history (--route)."""
+
+import json
+import time
+import unittest
+from unittest import mock
+
+import generate_changelog as gc
+
+SMALL_DIFF = "diff --git a/app.py b/app.py\n-x = 1\n+x = 2\n"
+LARGE_DIFF = "diff --git a/app.py b/app.py\n" + "".join(f"+value_{i} = compute({i}, {i + 1})\n" for i in range(2000))
+
+
+class RouteModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, gc, 'ROUTING_ENABLED', gc.ROUTING_ENABLED)
+        self.addCleanup(setattr, gc, '_model_stats', None)
+        gc.ROUTING_ENABLED = True
+        gc._model_stats = {'models': {}, 'routing': []}
+        self.small, self.large = (model for _, model in gc.MODEL_TIERS['groq'])
+
+    def set_latencies(self, model: str, seconds: float, count: int = gc.ROUTING_MIN_SAMPLES):
+        gc._model_stats['models'][model] = {'latencies': [seconds] * count}
+
+    def test_small_diff_goes_to_smallest_tier(self):
+        route = gc.route_model('groq', SMALL_DIFF)
+        self.assertEqual((route['model'], route['reason']), (self.small, 'size'))
+
+    def test_large_diff_goes_to_stronger_tier(self):
+        route = gc.route_model('groq', LARGE_DIFF)
+        self.assertGreater(route['predicted_tokens'], gc.MODEL_TIERS['groq'][0][0])
+        self.assertEqual((route['model'], route['reason']), (self.large, 'size'))
+
+    def test_slow_tier_hands_over_to_smaller_one(self):
+        self.set_latencies(self.large, gc.ROUTING_LATENCY_TARGET * 2)
+        route = gc.route_model('groq', LARGE_DIFF)
+        self.assertEqual((route['model'], route['reason']), (self.small, 'latency'))
+
+    def test_too_few_samples_are_not_trusted(self):
+        self.set_latencies(self.large, gc.ROUTING_LATENCY_TARGET * 2, count=gc.ROUTING_MIN_SAMPLES - 1)
+        self.assertEqual(gc.route_model('groq', LARGE_DIFF)['model'], self.large)
+
+    def test_default_model_without_route(self):
+        gc.ROUTING_ENABLED = False
+        # No tier lookup, so no Ollama health probe either
+        self.assertEqual(gc.route_model('ollama', LARGE_DIFF)['model'], gc.OLLAMA_MODEL)
+        self.assertEqual(gc.route_model('groq', LARGE_DIFF)['model'], gc.GROQ_MODEL)
+
+
+class PromptBudgetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, gc, '_model_stats', None)
+        gc._model_stats = {'models': {}, 'routing': []}
+
+    def set_speed(self, model: str, tokens_per_second: float):
+        gc._model_stats['models'][model] = {'tokens_per_second': tokens_per_second}
+
+    def test_profile_size_without_history(self):
+        self.assertEqual(gc.get_prompt_budget('phi3:mini'), 1000)
+
+    def test_slow_history_does_not_shrink_below_profile(self):
+        self.set_speed('phi3:mini', 10)
+        self.assertEqual(gc.get_prompt_budget('phi3:mini'), 1000)
+
+    def test_fast_history_is_capped_by_context(self):
+        self.set_speed('phi3:mini', 5000)
+        self.assertEqual(gc.get_prompt_budget('phi3:mini'), 4096 - gc.COMPLETION_RESERVE_TOKENS)
+
+
+class LatencyRecordingTest(unittest.TestCase):
+    """Latencies feed route_model and get_prompt_budget, so waits must stay out."""
+
+    def test_rate_limiter_wait_is_not_latency(self):
+        body = json.dumps({"choices": [{"message": {"content": "fix: typo"}}]}).encode('utf-8')
+        limiter = mock.Mock(acquire=lambda: time.sleep(0.3))
+        with mock.patch.object(gc, 'GROQ_API_KEY', 'test-key'), \
+                mock.patch.object(gc, 'GROQ_RATE_LIMITER', limiter), \
+                mock.patch.object(gc, 'http_request', return_value=(200, {}, body)):
+            self.assertEqual(gc.generate_with_groq(SMALL_DIFF), "fix: typo")
+        call = gc.METRICS.provider_calls[-1]
+        self.assertEqual((call['provider'], call['ok']), ('groq', True))
+        self.assertLess(call['seconds'], 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
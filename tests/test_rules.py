@@ -0,0 +1,78 @@
+"""Rule-based entries for docs-, lockfile-, test- and version-only changes."""
+
+import contextlib
+import io
+import unittest
+
+import generate_changelog as gc
+
+
+def file_diff(path: str, removed: list = (), added: list = ()) -> str:
+    """A one-hunk git diff of a single file."""
+    lines = [f"-{line}" for line in removed] + [f"+{line}" for line in added]
+    return (f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n"
+            f"@@ -1,{len(removed)} +1,{len(added)} @@\n" + "\n".join(lines) + "\n")
+
+
+def stats(*diffs: str) -> list:
+    """Numstat as git reports it: (added, deleted, path) per file."""
+    result = []
+    for diff in diffs:
+        path = diff.split('\n', 1)[0].split(' b/', 1)[1]
+        body = [line for line in diff.split('\n') if not line.startswith(('+++', '---'))]
+        result.append((sum(line.startswith('+') for line in body), sum(line.startswith('-') for line in body), path))
+    return result
+
+
+def classify(*diffs: str):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return gc.classify_trivial_change("".join(diffs), stats(*diffs))
+
+
+class ClassifyTrivialChangeTest(unittest.TestCase):
+
+    def test_docs_only(self):
+        self.assertEqual(classify(file_diff("README.md", ["old"], ["new"])), "docs: update README.md")
+        self.assertEqual(classify(file_diff("README.md", ["a"], ["b"]), file_diff("docs/setup.rst", ["a"], ["b"])),
+                         "docs: update README.md and docs/setup.rst")
+
+    def test_many_docs_are_counted(self):
+        diffs = [file_diff(f"docs/page{i}.md", ["a"], ["b"]) for i in range(5)]
+        self.assertEqual(classify(*diffs), "docs: update documentation (5 files)")
+
+    def test_lockfile_only(self):
+        self.assertEqual(classify(file_diff("poetry.lock", ["a = 1"], ["a = 2"])), "chore: update poetry.lock")
+
+    def test_tests_only(self):
+        self.assertEqual(classify(file_diff("tests/test_app.py", ["x = 1"], ["x = 2"])),
+                         "test: update tests/test_app.py")
+
+    def test_version_bump(self):
+        diff = file_diff("package.json", ['  "version": "1.2.3",'], ['  "version": "1.3.0",'])
+        self.assertEqual(classify(diff), "chore: bump version to 1.3.0")
+        diff = file_diff("pyproject.toml", ['version = "0.9.0"'], ['version = "1.0.0"'])
+        self.assertEqual(classify(diff), "chore: bump version to 1.0.0")
+
+    def test_version_file_with_other_changes_needs_llm(self):
+        diff = file_diff("package.json", ['  "version": "1.2.3",'], ['  "version": "1.3.0",', '  "private": true,'])
+        self.assertIsNone(classify(diff))
+
+    def test_version_bump_cut_short_needs_llm(self):
+        diff = file_diff("setup.py", ['__version__ = "1.0.0"'], ['__version__ = "1.0.1"'])
+        self.assertIsNone(gc.classify_trivial_change(diff, [(5, 5, "setup.py")]))
+
+    def test_dependency_manifests_need_llm(self):
+        self.assertIsNone(classify(file_diff("requirements.txt", ["requests==2.0"], ["requests==2.31"])))
+        self.assertIsNone(classify(file_diff("package.json", ['  "left-pad": "1.0.0"'], ['  "left-pad": "1.3.0"'])))
+
+    def test_code_with_docs_needs_llm(self):
+        self.assertIsNone(classify(file_diff("README.md", ["a"], ["b"]), file_diff("app.py", ["x = 1"], ["x = 2"])))
+
+    def test_disabled_with_no_rules(self):
+        self.addCleanup(setattr, gc, 'RULES_ENABLED', True)
+        gc.RULES_ENABLED = False
+        self.assertIsNone(classify(file_diff("README.md", ["old"], ["new"])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+"""Changelog writes: entries land under Unreleased and leave no stray files."""
+
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+import generate_changelog as gc
+
+ENTRY = "- Jan 1, 2026 at 9:00 AM | 1 file | by Dev - fix: handle empty files"
+
+
+class WriteChangelogEntriesTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        subprocess.run(["git", "init", "-q"], cwd=self.root, check=True)
+        self.path = self.root / "CHANGELOG.md"
+        self.path.write_text("# Changelog\n\n## Unreleased\n\n- feat: older entry\n", encoding='utf-8')
+
+    def test_entry_is_inserted_below_unreleased(self):
+        self.assertTrue(gc.write_changelog_entries([ENTRY], self.path))
+        self.assertEqual(self.path.read_text(encoding='utf-8'),
+                         f"# Changelog\n\n## Unreleased\n\n{ENTRY}\n\n- feat: older entry\n")
+
+    def test_lock_file_stays_inside_git_directory(self):
+        gc.write_changelog_entries([ENTRY], self.path)
+        self.assertFalse((self.root / ".CHANGELOG.md.lock").exists())
+        self.assertTrue((self.root / ".git" / gc.CACHE_DIR_NAME / "CHANGELOG.md.lock").exists())
+
+    def test_lock_file_next_to_changelog_outside_a_repository(self):
+        self.assertEqual(gc.get_lock_path(self.root / "docs" / "CHANGELOG.md"),
+                         self.root / "docs" / ".CHANGELOG.md.lock")
+
+
+if __name__ == "__main__":
+    unittest.main()